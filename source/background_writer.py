@@ -0,0 +1,82 @@
+#
+# The following module writes files in a background thread while the script continues (used by crop_objects.py)
+# 1. Queue a write (a function and its arguments, e.g. write_point_cloud_arrays and its path and arrays)
+# 2. Write the queued files one after the other in the order they were queued
+# 3. Bound the queue: when it is full the script waits, so the arrays waiting to be written stay bounded in memory
+# 4. Wait for all the files at the end and raise the first error of a write
+# 5. Wait for the queued files and stop the thread before worker processes are forked (wait), the thread is started
+#    again by the next write (forking a process while another thread writes can deadlock the forked workers)
+#
+# The writes of ply_io.py (numpy tofile) release the GIL, so the disk writes overlap with the computation of the script
+# A queue of size 0 writes every file immediately (no thread)
+
+import queue
+import threading
+
+# Queue item that stops the thread
+_STOP = None
+
+# Writer with a bounded queue and one background thread
+class background_writer:
+    # In: The maximum number of queued writes (0: no thread, every write is done when it is queued)
+    def __init__(self, max_queued=8):
+        self.max_queued = max_queued
+        self.error = None
+        self.num_written = 0
+
+        self.thread = None
+
+        if max_queued > 0:
+            self.queue = queue.Queue(maxsize=max_queued)
+
+    # In: -
+    # Out: - (writes the queued files until the stop item, an error stops the writes)
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+
+            if self.error is None:
+                write_function, arguments = item
+                try:
+                    write_function(*arguments)
+                    self.num_written += 1
+                except Exception as e:
+                    self.error = e
+
+    # In: The write function and its arguments
+    # Out: - (queues the write, waits if the queue is full, raises the error of a previous write)
+    def submit(self, write_function, *arguments):
+        if self.error is not None:
+            raise self.error
+
+        if self.max_queued > 0:
+            # The thread is started by the first write (and again after wait)
+            if self.thread is None:
+                # Daemon thread: if the script fails, the process does not wait for the queued writes
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            self.queue.put((write_function, arguments))
+        else:
+            write_function(*arguments)
+            self.num_written += 1
+
+    # In: -
+    # Out: - (waits for all the queued writes and stops the thread, so the process has no other thread
+    #      e.g. before worker processes are forked, raises the error of a write)
+    def wait(self):
+        if self.thread is not None:
+            self.queue.put(_STOP)
+            self.thread.join()
+            self.thread = None
+
+        if self.error is not None:
+            raise self.error
+
+    # In: -
+    # Out: The number of files written (waits for all the queued writes, raises the error of a write)
+    def close(self):
+        self.wait()
+
+        return self.num_written
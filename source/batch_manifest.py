@@ -0,0 +1,103 @@
+#
+# The following module keeps a manifest of the finished objects in a metrics folder (metrics_vox_<voxel_size>_bound_<bound>)
+# (used by compare_voxel_grids_all.py and compare_voxel_grids_all_multiple.py to resume interrupted runs)
+# 1. Hash the input voxel grids of an object and create the key of the object (input hashes and the settings of the run)
+# 2. Read the manifest (manifest.json) of a metrics folder
+# 3. Check if an object is done: it is in the manifest with the same key and its <id>_data.txt exists
+# 4. Record a finished object (input paths, hashes, time needed and time finished) and write the manifest atomically
+#
+# The manifest is written to a temporary file and then renamed, so a run that is killed at any moment
+# leaves either the previous or the new manifest, never a partial one
+# An object whose voxel grids or settings changed gets a new key and is compared again
+
+import datetime
+import hashlib
+import json
+import os
+from result_cache import hash_file
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+# In: List of paths to the input files of an object
+# Out: List of the sha256 hashes (hex strings) of their contents
+def get_input_hashes(paths_to_files):
+    input_hashes = []
+    for path_to_file in paths_to_files:
+        hasher = hashlib.sha256()
+        hash_file(path_to_file, hasher)
+        input_hashes.append(hasher.hexdigest())
+
+    return input_hashes
+
+# In: List of the hashes of the input files and dictionary with the settings that change the outputs of the object
+# Out: The key of the object (hex string)
+def get_object_key(input_hashes, settings):
+    content = json.dumps({"inputs": list(input_hashes), "settings": settings}, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+# In: The metrics folder
+# Out: The path to its manifest
+def get_manifest_path(path_to_metrics):
+    return os.path.join(path_to_metrics, MANIFEST_FILENAME)
+
+# In: The metrics folder
+# Out: The manifest (dictionary with "version" and "objects": id -> entry), empty if it does not exist or can not be read
+def read_manifest(path_to_metrics):
+    path_to_manifest = get_manifest_path(path_to_metrics)
+    empty_manifest = {"version": MANIFEST_VERSION, "objects": {}}
+
+    if not os.path.exists(path_to_manifest):
+        return empty_manifest
+
+    try:
+        with open(path_to_manifest, "r") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"Manifest {path_to_manifest} can not be read ({e}), all objects are compared again")
+        return empty_manifest
+
+    if manifest.get("version") != MANIFEST_VERSION or not isinstance(manifest.get("objects"), dict):
+        print(f"Manifest {path_to_manifest} has a different version, all objects are compared again")
+        return empty_manifest
+
+    return manifest
+
+# In: The metrics folder and the manifest
+# Out: - (writes the manifest to a temporary file and renames it to manifest.json)
+def write_manifest(path_to_metrics, manifest):
+    os.makedirs(path_to_metrics, exist_ok=True)
+
+    path_to_manifest = get_manifest_path(path_to_metrics)
+    path_to_temp = path_to_manifest + f".{os.getpid()}.tmp"
+
+    with open(path_to_temp, "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(path_to_temp, path_to_manifest)
+
+# In: The metrics folder and the id of an object
+# Out: The path to the <id>_data.txt of the object
+def get_data_path(path_to_metrics, id_object):
+    return os.path.join(path_to_metrics, str(id_object) + "_metrics", str(id_object) + "_data.txt")
+
+# In: The manifest, the metrics folder, the id of an object and its key
+# Out: True if the object is done (recorded with the same key and its <id>_data.txt exists), False otherwise
+def is_object_done(manifest, path_to_metrics, id_object, object_key):
+    entry = manifest["objects"].get(str(id_object))
+
+    return entry is not None and entry.get("key") == object_key and os.path.exists(get_data_path(path_to_metrics, id_object))
+
+# In: The metrics folder, the manifest, the id of an object, its key, the paths and hashes of its inputs
+#     and the seconds needed to compare it
+# Out: - (adds the object to the manifest and writes the manifest)
+def record_object_done(path_to_metrics, manifest, id_object, object_key, paths_to_inputs, input_hashes, seconds):
+    manifest["objects"][str(id_object)] = {
+        "key": object_key,
+        "inputs": [{"path": path, "sha256": input_hash} for path, input_hash in zip(paths_to_inputs, input_hashes)],
+        "seconds": round(seconds, 3),
+        "finished": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+
+    write_manifest(path_to_metrics, manifest)
@@ -0,0 +1,105 @@
+#
+# The following module creates the combined cropped objects (ground truth in blue and colmap (aligned) in green) on demand
+# (used by crop_objects.py and show_combined_cropped_objects.py instead of storing a third .ply for every object)
+# 1. Find the cropped objects of a project (ID and object name) and the paths of their ground truth, colmap and combined .ply
+# 2. Combine the points of the ground truth and colmap cropped objects with one color for each (uint8, no per point float copies)
+# 3. Read the combined cropped object of an object: from the cache (combined_cropped_objects) if it is newer than both cropped objects,
+#    otherwise from the two cropped objects (and optionally store it in the cache)
+# 4. Create the Open3D point cloud of a combined cropped object (for the visualizations)
+#
+# The stored combined cropped objects have the same bytes as the ones stored by crop_objects.py before
+# (ground truth points first, then colmap points, colors without normals)
+
+import glob
+import os
+import re
+import numpy as np
+import open3d as o3d
+from ply_io import read_point_cloud_arrays, write_point_cloud_arrays
+
+# Directories of the cropped objects in a project
+GT_DIRECTORY = "gt_cropped_objects"
+COLMAP_DIRECTORY = "colmap_a_cropped_objects"
+COMBINED_DIRECTORY = "combined_cropped_objects"
+
+# Colors of the ground truth (blue) and colmap (green) points
+GT_COLOR = (0, 0, 255)
+COLMAP_COLOR = (0, 255, 0)
+
+# In: The path to the project, the ID of the object and its object name
+# Out: The paths to its ground truth, colmap and combined cropped objects
+def get_cropped_object_paths(path_to_project, id_object, object_name):
+    return (os.path.join(path_to_project, GT_DIRECTORY, f"{id_object}_gt_{object_name}.ply"),
+            os.path.join(path_to_project, COLMAP_DIRECTORY, f"{id_object}_colmap_{object_name}.ply"),
+            os.path.join(path_to_project, COMBINED_DIRECTORY, f"{id_object}_combined_{object_name}.ply"))
+
+# In: The path to the project
+# Out: List of (ID, object name) of the cropped objects (<ID>_gt_<object name>.ply or <ID>_colmap_<object name>.ply), sorted by ID
+#      (an object is found if at least one of its cropped objects is stored, cropped objects without points are not stored)
+def find_cropped_objects(path_to_project):
+    cropped_objects = set()
+    for directory, name in ((GT_DIRECTORY, "gt"), (COLMAP_DIRECTORY, "colmap")):
+        for path_to_ply in glob.glob(os.path.join(path_to_project, directory, f"*_{name}_*.ply")):
+            match = re.fullmatch(rf"(\d+)_{name}_(.+)\.ply", os.path.basename(path_to_ply))
+            if match is not None and "_voxelized" not in match.group(2):
+                cropped_objects.add((int(match.group(1)), match.group(2)))
+
+    return sorted(cropped_objects)
+
+# In: Numpy arrays of the ground truth points (N, 3) and the colmap points (M, 3)
+# Out: The combined points (N + M, 3) and their colors (N + M, 3) uint8 (ground truth blue, colmap green)
+def get_combined_arrays(points_gt, points_colmap):
+    points_gt = np.asarray(points_gt, dtype=float).reshape(-1, 3)
+    points_colmap = np.asarray(points_colmap, dtype=float).reshape(-1, 3)
+
+    colors = np.empty((len(points_gt) + len(points_colmap), 3), dtype=np.uint8)
+    colors[:len(points_gt)] = GT_COLOR
+    colors[len(points_gt):] = COLMAP_COLOR
+
+    return np.concatenate((points_gt, points_colmap)), colors
+
+# In: The path to a cropped object
+# Out: Its points (N, 3) float64 (no points if the cropped object was not stored because it had no points)
+def read_cropped_points(path_to_ply):
+    if not os.path.exists(path_to_ply):
+        return np.empty((0, 3))
+
+    points, _, _ = read_point_cloud_arrays(path_to_ply, mmap_TF=False)
+
+    return np.asarray(points, dtype=float)
+
+# In: The path to the combined cropped object and the paths to the ground truth and colmap cropped objects
+# Out: True if the combined cropped object is stored and newer than both cropped objects, False otherwise
+def is_combined_cached(path_combined, path_gt, path_colmap):
+    if not os.path.exists(path_combined):
+        return False
+
+    mtime_combined = os.path.getmtime(path_combined)
+
+    return all(not os.path.exists(path) or os.path.getmtime(path) <= mtime_combined for path in (path_gt, path_colmap))
+
+# In: The path to the project, the ID of the object, its object name and cache_TF
+#     (True: the combined cropped object is stored in combined_cropped_objects if it is not stored yet)
+# Out: The combined points (N + M, 3) and colors (N + M, 3) uint8 of the object
+def read_combined_arrays(path_to_project, id_object, object_name, cache_TF=False):
+    path_gt, path_colmap, path_combined = get_cropped_object_paths(path_to_project, id_object, object_name)
+
+    if is_combined_cached(path_combined, path_gt, path_colmap):
+        points, colors, _ = read_point_cloud_arrays(path_combined, mmap_TF=False)
+        if colors is not None:
+            return np.asarray(points, dtype=float), colors
+
+    points, colors = get_combined_arrays(read_cropped_points(path_gt), read_cropped_points(path_colmap))
+
+    if cache_TF and len(points) > 0:
+        write_point_cloud_arrays(path_combined, points, colors)
+
+    return points, colors
+
+# In: Numpy arrays of the combined points (N, 3) and colors (N, 3) uint8
+# Out: o3d.geometry.PointCloud of the combined cropped object
+def create_combined_point_cloud(points, colors):
+    pcd = o3d.geometry.PointCloud(o3d.utility.Vector3dVector(np.asarray(points, dtype=float)))
+    pcd.colors = o3d.utility.Vector3dVector(np.asarray(colors) / 255.0)
+
+    return pcd
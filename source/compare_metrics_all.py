@@ -1,8 +1,9 @@
 #
 # The following script performs the following
 # 0. Importing modules and reading arguments
-# 1. Read metrics for different bound sizes
-# 2. Create plots for metrics of different bound sizes
+# 1. Read metrics for different bound sizes (one query on the metrics table of the project, see metrics_store.py)
+# 2. Create plots for metrics of different bound sizes (one figure per metric and one figure with all metrics,
+#    rendered in parallel with --jobs, see metrics_plots.py)
 
 # Section: 0
 ## Importing modules and reading arguments
@@ -12,11 +13,10 @@
 import subprocess
 import sys
 import os
-import matplotlib.pyplot as plt
-from matplotlib import rc
-
-# Enable LaTeX rendering for text formatting
-rc('text', usetex=True)
+import numpy as np
+from voxel_metrics import get_metrics_folder
+from metrics_store import AVG_METRICS_NAMES, get_store_path, read_avg_metrics, import_metrics_folder
+from metrics_plots import plot_metric_vs_bound, plot_all_metrics_vs_bound, render_plots
 
 # Get the path to the current script
 script_path = sys.argv[0]
@@ -31,10 +31,30 @@ print("Importing modules and reading arguments\n")
 
 print("Reading arguments")
 
+# Read the optional --jobs <number_of_jobs> (it can be placed anywhere after the script name)
+# Number of plots rendered at the same time (each by its own worker process)
+jobs = 1 # default value
+
+if "--jobs" in sys.argv:
+    position_jobs = sys.argv.index("--jobs")
+    try:
+        jobs = int(sys.argv[position_jobs + 1])
+    except (IndexError, ValueError):
+        print("Error: --jobs must be followed by a valid integer")
+        sys.exit(1)
+
+    if jobs < 1:
+        print("Error: --jobs must be at least 1")
+        sys.exit(1)
+
+    # Remove the option so that the rest of the arguments keep their positions
+    del sys.argv[position_jobs:position_jobs + 2]
+
 if len(sys.argv) != 2:
     print("Length of arguments: ", len(sys.argv))
-    print("Usage: python compare_metrics_all.py 1<path_to_project>")
+    print("Usage: python compare_metrics_all.py 1<path_to_project> [--jobs <number_of_jobs>]")
     print("path_to_project: provide the path to the project (that contains colmap_a_cropped_objects and gt_cropped_objects)")
+    print("--jobs (optional): number of plots rendered at the same time (default: 1)")
     sys.exit(1)
 
 # 1. Read path to project
@@ -49,6 +69,7 @@ if not os.path.exists(path_to_project):
 print("==============================================================================================")
 print("Read arguments")
 print("1. path_to_project: ", path_to_project)
+print("--jobs: ", jobs)
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -64,85 +85,43 @@ print("=========================================================================
 print("Section: 1 | " + script_name)
 print("Read metrics for different bound sizes\n")
 
-# Initialize a dictionary to store the metrics and their corresponding values
-metrics_dict = {
-    "name_of_test": [],
-    "avg_gt_voxels_matched": [],
-    "min_gt_distance": [],
-    "max_gt_distance": [],
-    "avg_gt_mae": [],
-    "avg_gt_rmse": [],
-    "avg_gt_mse": [],
-    "avg_colmap_voxels_matched": [],
-    "avg_colmap_recall": [],
-    "min_colmap_distance": [],
-    "max_colmap_distance": [],
-    "avg_colmap_mae": [],
-    "avg_colmap_rmse": [],
-    "avg_colmap_mse": [],
-}
-
-# List all directories in the specified path that start with "metrics" but are not "metrics_general"
-subdirectories = [d for d in os.listdir(path_to_project) if os.path.isdir(os.path.join(path_to_project, d)) and d.startswith("metrics") and d != "metrics_general"]
-
-# Iterate through the subdirectories and read the "avg_metrics.txt" file
+path_to_store = get_store_path(path_to_project)
+
+# List all metrics folders (metrics_vox_<voxel_size>_bound_<bound>) in the specified path
+subdirectories = [d for d in os.listdir(path_to_project) if os.path.isdir(os.path.join(path_to_project, d)) and d.startswith("metrics_vox_")]
+
+# Metrics folders created before the metrics table existed are imported from their <id>_data.txt (only once)
 for directory in subdirectories:
-    avg_metrics_file = os.path.join(path_to_project, directory, "avg_metrics.txt")
     try:
-        with open(avg_metrics_file, "r") as file:
-            metrics_dict["name_of_test"].append(directory)
-            lines = file.readlines()
-            for line in lines:
-                # Split the line into TITLE and VALUE using the ":" as the separator
-                parts = line.strip().split(":")
-                if len(parts) == 2:
-                    title, value = parts[0].strip(), parts[1].strip()
-                    # Check if the TITLE is in the metrics_dict
-                    if title in metrics_dict:
-                        # Append the value to the corresponding attribute in the dictionary
-                        metrics_dict[title].append(value)
-
-    except FileNotFoundError:
-        print(f"File not found: {avg_metrics_file}")
-        sys.exit(1)
-    except Exception as e:
-        print(f"An error occurred while processing {avg_metrics_file}: {str(e)}")
-        sys.exit(1)
+        voxel_size_str, bound_str = directory[len("metrics_vox_"):].split("_bound_")
+        voxel_size, bound = float(voxel_size_str.replace("_", ".")), float(bound_str.replace("_", "."))
+    except ValueError:
+        print(f"The voxel size and the bound of {directory} can not be read, it is skipped")
+        continue
 
-print("\nMetrics dictionary before sort\n")
-# Now, metrics_dict contains the attributes and their corresponding values
-# You can access the values for each attribute as lists in metrics_dict
-for title, values in metrics_dict.items():
-    print(f"{title}: {values}")
+    num_imported = import_metrics_folder(path_to_store, os.path.join(path_to_project, directory), voxel_size, bound)
+    if num_imported > 0:
+        print(f"Imported {num_imported} objects of {directory} into {path_to_store}")
 
-# Initialize list to store suffixes of bound to use for sort
-suffix_values = []
-
-# Sort dictionary by bounding: small -> high
-# Extract the last two integers, add a ".", convert to float, and add to the list
-for name in metrics_dict["name_of_test"]:
-    last_two_integers = name.split('_')[-2:]
-    float_value = float(f"{last_two_integers[0]}.{last_two_integers[1]}")
-    suffix_values.append(float_value)
-
-# Sort the list of suffix_values with corresponding indices
-sorted_suffix_values = []
-sorted_indices = []
-
-for i, value in enumerate(suffix_values):
-    index = len(sorted_suffix_values)
-    for j, sorted_value in enumerate(sorted_suffix_values):
-        if value < sorted_value:
-            index = j
-            break
-    sorted_suffix_values.insert(index, value)
-    sorted_indices.insert(index, i)
-
-# Permute the data dictionary based on the sorted indices
-for key, values in metrics_dict.items():
-    metrics_dict[key] = [values[i] for i in sorted_indices]
-    
-print("\nMetrics dictionary after sort\n")
+# Average metrics of every voxel size and bound, sorted by bound (small -> high)
+avg_metrics = read_avg_metrics(path_to_store)
+
+# Only the metrics folders that exist in the project
+names_of_test = [os.path.basename(get_metrics_folder(path_to_project, voxel_size, bound)) for voxel_size, bound in zip(avg_metrics["voxel_size"], avg_metrics["bound"])]
+exists_TF = np.array([name in subdirectories for name in names_of_test], dtype=bool)
+
+if not np.any(exists_TF):
+    print(f"There are no metrics in {path_to_store}")
+    sys.exit(1)
+
+# Initialize a dictionary to store the metrics and their corresponding values
+metrics_dict = {"name_of_test": [name for name, exists in zip(names_of_test, exists_TF) if exists]}
+for name in AVG_METRICS_NAMES[3:]:
+    metrics_dict[name] = avg_metrics[name][exists_TF].tolist()
+
+sorted_suffix_values = avg_metrics["bound"][exists_TF].tolist()
+
+print("\nMetrics dictionary (sorted by bound)\n")
 for title, values in metrics_dict.items():
     print(f"{title}: {values}")
 #===================================================================================
@@ -167,34 +146,29 @@ metrics_general_dir = os.path.join(path_to_project, "metrics_general")
 if not os.path.exists(metrics_general_dir):
     os.makedirs(metrics_general_dir)
 
-# Plot and save graphs for each attribute
-for attribute, values in metrics_dict.items():
-    if attribute != "name_of_test":
-        plt.figure(figsize=(8, 6))
-        
-        # Set the background color to light blue for the entire figure
-        fig = plt.gcf()
-        fig.patch.set_facecolor('lightblue')
-    
-        # Plot the data on top of the background
-        plt.plot(sorted_suffix_values, [float(value) for value in values], marker='o')
-        plt.xlabel(r'\textbf{Bound sizes}', fontsize=22)
-        plt.ylabel(r'\textbf{' + attribute + r'}', fontsize=22)
-        plt.title(r'\textbf{' + attribute + r' vs. Bound sizes}', fontsize=24)
-
-
-        # Adjust the margins for labels
-        plt.subplots_adjust(left=0.15, right=0.9, top=0.9, bottom=0.15)
-
-        plt.xticks(fontsize=20)
-        plt.yticks(fontsize=20)
-        plt.grid(True)
-
-        # Save the plot in the "metrics_general" directory
+# Configuration
+# True: the text of the plots is rendered by LaTeX (needs a TeX installation and starts a LaTeX process for every label),
+# False: the text is rendered by mathtext of matplotlib
+usetex_TF = False
+# True: one figure for each metric (<metric>_plot.png)
+single_plots_TF = True
+# True: one figure with all metrics (all_metrics_plot.png)
+combined_plot_TF = True
+
+# Plot and save graphs for each attribute (Agg canvas, in parallel with --jobs)
+metrics_to_plot = {attribute: [float(value) for value in values] for attribute, values in metrics_dict.items() if attribute != "name_of_test"}
+
+plot_tasks = []
+if single_plots_TF:
+    for attribute, values in metrics_to_plot.items():
         plot_filename = os.path.join(metrics_general_dir, f"{attribute}_plot.png")
-        plt.savefig(plot_filename)
-        plt.close()
+        plot_tasks.append((plot_metric_vs_bound, (sorted_suffix_values, values, attribute, plot_filename, usetex_TF)))
+
+if combined_plot_TF:
+    plot_filename = os.path.join(metrics_general_dir, "all_metrics_plot.png")
+    plot_tasks.append((plot_all_metrics_vs_bound, (sorted_suffix_values, metrics_to_plot, plot_filename, usetex_TF)))
 
+render_plots(plot_tasks, jobs)
 
 print("Plots saved in the 'metrics_general' directory.")
 #===================================================================================
@@ -7,13 +7,12 @@
 # 3. Read voxel grids of ground truth and estimated (colmap)
 # 4. Extract from the voxels the coordinates and the values from both ground truth and colmap
 # 5. Extract from the coordinates the ground truth and colmap centers
-#    and create the respective point clouds
  
 #########################  VOXEL MATCHING WITH BOUNDARIES   #########################
 ## TEST_1: VOXEL MATCHING COLMAP -> GROUND TRUTH (based on center w boundaries)
 ## COLMAP
 # 6. Find voxels in estimate that exist in ground truth (based on center w boundaries)
-# 7. Convert matched voxel coords to point cloud and voxel grid
+# 7. Convert matched voxel coords to voxel grid
 # 8. Color found voxels with original (green) and not found with red
 # 9. Print and save comparison metrics for matching (based on center w boundaries)
 
@@ -28,12 +27,13 @@
 #===================================================================================
 #===================================================================================
 #===================================================================================
-import open3d as o3d
 import numpy as np
-from scipy.spatial import distance
+from voxel_matching import build_center_tree, get_chunk_size, match_centers_w_bound, match_centers_w_bound_dense, select_matching_engine
+from ply_io import read_voxel_grid_arrays
+from voxel_grid_utils import get_voxel_centers, create_voxel_grid, get_distance_colors, get_found_colors, get_random_colors
+from distance_plots import save_distance_plots
+from visualization_sink import draw_geometries, read_headless_argument
 import matplotlib.pyplot as plt
-from matplotlib.colors import Normalize
-from matplotlib.cm import ScalarMappable
 import os
 import sys
 
@@ -50,9 +50,32 @@ print("Importing modules and reading arguments\n")
 
 print("Reading arguments")
 
+# Read the optional --headless <skip|save|show> (it can be placed anywhere after the script name)
+# Visualizations are skipped or saved to files instead of opening viewer windows (also for the scripts run by this one)
+read_headless_argument(sys.argv)
+
+# Read the optional --workers <number_of_workers> (it can be placed anywhere after the script name)
+# Number of worker processes used for matching, the results are the same for any number of workers
+workers = 1 # default value
+
+if "--workers" in sys.argv:
+    position_workers = sys.argv.index("--workers")
+    try:
+        workers = int(sys.argv[position_workers + 1])
+    except (IndexError, ValueError):
+        print("Error: --workers must be followed by a valid integer")
+        sys.exit(1)
+
+    if workers < 1:
+        print("Error: --workers must be at least 1")
+        sys.exit(1)
+
+    # Remove the option so that the rest of the arguments keep their positions
+    del sys.argv[position_workers:position_workers + 2]
+
 if len(sys.argv) < 5 or len(sys.argv) > 7:
     print("Length of arguments: ", len(sys.argv))
-    print("Usage: python compare_voxel_grid_colmap.py 1<path_to_gt_voxel_grid> 2<path_to_colmap_voxel_grid>  3<voxel_size> 4<bound> 5<random_colors_TF>(true or false) 6<color_map_value>")
+    print("Usage: python compare_voxel_grid_colmap.py 1<path_to_gt_voxel_grid> 2<path_to_colmap_voxel_grid>  3<voxel_size> 4<bound> 5<random_colors_TF>(true or false) 6<color_map_value> [--workers <number_of_workers>] [--headless <skip|save|show>]")
     sys.exit(1)
 
 # Read voxel grid of ground truth 
@@ -61,7 +84,7 @@ path_to_gt_voxel_grid = sys.argv[1]
 if not os.path.exists(path_to_gt_voxel_grid):
     raise FileNotFoundError(f"The ground truth file '{path_to_gt_voxel_grid}' does not exist. Please provide a valid path.")
 
-voxel_grid_gt = o3d.io.read_voxel_grid(path_to_gt_voxel_grid)
+coords_gt, colors_gt, voxel_size_gt, origin_gt = read_voxel_grid_arrays(path_to_gt_voxel_grid)
 
 # Read voxel grid of colmap 
 path_to_colmap_voxel_grid = sys.argv[2]
@@ -69,10 +92,10 @@ path_to_colmap_voxel_grid = sys.argv[2]
 if not os.path.exists(path_to_colmap_voxel_grid):
     raise FileNotFoundError(f"The colmap file '{path_to_colmap_voxel_grid}' does not exist. Please provide a valid path.")
 
-voxel_grid_colmap = o3d.io.read_voxel_grid(path_to_colmap_voxel_grid)
+coords_colmap, colors_colmap, voxel_size_colmap, origin_colmap = read_voxel_grid_arrays(path_to_colmap_voxel_grid)
 
-# voxel_size: It is used when converting centers to point cloud and creating the
-# corresponding voxel grid
+# voxel_size: It is used for naming the metrics folder, the voxel grids that are created
+# from the matched voxels keep the voxel size and origin of the input voxel grids
 # Attempt to convert voxel_size (third argument) to a float
 try:
     voxel_size = float(sys.argv[3])
@@ -130,21 +153,6 @@ print("=========================================================================
 print("==============================================================================================")
 print("Section: 1 | " + script_name)
 print("Defining functions\n")
-# In: An numpy array that contains numpy arrays that each represent a point
-# Out: Removes all dublicates and returns the array, the amount of the dublicates, the corresponding indices of the uniques
-def remove_duplicate_points_and_count(arr):
-    unique_values, unique_indices = np.unique(arr, axis=0, return_index=True)
-    
-    # Create a mask to select only the first occurrence of each unique point
-    mask = np.full(len(arr), False)
-    mask[unique_indices] = True
-    
-    # Remove duplicates and get the count of duplicates
-    unique_points = arr[mask]
-    num_duplicates = len(arr) - len(unique_points)
-    
-    return unique_points, num_duplicates, unique_indices
-
 # Function to extract parent folder and filename
 def extract_folder_and_filename(path):
     folder = os.path.dirname(path)
@@ -159,6 +167,10 @@ def create_png_path(folder, filename):
 # Function to create absolute file path with ".png" extension
 def create_png_path_2(folder, filename):
     return os.path.join(folder, filename + "_color_points.png")
+
+# Function to create absolute file path with ".png" extension (histogram of the distances)
+def create_png_path_3(folder, filename):
+    return os.path.join(folder, filename + "_histogram.png")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -178,20 +190,25 @@ print("Configuration\n")
 debug = False # For visualizations
 debug2 = False # For terminal prints
 
-# Get half voxel
-voxel_half = voxel_size / 2
-
-# Set corner offsets
-corner_offsets = np.array([
-    [-voxel_half, -voxel_half, -voxel_half],
-    [voxel_half, -voxel_half, -voxel_half],
-    [-voxel_half, voxel_half, -voxel_half],
-    [voxel_half, voxel_half, -voxel_half],
-    [-voxel_half, -voxel_half, voxel_half],
-    [voxel_half, -voxel_half, voxel_half],
-    [-voxel_half, voxel_half, voxel_half],
-    [voxel_half, voxel_half, voxel_half]
-])
+# Memory budget (MB) for the candidate pairs of matching w boundaries, the voxels are processed in chunks
+# that fit in the budget (None: all voxels at once, fastest for small voxel grids)
+memory_budget_mb = 2048
+
+# Seed of the random colors (random colors and random variations of red), None: different colors at each run
+random_seed = None
+rng = np.random.default_rng(random_seed)
+
+# Distance plots: "histogram" (default): histogram, cumulative distribution and percentiles of the distances (<name>_histogram.png)
+# and the colors of the sorted distances with a fixed number of columns (<name>_color_points.png), the same render time for any number of voxels
+# "scatter": scatterplot of every distance vs. its index (<name>_scatterplot.png) and the color of every voxel (<name>_color_points.png)
+distance_plots_mode = "histogram"
+
+# Matching engine w boundaries: "auto" (dense if the ground truth voxel grid fills enough of its bounding box, otherwise kdtree),
+# "kdtree" (search the ground truth voxels around each center) or "dense" (distance transform on a 3D array of the ground truth voxels,
+# needs voxel grids with the same voxel size)
+matching_engine = "auto"
+# Minimum ratio of occupied voxels in the bounding box of the ground truth voxel grid for "auto" to select "dense"
+dense_fill_ratio = 0.1
 
 # Extract parent folder and name of colmap voxel_grids
 parent_folder_colmap, filename_colmap = extract_folder_and_filename(path_to_colmap_voxel_grid)
@@ -223,6 +240,7 @@ if not os.path.exists(file_path_metrics):
 # Used to save the scatterplot
 path_colmap_scatterplot =  create_png_path(file_path_metrics, filename_colmap)
 path_colmap_color_points = create_png_path_2(file_path_metrics, filename_colmap)
+path_colmap_histogram = create_png_path_3(file_path_metrics, filename_colmap)
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -242,15 +260,18 @@ print("arg0: groundtruth, arg1: colmap")
 
 # Visualize voxel grids
 if debug:
+    # Voxel grids only for the visualization
+    voxel_grid_gt = create_voxel_grid(coords_gt, colors_gt, voxel_size_gt, origin_gt)
+    voxel_grid_colmap = create_voxel_grid(coords_colmap, colors_colmap, voxel_size_colmap, origin_colmap)
     print("Visualizing ground truth voxel grid...")
-    o3d.visualization.draw_geometries([voxel_grid_gt])
+    draw_geometries([voxel_grid_gt], "voxel_grid_gt")
     print("Visualizing colmap voxel grid...")
-    o3d.visualization.draw_geometries([voxel_grid_colmap])
+    draw_geometries([voxel_grid_colmap], "voxel_grid_colmap")
     print("Visualizing combined ground truth (blue) and colmap (green) voxel grids...")
-    o3d.visualization.draw_geometries([voxel_grid_gt, voxel_grid_colmap])
+    draw_geometries([voxel_grid_gt, voxel_grid_colmap], "voxel_grid_gt")
 
-print("Ground truth voxel grid: ", voxel_grid_gt)
-print("Colmap voxel grid: ", voxel_grid_colmap)
+print("Ground truth voxel grid: VoxelGrid with {} voxels (voxel size: {})".format(len(coords_gt), voxel_size_gt))
+print("Colmap voxel grid: VoxelGrid with {} voxels (voxel size: {})".format(len(coords_colmap), voxel_size_colmap))
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -266,40 +287,13 @@ print("=========================================================================
 print("Section: 4 | " + script_name)
 print("Extract from the voxels the coordinates and the values from both ground truth and estimate (colmap)\n")
 
-# Get ground truth voxels
-voxels_gt = voxel_grid_gt.get_voxels()
+# The grid indices and the colors (uint8) were read as numpy arrays,
+# the values are the colors in [0, 1] (the same as voxel.color)
+values_gt = colors_gt / 255.0
+values_colmap = colors_colmap / 255.0
 
-# Initialize lists to store coords and colors of the ground truth voxels
-coords_gt_list = []
-values_gt_list = []
-
-# Get coords and colors
-for voxel in voxels_gt:
-    coords_gt_list.append(voxel.grid_index)
-    values_gt_list.append(voxel.color)
-    
-# Transform lists to np arrays    
-coords_gt = np.asarray(coords_gt_list)
-values_gt = np.asarray(values_gt_list)
-
-# Get colmap voxels
-voxels_colmap = voxel_grid_colmap.get_voxels()
-
-# Initialize lists to store coords and colors of the colmap voxels
-coords_colmap_list = []
-values_colmap_list = []
-
-# Get coords and colors
-for voxel in voxels_colmap:
-    coords_colmap_list.append(voxel.grid_index)
-    values_colmap_list.append(voxel.color)
-    
-# Transform lists to np arrays   
-coords_colmap = np.asarray(coords_colmap_list)
-values_colmap = np.asarray(values_colmap_list)   
-
-print("Number of ground truth coordinates: ", len(coords_gt_list))
-print("Number of colmap coordinates: ", len(coords_colmap_list))
+print("Number of ground truth coordinates: ", len(coords_gt))
+print("Number of colmap coordinates: ", len(coords_colmap))
 
 #===================================================================================
 #===================================================================================
@@ -307,8 +301,6 @@ print("Number of colmap coordinates: ", len(coords_colmap_list))
 
 # Section: 5
 # Extract from the coordinates the ground truth and colmap centers
-# and create the respective point clouds
-# Build voxel grids
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -316,103 +308,19 @@ print("\n")
 print("==============================================================================================")
 print("==============================================================================================")
 print("Section: 5 | " + script_name)
-print("Extract from the coordinates the ground truth and colmap centers")
-print("and create the respective point clouds")
-print("Build voxel grids")
+print("Extract from the coordinates the ground truth and colmap centers\n")
 
 ## Get centers gt
-# Initialize centers array to store centers for each voxel of the ground truth
-centers_gt = []
-
 print("Getting ground truth centers....")
 
 # Get centers of ground truth
-for i, coord in enumerate(coords_gt):
-    # Get voxel center
-    vox_center = voxel_grid_gt.get_voxel_center_coordinate(coord)
-    # Append center
-    centers_gt.append(vox_center)
-
-# Convert list to numpy array
-centers_gt = np.asarray(centers_gt)
-
-# Replicate centers 8 times
-centers_gt_8 = []
-for center in centers_gt:
-    for i in range(8):
-        centers_gt_8.append(center)
-        
-# Convert list to np array
-centers_gt_8 = np.asarray(centers_gt_8)
-
-# Replicate corner offsets len(centers_gt) times
-corner_offsets_gt_8 = []
-
-for i in range(len((centers_gt))):
-    for point_offset in corner_offsets:
-        corner_offsets_gt_8.append(point_offset)
-        
-# Transform list to np array    
-corner_offsets_gt_8 = np.asarray(corner_offsets_gt_8)
-
-# Calculate the corner points
-corner_points_gt = centers_gt_8 + corner_offsets_gt_8
-
-unique_points_gt, num_duplicates_gt, unique_indices_gt = remove_duplicate_points_and_count(corner_points_gt)
-
-## Create ground truth point cloud
-# Initialize a point cloud
-point_cloud_gt = o3d.geometry.PointCloud()
-
-# Set the points to the unique points
-point_cloud_gt.points = o3d.utility.Vector3dVector(unique_points_gt)
+centers_gt = get_voxel_centers(coords_gt, voxel_size_gt, origin_gt)
 
 ## Get centers colmap
-# Initialize centers array to store centers for each voxel of the ground truth
-centers_colmap = []
-
 print("Getting colmap centers....")
 
 # Get centers of colmap
-for i, coord in enumerate(coords_colmap):
-    # Get voxel center
-    vox_center = voxel_grid_colmap.get_voxel_center_coordinate(coord)
-    # Append center
-    centers_colmap.append(vox_center)
-
-# Convert list to numpy array
-centers_colmap = np.asarray(centers_colmap)
-
-# Replicate centers 8 times
-centers_colmap_8 = []
-for center in centers_colmap:
-    for i in range(8):
-        centers_colmap_8.append(center)
-        
-# Convert list to np array
-centers_colmap_8 = np.asarray(centers_colmap_8)
-
-# Replicate corner offsets len(centers_colmap) times
-corner_offsets_8 = []
-
-for i in range(len((centers_colmap))):
-    for point_offset in corner_offsets:
-        corner_offsets_8.append(point_offset)
-        
-# Transform list to np array    
-corner_offsets_8 = np.asarray(corner_offsets_8)
-
-# Calculate the corner points
-corner_points_colmap = centers_colmap_8 + corner_offsets_8
-
-unique_points_colmap, num_duplicates, unique_indices_colmap = remove_duplicate_points_and_count(corner_points_colmap)
-
-## Create colmap point cloud
-# Initialize a point cloud
-point_cloud_colmap = o3d.geometry.PointCloud()
-
-# Set the points to the unique points
-point_cloud_colmap.points = o3d.utility.Vector3dVector(unique_points_colmap)
+centers_colmap = get_voxel_centers(coords_colmap, voxel_size_colmap, origin_colmap)
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -432,62 +340,34 @@ print("TEST_1: VOXEL MATCHING COLMAP -> GROUND TRUTH (based on center w boundari
 print("COLMAP")
 print("Find voxels in estimate that exist in ground truth (based on center w boundaries)\n")
 
-# Intialize empty list to store T/F for all estimate voxels
-# T: Found in ground truth, F: Not found in groudn truth
-found_voxels_TF_colmap_w_bound = []
-
 # Get number of centers in ground truth
 num_gt_centers = len(centers_gt)
 
 # Get number of centers in colmap
 num_colmap_centers = len(centers_colmap)
 
-# Initialize distances array to store minimum distance for each voxel in estimate
-distances_colmap_w_bound = np.empty(num_colmap_centers)
+# Build the KD-tree of the ground truth centers
+tree_gt = build_center_tree(centers_gt)
 
-# Initialize distance_index array to store for each voxel in estimate
-# the index of the voxel in ground truth that corresponds to the minimum distance  
-distance_index_colmap_w_bound = np.empty(num_colmap_centers, dtype=int)
+# Number of colmap voxels processed at once so that the candidate pairs fit in memory_budget_mb
+chunk_size = get_chunk_size(len(centers_gt), bound, voxel_size_gt, memory_budget_mb, workers)
 
-# Bound is set
-    
-# Loop through each center in centers_colmap
-for i in range(num_colmap_centers):
-    colmap_center = centers_colmap[i]
-    
-    # Variable to check if found voxel within bounds
-    found_within_bounds = False
-    
-    # Initialize list to store the distances with boundaries
-    dist_to_ground_truth_w_bound = []
-    
-    # Compute distances between colmap_center and all centers in centers_gt
-    # with boundary
-    for gt_center in centers_gt:
-        
-        if (colmap_center[0] - bound <= gt_center[0] <= colmap_center[0] + bound and colmap_center[1] - bound <= gt_center[1] <= colmap_center[1] + bound and colmap_center[2] - bound <= gt_center[2] <= colmap_center[2] + bound):
-            dist_to_ground_truth_w_bound.append(distance.euclidean(colmap_center, gt_center))
-            found_within_bounds = True
-        else:
-            dist_to_ground_truth_w_bound.append(bound)
-            
-    dist_to_ground_truth_w_bound = np.array(dist_to_ground_truth_w_bound)
-    
-    # Find the index of the closest center from centers_gt
-    min_distance_index = np.argmin(dist_to_ground_truth_w_bound)
-    
-    # Store the closest distance and index
-    distances_colmap_w_bound[i] = dist_to_ground_truth_w_bound[min_distance_index]
-    distance_index_colmap_w_bound[i] = min_distance_index
-    
-    # Check if all voxels in estimated are out of the bounds
-    if found_within_bounds:
-        found_voxels_TF_colmap_w_bound.append(True)
-    else:
-        found_voxels_TF_colmap_w_bound.append(False)
-    
-# Convert the list to a NumPy array for easier manipulation
-found_voxels_TF_colmap_w_bound = np.array(found_voxels_TF_colmap_w_bound)
+# Find for each center in centers_colmap the centers in centers_gt inside the bound
+# found_voxels_TF_colmap_w_bound: T: Found in ground truth, F: Not found in ground truth
+# distances_colmap_w_bound: minimum distance for each voxel in estimate
+# (voxels of ground truth outside of the bound have distance bound)
+# distance_index_colmap_w_bound: for each voxel in estimate the index of the voxel in ground truth
+# that corresponds to the minimum distance
+# Select the matching engine (both give the same results)
+if matching_engine == "auto":
+    matching_engine = select_matching_engine(centers_colmap, centers_gt, coords_gt, voxel_size_gt, bound, memory_budget_mb, dense_fill_ratio)
+
+print("Matching engine: ", matching_engine)
+
+if matching_engine == "dense":
+    found_voxels_TF_colmap_w_bound, distances_colmap_w_bound, distance_index_colmap_w_bound = match_centers_w_bound_dense(centers_colmap, centers_gt, coords_gt, voxel_size_gt, bound, bound)
+else:
+    found_voxels_TF_colmap_w_bound, distances_colmap_w_bound, distance_index_colmap_w_bound = match_centers_w_bound(centers_colmap, centers_gt, bound, bound, tree_gt, chunk_size, workers)
 
 # Get number of found voxels
 true_count_colmap_w_bound = np.sum(found_voxels_TF_colmap_w_bound)
@@ -508,7 +388,7 @@ values_colmap_found_w_bound = values_colmap[found_voxels_TF_colmap_w_bound]
 ## Section: 7
 ## TEST_1: VOXEL MATCHING COLMAP -> GROUND TRUTH (based on center w boundaries)
 ## COLMAP
-# Convert matched voxel coords to point cloud and voxel grid
+# Convert matched voxel coords to voxel grid
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -518,110 +398,28 @@ print("=========================================================================
 print("Section: 7 | " + script_name)
 print("TEST_1: VOXEL MATCHING COLMAP -> GROUND TRUTH (based on center w boundaries)")
 print("COLMAP")
-print("Convert matched voxel coords to point cloud and voxel grid\n")
+print("Convert matched voxel coords to voxel grid\n")
 
 ## Get centers of found voxels in ground truth
-# Initialize center array to store centers for each voxel
-centers_found_colmap_w_bound = []
-
 print("Getting centers of found voxels (based on center w boundaries)...")
 
-# Get centers
-for i, coord in enumerate(coords_colmap_found_w_bound):
-    # Get voxel center
-    vox_center = voxel_grid_colmap.get_voxel_center_coordinate(coord)
-    # Append center
-    centers_found_colmap_w_bound.append(vox_center)
+# Get centers of the found voxels
+centers_found_colmap_w_bound = centers_colmap[found_voxels_TF_colmap_w_bound]
 
 print("Number of found centers in estimate: ", len(centers_found_colmap_w_bound))
 
-# Convert list to numpy array
-centers_found_colmap_w_bound = np.asarray(centers_found_colmap_w_bound)
-
-# Replicate centers 8 times
-centers_found_colmap_w_bound_8 = []
-
-for center in centers_found_colmap_w_bound:
-    for i in range(8):
-        centers_found_colmap_w_bound_8.append(center)
-
-if debug2:
-    print("Length of centers_found_colmap_w_bound_8: ", len(centers_found_colmap_w_bound_8))
-
-# Convert list to np array
-centers_found_colmap_w_bound_8 = np.asarray(centers_found_colmap_w_bound_8)
-
-# Replicate corner offsets len(coords_gt_found) times
-corner_offsets_found_colmap_w_bound_8 = []
-
-for i in range(len((coords_colmap_found_w_bound))):
-    for point_offset in corner_offsets:
-        corner_offsets_found_colmap_w_bound_8.append(point_offset)
-
-# Transform list to np array    
-corner_offsets_found_colmap_w_bound_8 = np.asarray(corner_offsets_found_colmap_w_bound_8)
-
-# Calculate the corner points
-corner_points_found_colmap_w_bound = centers_found_colmap_w_bound_8 + corner_offsets_found_colmap_w_bound_8
-
-if debug2:
-    print("len(corner_points_found_colmap_w_bound): ", len(corner_points_found_colmap_w_bound))
-
-
-unique_points_found_colmap_w_bound, num_duplicates_colmap_w_bound, unique_indices_found_colmap_w_bound = remove_duplicate_points_and_count(corner_points_found_colmap_w_bound)
-
-if debug2:
-    print("Number of duplicates found at colmap w bound: ", num_duplicates_colmap_w_bound)
-
-# Initialize a point cloud
-point_cloud_colmap_w_bound = o3d.geometry.PointCloud()
-
-# Set the points to the unique points
-point_cloud_colmap_w_bound.points = o3d.utility.Vector3dVector(unique_points_found_colmap_w_bound)
-
-# Sets random colors at the point cloud and voxel grid
+# Sets random colors at the voxel grid
 if random_colors_TF:
-    # Generate random colors for each point in the point cloud 
-    # Get number of points
-    num_points = len(point_cloud_colmap_w_bound.points)
-    # Generate random color for each point
-    colors = np.random.randint(0, 255, size=(num_points, 3), dtype=np.uint8)
-    # Set the colors to the point cloud
-    point_cloud_colmap_w_bound.colors = o3d.utility.Vector3dVector(colors / 255.0)  # Normalize the colors to the range [0, 1]
-# Sets colors at the point cloud and voxel grid from the ground truth
+    # Generate random color for each voxel
+    colors_found_colmap_w_bound = get_random_colors(len(centers_found_colmap_w_bound), rng)
+# Sets colors at the voxel grid from the colmap
 else:
-    # Initialize list to store replicated values 
-    values_colmap_found_w_bound_8 = []
-
-    # Iterate through each value (color) found
-    for index, value in enumerate(values_colmap_found_w_bound):
-        # Repeat 8 times
-        for i in range(8):
-            values_colmap_found_w_bound_8.append(value)
-
-    if debug2:    
-        print("len(values_colmap_found_w_bound_8: ", len(values_colmap_found_w_bound_8))
-
-    # Convert list to numpy array
-    values_colmap_found_w_bound_8 = np.asarray(values_colmap_found_w_bound_8)
-    
-    # Create a mask to select only the first occurrence of each unique point
-    mask = np.full(len(values_colmap_found_w_bound_8), False)
-    mask[unique_indices_found_colmap_w_bound] = True
-    
-    # Remove duplicates and get the count of duplicates
-    values_colmap_found_w_bound_8 = values_colmap_found_w_bound_8[mask]
-    
-    point_cloud_colmap_w_bound.colors = o3d.utility.Vector3dVector(values_colmap_found_w_bound_8) 
-    
-if debug:
-    o3d.visualization.draw_geometries([point_cloud_colmap_w_bound])
-
-# Create a VoxelGrid from the PointCloud
-voxel_grid_colmap_w_bound = o3d.geometry.VoxelGrid.create_from_point_cloud(point_cloud_colmap_w_bound, voxel_size)
+    colors_found_colmap_w_bound = values_colmap_found_w_bound
 
 if debug:
-    o3d.visualization.draw_geometries([voxel_grid_colmap_w_bound])
+    # Create a VoxelGrid directly from the grid indices of the found voxels
+    voxel_grid_colmap_w_bound = create_voxel_grid(coords_colmap[found_voxels_TF_colmap_w_bound], colors_found_colmap_w_bound, voxel_size_colmap, origin_colmap)
+    draw_geometries([voxel_grid_colmap_w_bound], "voxel_grid_colmap_w_bound")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -644,59 +442,14 @@ print("Color found voxels with original (green) and not found with red\n")
 ## Get centers gt
 # #5
     
-# Initialize color list for storing color values of found and not found ground truth voxels
-colors_test6_21 = []
-
-# Iterate through all voxels of ground truth T/F
-for index, is_true in enumerate(found_voxels_TF_colmap_w_bound):
-    if is_true:
-        # Append original color (green)
-        colors_test6_21.append(values_colmap[index])
-    else:
-        # Append modified color (red)
-        colors_test6_21.append(np.array([1.0, 0.0, 0.0]))
-    
-# Convert list to numpy array
-colors_test6_21 = np.asarray(colors_test6_21)
-
-# Initialize a point cloud
-point_cloud_colmap_w_bound_color = o3d.geometry.PointCloud()
-
-# Set the points to the unique points
-point_cloud_colmap_w_bound_color.points = o3d.utility.Vector3dVector(unique_points_found_colmap_w_bound)
-
-# Initialize list to store replicated values 
-values_colmap_w_bound_8 = []
-
-# Iterate through each value(color) found
-for index, value in enumerate(colors_test6_21):
-    # Repeat 8 times
-    for i in range(8):
-        values_colmap_w_bound_8.append(value)
-
-if debug2:    
-    print("len(values_colmap_w_bound_8): ", len(values_colmap_w_bound_8))
-
-# Convert list to numpy array
-values_colmap_w_bound_8 = np.asarray(values_colmap_w_bound_8)
-
-# Create a mask to select only the first occurrence of each unique point
-mask = np.full(len(values_colmap_w_bound_8), False)
-mask[unique_indices_found_colmap_w_bound] = True
-
-# Remove duplicates and get the count of duplicates
-values_colmap_w_bound_8 = values_colmap_w_bound_8[mask]
-
-point_cloud_colmap_w_bound_color.colors = o3d.utility.Vector3dVector(values_colmap_w_bound_8) 
+# Color all voxels of ground truth T/F at once: found with original color (blue),
+# not found with red
+colors_test6_21 = get_found_colors(found_voxels_TF_colmap_w_bound, values_colmap)
 
 if debug:
-    o3d.visualization.draw_geometries([point_cloud_colmap_w_bound_color])
-
-# Create a VoxelGrid from the PointCloud
-voxel_grid_colmap_w_bound_color = o3d.geometry.VoxelGrid.create_from_point_cloud(point_cloud_colmap_w_bound_color, voxel_size)
-
-if debug:
-    o3d.visualization.draw_geometries([voxel_grid_colmap_w_bound_color])
+    # Create a VoxelGrid directly from the grid indices of all colmap voxels
+    voxel_grid_colmap_w_bound_color = create_voxel_grid(coords_colmap, colors_test6_21, voxel_size_colmap, origin_colmap)
+    draw_geometries([voxel_grid_colmap_w_bound_color], "voxel_grid_colmap_w_bound_color")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -717,11 +470,11 @@ print("COLMAP")
 print("Print and save comparison metrics for matching (based on center w boundaries)")
 
 print("#Voxels at ground truth: ", len(coords_gt))
-print("#Voxels at estimate: ", len(voxels_colmap))
+print("#Voxels at estimate: ", len(coords_colmap))
 print("#Voxels matched at colmap: ", len(coords_colmap_found_w_bound))
 
 print("%Voxels matched at colmap: {:.2f}%".format((len(coords_colmap_found_w_bound)/len(coords_colmap))*100))
-print("%Voxels matched at colmap (%Precision = TP / (TP + FP) * 100): {:.2f}%".format((len(coords_colmap_found_w_bound)/len(voxels_colmap))*100))
+print("%Voxels matched at colmap (%Precision = TP / (TP + FP) * 100): {:.2f}%".format((len(coords_colmap_found_w_bound)/len(coords_colmap))*100))
 print("Recall = TP/(TP+FN): {:.2f}".format(len(coords_colmap_found_w_bound)/(len(coords_colmap_found_w_bound) + (len(coords_gt) - len(coords_colmap_found_w_bound)))))
 
 # Saving 
@@ -735,13 +488,14 @@ content = """
 # COLMAP %Voxels matched at colmap: {:.2f}%
 # COLMAP Recall = TP/(TP+FN): {:.2f}
 # END COLMAP MATCH
-""".format(len(coords_gt), len(voxels_colmap), len(coords_colmap_found_w_bound), (len(coords_colmap_found_w_bound)/len(voxels_colmap))*100, len(coords_colmap_found_w_bound)/(len(coords_colmap_found_w_bound) + (len(coords_gt) - len(coords_colmap_found_w_bound))))
+""".format(len(coords_gt), len(coords_colmap), len(coords_colmap_found_w_bound), (len(coords_colmap_found_w_bound)/len(coords_colmap))*100, len(coords_colmap_found_w_bound)/(len(coords_colmap_found_w_bound) + (len(coords_gt) - len(coords_colmap_found_w_bound))))
 
-# Specify the file path
-file_path_data = os.path.join(file_path_metrics, str(id_current_object) + "_data.txt")
+# Specify the file path (<id>_data_colmap.txt, its own file so that it can run at the same time as compare_voxel_grid_gt.py,
+# compare_voxel_grid_pair.py writes both directions in <id>_data.txt)
+file_path_data = os.path.join(file_path_metrics, str(id_current_object) + "_data_colmap.txt")
 
 # Write the content to the file
-with open(file_path_data, 'a') as file:
+with open(file_path_data, 'w') as file:
     file.write(content)
 
 #===================================================================================
@@ -772,93 +526,54 @@ maximum_distance_colmap_w_bound = np.max(distances_colmap_w_bound)
 ## Convert distances into colors
 print("Converting distances into colors...")
 
-# Define the colormap 
-cmap = plt.get_cmap(color_map_value)  
-
-# Normalize distances to [0, 1] to map them to the colormap
-norm = plt.Normalize(minimum_distance_colmap_w_bound, maximum_distance_colmap_w_bound)
-
-# Create a list of RGB values for each distance
-colors = [cmap(norm(distance)) for distance in distances_colmap_w_bound]
-
-# Convert the list of RGB values to a numpy array
-color_array_colmap = np.array(colors)
+# Map all the distances to RGB colors at once (normalized between the minimum and maximum distance)
+color_array_colmap = get_distance_colors(distances_colmap_w_bound, color_map_value)
 
 # Print the color array
 if debug2:
     print(color_array_colmap)
 
-# Saving scatter plot
-# Scatterplot
-plt.scatter(distances_colmap_w_bound, np.arange(len(distances_colmap_w_bound)), c=color_array_colmap)
-plt.xlabel("Colmap | Distances with boundaries")
-plt.ylabel("Index")
-# plt.show()
-#plt.savefig("colmap_scatterplot.png")  
-plt.savefig(path_colmap_scatterplot)
-plt.close()  
-
-print("Displaying color points")
-
-# Save the colors for visualization
-fig, ax = plt.subplots()
-ax.imshow([colors], aspect='auto')
-ax.set_xticks([])
-ax.set_yticks([])
-ax.set_title("Colmap | Distance Color Map with boundaries")
-#plt.show()
-#plt.savefig("colmap_color_points.png")
-plt.savefig(path_colmap_color_points)
-plt.close()
-
-## Convert voxel grid gt -> to points -> add color -> convert back to voxel grid
-## Convert centers to point cloud
-# #5
-
-## Add color
-# Initialize list to store replicated values 
-color_array_colmap_8 = []
-
-# Iterate through each value(color)
-for index, value in enumerate(color_array_colmap):
-    # Repeat 8 times
-    for i in range(8):
-        color_array_colmap_8.append(value)
-
-if debug2:
-    print("len(color_array_colmap_8): ", len(color_array_colmap_8))
-
-# Convert list to numpy array
-color_array_colmap_8 = np.asarray(color_array_colmap_8)
-
-# Create a mask to select only the first occurrence of each unique point
-mask = np.full(len(color_array_colmap_8), False)
-mask[unique_indices_colmap] = True
-
-# Remove duplicates
-color_array_colmap_8 = color_array_colmap_8[mask]
-
-# Extract RGB from RGBA
-color_array_colmap_8 = color_array_colmap_8[:, :3]
-
-# Set colors to point cloud
-point_cloud_colmap.colors = o3d.utility.Vector3dVector(color_array_colmap_8) 
-
+if distance_plots_mode == "histogram":
+    # Saving histogram and color points (fixed number of bins)
+    print("Saving histogram and color points")
+    save_distance_plots(distances_colmap_w_bound, color_map_value, "Colmap | Distances with boundaries", "Colmap | Distance Color Map with boundaries",
+                        path_colmap_histogram, path_colmap_color_points)
+else:
+    # Saving scatter plot
+    # Scatterplot
+    plt.scatter(distances_colmap_w_bound, np.arange(len(distances_colmap_w_bound)), c=color_array_colmap)
+    plt.xlabel("Colmap | Distances with boundaries")
+    plt.ylabel("Index")
+    # plt.show()
+    #plt.savefig("colmap_scatterplot.png")  
+    plt.savefig(path_colmap_scatterplot)
+    plt.close()  
+
+    print("Displaying color points")
+
+    # Save the colors for visualization
+    fig, ax = plt.subplots()
+    ax.imshow([color_array_colmap], aspect='auto')
+    ax.set_xticks([])
+    ax.set_yticks([])
+    ax.set_title("Colmap | Distance Color Map with boundaries")
+    #plt.show()
+    #plt.savefig("colmap_color_points.png")
+    plt.savefig(path_colmap_color_points)
+    plt.close()
+
+## Create the colmap voxel grid colored by distance directly from the grid indices
 if debug2:
-    print(len(color_array_colmap_8))
-    print(type(color_array_colmap_8))
-    print(type(color_array_colmap_8[0]))
-    print(color_array_colmap_8[0])
-
-if debug:
-    o3d.visualization.draw_geometries([point_cloud_colmap])
-
-print("Creating ground truth voxel grid from points...")
-# Create a VoxelGrid from the PointCloud
-voxel_grid_colmap = o3d.geometry.VoxelGrid.create_from_point_cloud(point_cloud_colmap, voxel_size)
+    print(len(color_array_colmap))
+    print(type(color_array_colmap))
+    print(type(color_array_colmap[0]))
+    print(color_array_colmap[0])
 
 if debug:
-    o3d.visualization.draw_geometries([voxel_grid_colmap])
+    print("Creating colmap voxel grid from grid indices...")
+    # Create a VoxelGrid directly from the grid indices
+    voxel_grid_colmap = create_voxel_grid(coords_colmap, color_array_colmap, voxel_size_colmap, origin_colmap)
+    draw_geometries([voxel_grid_colmap], "voxel_grid_colmap")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -908,7 +623,7 @@ content = """
 """.format(minimum_distance_colmap_w_bound, maximum_distance_colmap_w_bound, mae_colmap_w_bound, rmse_colmap_w_bound, mse_colmap_w_bound)
 
 # Specify the file path
-file_path_data = os.path.join(file_path_metrics, str(id_current_object) + "_data.txt")
+file_path_data = os.path.join(file_path_metrics, str(id_current_object) + "_data_colmap.txt")
 
 # Write the content to the file
 with open(file_path_data, 'a') as file:
@@ -7,13 +7,12 @@
 # 3. Read voxel grids of ground truth and estimated (colmap)
 # 4. Extract from the voxels the coordinates and the values from both ground truth and colmap
 # 5. Extract from the coordinates the ground truth and colmap centers
-#    and create the respective point clouds
 
 #########################  VOXEL MATCHING WITH BOUNDARIES   #########################
 ## TEST_1: VOXEL MATCHING GROUND TRUTH -> COLMAP (based on center w boundaries)
 ## GROUND TRUTH
 # 6. Find voxels in ground truth that exist in estimate (based on center w boundaries)
-# 7. Convert matched voxel coords to point cloud and voxel grid
+# 7. Convert matched voxel coords to voxel grid
 # 8. Color found voxels with original (blue) and not found with red
 # 9. Print and save comparison metrics for matching (based on center w boundaries)
 
@@ -28,12 +27,13 @@
 #===================================================================================
 #===================================================================================
 #===================================================================================
-import open3d as o3d
 import numpy as np
-from scipy.spatial import distance
+from voxel_matching import build_center_tree, get_chunk_size, match_centers_w_bound, match_centers_w_bound_dense, select_matching_engine
+from ply_io import read_voxel_grid_arrays
+from voxel_grid_utils import get_voxel_centers, create_voxel_grid, get_distance_colors, get_found_colors, get_random_colors
+from distance_plots import save_distance_plots
+from visualization_sink import draw_geometries, read_headless_argument
 import matplotlib.pyplot as plt
-from matplotlib.colors import Normalize
-from matplotlib.cm import ScalarMappable
 import os
 import sys
 
@@ -50,9 +50,32 @@ print("Importing modules and reading arguments\n")
 
 print("Reading arguments")
 
+# Read the optional --headless <skip|save|show> (it can be placed anywhere after the script name)
+# Visualizations are skipped or saved to files instead of opening viewer windows (also for the scripts run by this one)
+read_headless_argument(sys.argv)
+
+# Read the optional --workers <number_of_workers> (it can be placed anywhere after the script name)
+# Number of worker processes used for matching, the results are the same for any number of workers
+workers = 1 # default value
+
+if "--workers" in sys.argv:
+    position_workers = sys.argv.index("--workers")
+    try:
+        workers = int(sys.argv[position_workers + 1])
+    except (IndexError, ValueError):
+        print("Error: --workers must be followed by a valid integer")
+        sys.exit(1)
+
+    if workers < 1:
+        print("Error: --workers must be at least 1")
+        sys.exit(1)
+
+    # Remove the option so that the rest of the arguments keep their positions
+    del sys.argv[position_workers:position_workers + 2]
+
 if len(sys.argv) < 5 or len(sys.argv) > 7:
     print("Length of arguments: ", len(sys.argv))
-    print("Usage: python compare_voxel_grid_gt.py 1<path_to_gt_voxel_grid> 2<path_to_colmap_voxel_grid>  3<voxel_size> 4<bound> 5<random_colors_TF>(true or false) 6<color_map_value>")
+    print("Usage: python compare_voxel_grid_gt.py 1<path_to_gt_voxel_grid> 2<path_to_colmap_voxel_grid>  3<voxel_size> 4<bound> 5<random_colors_TF>(true or false) 6<color_map_value> [--workers <number_of_workers>] [--headless <skip|save|show>]")
     sys.exit(1)
 
 # Read arg for voxel grid of ground truth 
@@ -69,8 +92,8 @@ path_to_colmap_voxel_grid = sys.argv[2]
 if not os.path.exists(path_to_colmap_voxel_grid):
     raise FileNotFoundError(f"The colmap file '{path_to_colmap_voxel_grid}' does not exist. Please provide a valid path.")
 
-# voxel_size: It is used when converting centers to point cloud and creating the
-# corresponding voxel grid
+# voxel_size: It is used for naming the metrics folder, the voxel grids that are created
+# from the matched voxels keep the voxel size and origin of the input voxel grids
 # Attempt to convert voxel_size (third argument) to a float
 try:
     voxel_size = float(sys.argv[3])
@@ -128,21 +151,6 @@ print("=========================================================================
 print("==============================================================================================")
 print("Section: 1 | " + script_name)
 print("Defining functions\n")
-# In: An numpy array that contains numpy arrays that each represent a point
-# Out: Removes all dublicates and returns the array, the amount of the dublicates, the corresponding indices of the uniques
-def remove_duplicate_points_and_count(arr):
-    unique_values, unique_indices = np.unique(arr, axis=0, return_index=True)
-    
-    # Create a mask to select only the first occurrence of each unique point
-    mask = np.full(len(arr), False)
-    mask[unique_indices] = True
-    
-    # Remove duplicates and get the count of duplicates
-    unique_points = arr[mask]
-    num_duplicates = len(arr) - len(unique_points)
-    
-    return unique_points, num_duplicates, unique_indices
-
 # Function to extract parent folder and filename
 def extract_folder_and_filename(path):
     folder = os.path.dirname(path)
@@ -157,6 +165,10 @@ def create_png_path(folder, filename):
 # Function to create absolute file path with ".png" extension
 def create_png_path_2(folder, filename):
     return os.path.join(folder, filename + "_color_points.png")
+
+# Function to create absolute file path with ".png" extension (histogram of the distances)
+def create_png_path_3(folder, filename):
+    return os.path.join(folder, filename + "_histogram.png")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -176,20 +188,25 @@ print("Configuration\n")
 debug = False # For visualizations
 debug2 = False # For terminal prints
 
-# Get half voxel
-voxel_half = voxel_size / 2
-
-# Set corner offsets
-corner_offsets = np.array([
-    [-voxel_half, -voxel_half, -voxel_half],
-    [voxel_half, -voxel_half, -voxel_half],
-    [-voxel_half, voxel_half, -voxel_half],
-    [voxel_half, voxel_half, -voxel_half],
-    [-voxel_half, -voxel_half, voxel_half],
-    [voxel_half, -voxel_half, voxel_half],
-    [-voxel_half, voxel_half, voxel_half],
-    [voxel_half, voxel_half, voxel_half]
-])
+# Memory budget (MB) for the candidate pairs of matching w boundaries, the voxels are processed in chunks
+# that fit in the budget (None: all voxels at once, fastest for small voxel grids)
+memory_budget_mb = 2048
+
+# Seed of the random colors (random colors and random variations of red), None: different colors at each run
+random_seed = None
+rng = np.random.default_rng(random_seed)
+
+# Distance plots: "histogram" (default): histogram, cumulative distribution and percentiles of the distances (<name>_histogram.png)
+# and the colors of the sorted distances with a fixed number of columns (<name>_color_points.png), the same render time for any number of voxels
+# "scatter": scatterplot of every distance vs. its index (<name>_scatterplot.png) and the color of every voxel (<name>_color_points.png)
+distance_plots_mode = "histogram"
+
+# Matching engine w boundaries: "auto" (dense if the colmap voxel grid fills enough of its bounding box, otherwise kdtree),
+# "kdtree" (search the colmap voxels around each center) or "dense" (distance transform on a 3D array of the colmap voxels,
+# needs voxel grids with the same voxel size)
+matching_engine = "auto"
+# Minimum ratio of occupied voxels in the bounding box of the colmap voxel grid for "auto" to select "dense"
+dense_fill_ratio = 0.1
 
 # Extract parent folder and name of ground truth voxel_grid
 parent_folder_gt, filename_gt = extract_folder_and_filename(path_to_gt_voxel_grid)
@@ -222,6 +239,7 @@ if not os.path.exists(file_path_metrics):
 # Used to save the scatterplot
 path_gt_scatterplot =  create_png_path(file_path_metrics, filename_gt)
 path_gt_color_points = create_png_path_2(file_path_metrics, filename_gt)
+path_gt_histogram = create_png_path_3(file_path_metrics, filename_gt)
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -240,22 +258,25 @@ print("Read voxel grids of ground truth and estimated (colmap)\n")
 print("arg0: groundtruth, arg1: colmap")
 
 # Read voxel grid of ground truth 
-voxel_grid_gt = o3d.io.read_voxel_grid(path_to_gt_voxel_grid)
+coords_gt, colors_gt, voxel_size_gt, origin_gt = read_voxel_grid_arrays(path_to_gt_voxel_grid)
 
 # Read voxel grid of colmap
-voxel_grid_colmap = o3d.io.read_voxel_grid(path_to_colmap_voxel_grid)
+coords_colmap, colors_colmap, voxel_size_colmap, origin_colmap = read_voxel_grid_arrays(path_to_colmap_voxel_grid)
 
 # Visualize voxel grids
 if debug:
+    # Voxel grids only for the visualization
+    voxel_grid_gt = create_voxel_grid(coords_gt, colors_gt, voxel_size_gt, origin_gt)
+    voxel_grid_colmap = create_voxel_grid(coords_colmap, colors_colmap, voxel_size_colmap, origin_colmap)
     print("Visualizing ground truth voxel grid...")
-    o3d.visualization.draw_geometries([voxel_grid_gt])
+    draw_geometries([voxel_grid_gt], "voxel_grid_gt")
     print("Visualizing colmap voxel grid...")
-    o3d.visualization.draw_geometries([voxel_grid_colmap])
+    draw_geometries([voxel_grid_colmap], "voxel_grid_colmap")
     print("Visualizing combined ground truth (blue) and colmap (green) voxel grids...")
-    o3d.visualization.draw_geometries([voxel_grid_gt, voxel_grid_colmap])
+    draw_geometries([voxel_grid_gt, voxel_grid_colmap], "voxel_grid_gt")
 
-print("Ground truth voxel grid: ", voxel_grid_gt)
-print("Colmap voxel grid: ", voxel_grid_colmap)
+print("Ground truth voxel grid: VoxelGrid with {} voxels (voxel size: {})".format(len(coords_gt), voxel_size_gt))
+print("Colmap voxel grid: VoxelGrid with {} voxels (voxel size: {})".format(len(coords_colmap), voxel_size_colmap))
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -271,40 +292,13 @@ print("=========================================================================
 print("Section: 4 | " + script_name)
 print("Extract from the pcds the positions and the colors from both ground truth and estimate (colmap)")
 
-# Get ground truth voxels
-voxels_gt = voxel_grid_gt.get_voxels()
+# The grid indices and the colors (uint8) were read as numpy arrays,
+# the values are the colors in [0, 1] (the same as voxel.color)
+values_gt = colors_gt / 255.0
+values_colmap = colors_colmap / 255.0
 
-# Initialize lists to store coords and colors of the ground truth voxels
-coords_gt_list = []
-values_gt_list = []
-
-# Get coords and colors
-for voxel in voxels_gt:
-    coords_gt_list.append(voxel.grid_index)
-    values_gt_list.append(voxel.color)
-    
-# Transform lists to np arrays    
-coords_gt = np.asarray(coords_gt_list)
-values_gt = np.asarray(values_gt_list)
-
-# Get colmap voxels
-voxels_colmap = voxel_grid_colmap.get_voxels()
-
-# Initialize lists to store coords and colors of the colmap voxels
-coords_colmap_list = []
-values_colmap_list = []
-
-# Get coords and colors
-for voxel in voxels_colmap:
-    coords_colmap_list.append(voxel.grid_index)
-    values_colmap_list.append(voxel.color)
-    
-# Transform lists to np arrays   
-coords_colmap = np.asarray(coords_colmap_list)
-values_colmap = np.asarray(values_colmap_list)   
-
-print("Number of ground truth coordinates: ", len(coords_gt_list))
-print("Number of colmap coordinates: ", len(coords_colmap_list))
+print("Number of ground truth coordinates: ", len(coords_gt))
+print("Number of colmap coordinates: ", len(coords_colmap))
 
 #===================================================================================
 #===================================================================================
@@ -312,8 +306,6 @@ print("Number of colmap coordinates: ", len(coords_colmap_list))
 
 # Section: 5
 # Extract from the coordinates the ground truth and colmap centers
-# and create the respective point clouds
-# Build voxel grids
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -321,103 +313,19 @@ print("\n")
 print("==============================================================================================")
 print("==============================================================================================")
 print("Section: 5 | " + script_name)
-print("Extract from the coordinates the ground truth and colmap centers")
-print("and create the respective point clouds")
-print("Build voxel grids")
+print("Extract from the coordinates the ground truth and colmap centers\n")
 
 ## Get centers gt
-# Initialize centers array to store centers for each voxel of the ground truth
-centers_gt = []
-
 print("Getting ground truth centers....")
 
 # Get centers of ground truth
-for i, coord in enumerate(coords_gt):
-    # Get voxel center
-    vox_center = voxel_grid_gt.get_voxel_center_coordinate(coord)
-    # Append center
-    centers_gt.append(vox_center)
-
-# Convert list to numpy array
-centers_gt = np.asarray(centers_gt)
-
-# Replicate centers 8 times
-centers_gt_8 = []
-for center in centers_gt:
-    for i in range(8):
-        centers_gt_8.append(center)
-        
-# Convert list to np array
-centers_gt_8 = np.asarray(centers_gt_8)
-
-# Replicate corner offsets len(centers_gt) times
-corner_offsets_gt_8 = []
-
-for i in range(len((centers_gt))):
-    for point_offset in corner_offsets:
-        corner_offsets_gt_8.append(point_offset)
-        
-# Transform list to np array    
-corner_offsets_gt_8 = np.asarray(corner_offsets_gt_8)
-
-# Calculate the corner points
-corner_points_gt = centers_gt_8 + corner_offsets_gt_8
-
-unique_points_gt, num_duplicates_gt, unique_indices_gt = remove_duplicate_points_and_count(corner_points_gt)
-
-## Create ground truth point cloud
-# Initialize a point cloud
-point_cloud_gt = o3d.geometry.PointCloud()
-
-# Set the points to the unique points
-point_cloud_gt.points = o3d.utility.Vector3dVector(unique_points_gt)
+centers_gt = get_voxel_centers(coords_gt, voxel_size_gt, origin_gt)
 
 ## Get centers colmap
-# Initialize centers array to store centers for each voxel of the ground truth
-centers_colmap = []
-
 print("Getting colmap centers....")
 
 # Get centers of colmap
-for i, coord in enumerate(coords_colmap):
-    # Get voxel center
-    vox_center = voxel_grid_colmap.get_voxel_center_coordinate(coord)
-    # Append center
-    centers_colmap.append(vox_center)
-
-# Convert list to numpy array
-centers_colmap = np.asarray(centers_colmap)
-
-# Replicate centers 8 times
-centers_colmap_8 = []
-for center in centers_colmap:
-    for i in range(8):
-        centers_colmap_8.append(center)
-        
-# Convert list to np array
-centers_colmap_8 = np.asarray(centers_colmap_8)
-
-# Replicate corner offsets len(centers_colmap) times
-corner_offsets_8 = []
-
-for i in range(len((centers_colmap))):
-    for point_offset in corner_offsets:
-        corner_offsets_8.append(point_offset)
-        
-# Transform list to np array    
-corner_offsets_8 = np.asarray(corner_offsets_8)
-
-# Calculate the corner points
-corner_points_colmap = centers_colmap_8 + corner_offsets_8
-
-unique_points_colmap, num_duplicates, unique_indices_colmap = remove_duplicate_points_and_count(corner_points_colmap)
-
-## Create colmap point cloud
-# Initialize a point cloud
-point_cloud_colmap = o3d.geometry.PointCloud()
-
-# Set the points to the unique points
-point_cloud_colmap.points = o3d.utility.Vector3dVector(unique_points_colmap)
+centers_colmap = get_voxel_centers(coords_colmap, voxel_size_colmap, origin_colmap)
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -437,64 +345,34 @@ print("TEST_1: VOXEL MATCHING GROUND TRUTH -> COLMAP (based on center w boundari
 print("GROUND TRUTH")
 print("Find voxels in ground truth that exist in estimate (based on center w boundaries)\n")
 
-# Initialize empty list to store T/F for all ground truth voxels
-# T: Found in estimated, F: Not found in estimated
-found_voxels_TF_gt_15 = []
-
 # Get number of centers in ground truth
 num_gt_centers = len(centers_gt)
 
 # Get number of centers in colmap
 num_colmap_centers = len(centers_colmap)
 
-# Initialize distances array to store minimum distance for each voxel in ground truth
-distances_gt_w_bound = np.empty(num_gt_centers)
+# Build the KD-tree of the colmap centers
+tree_colmap = build_center_tree(centers_colmap)
 
-# Initialize distance_index array to store for each voxel in ground truth
-# the index of the voxel in colmap that corresponds to the minimum distance  
-distance_index_gt_w_bound = np.empty(num_gt_centers, dtype=int)
+# Number of ground truth voxels processed at once so that the candidate pairs fit in memory_budget_mb
+chunk_size = get_chunk_size(num_colmap_centers, bound, voxel_size_colmap, memory_budget_mb, workers)
 
-# Bound is set
-    
-# Loop through each center in centers_gt
-for i in range(num_gt_centers):
-    gt_center = centers_gt[i]
-    
-    # Variable to check if found voxel within bounds
-    found_within_bounds = False
-    
-    # Initialize list to store the distances with boundaries
-    dist_to_colmap_w_bound = []
-    
-    # Compute distances between gt_center and all centers in centers_colmap
-    for colmap_center in centers_colmap:
-        
-        if (gt_center[0] - bound <= colmap_center[0] <= gt_center[0] + bound and gt_center[1] - bound <= colmap_center[1] <= gt_center[1] + bound and gt_center[2] - bound <= colmap_center[2] <= gt_center[2] + bound):
-            dist_to_colmap_w_bound.append(distance.euclidean(gt_center, colmap_center))
-            found_within_bounds = True
-        else:
-            dist_to_colmap_w_bound.append(bound)
-            
-    dist_to_colmap_w_bound = np.array(dist_to_colmap_w_bound)
-    
-    # # Compute distances between gt_center and all centers in centers_colmap
-    # dist_to_colmap_w_bound = np.array([distance.euclidean(gt_center, colmap_center) for colmap_center in centers_colmap])
-    
-    # Find the index of the closest center from centers_colmap
-    min_distance_index = np.argmin(dist_to_colmap_w_bound)
-    
-    # Store the closest distance and index
-    distances_gt_w_bound[i] = dist_to_colmap_w_bound[min_distance_index]
-    distance_index_gt_w_bound[i] = min_distance_index
-    
-    # Check if all voxels in estimated are out of the bounds
-    if found_within_bounds:
-        found_voxels_TF_gt_15.append(True)
-    else:
-        found_voxels_TF_gt_15.append(False)
-    
-# Convert the list to a NumPy array for easier manipulation
-found_voxels_TF_gt_15 = np.array(found_voxels_TF_gt_15)
+# Find for each center in centers_gt the centers in centers_colmap inside the bound
+# found_voxels_TF_gt_15: T: Found in estimated, F: Not found in estimated
+# distances_gt_w_bound: minimum distance for each voxel in ground truth
+# (voxels of colmap outside of the bound have distance bound)
+# distance_index_gt_w_bound: for each voxel in ground truth the index of the voxel in colmap
+# that corresponds to the minimum distance
+# Select the matching engine (both give the same results)
+if matching_engine == "auto":
+    matching_engine = select_matching_engine(centers_gt, centers_colmap, coords_colmap, voxel_size_colmap, bound, memory_budget_mb, dense_fill_ratio)
+
+print("Matching engine: ", matching_engine)
+
+if matching_engine == "dense":
+    found_voxels_TF_gt_15, distances_gt_w_bound, distance_index_gt_w_bound = match_centers_w_bound_dense(centers_gt, centers_colmap, coords_colmap, voxel_size_colmap, bound, bound)
+else:
+    found_voxels_TF_gt_15, distances_gt_w_bound, distance_index_gt_w_bound = match_centers_w_bound(centers_gt, centers_colmap, bound, bound, tree_colmap, chunk_size, workers)
 
 # Get number of found voxels
 true_count_gt_15 = np.sum(found_voxels_TF_gt_15)
@@ -515,7 +393,7 @@ values_gt_found_15 = values_gt[found_voxels_TF_gt_15]
 ## Section: 7
 ## TEST_1: VOXEL MATCHING GROUND TRUTH -> COLMAP (based on center w boundaries)
 ## GROUND TRUTH
-# Convert matched voxel coords to point cloud and voxel grid
+# Convert matched voxel coords to voxel grid
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -525,114 +403,28 @@ print("=========================================================================
 print("Section: 7 | " + script_name)
 print("TEST_1: VOXEL MATCHING GROUND TRUTH -> COLMAP (based on center w boundaries)")
 print("GROUND TRUTH")
-print("Convert matched voxel coords to point cloud and voxel grid\n")
+print("Convert matched voxel coords to voxel grid\n")
 
 ## Get centers of found voxels in estimate
-# Initialize center array to store centers for each voxel
-centers_found_gt_15 = []
-
 print("Getting centers of found voxels (based on center w boundaries)...")
 
-# Get centers
-for i, coord in enumerate(coords_gt_found_15):
-    # Get voxel center
-    vox_center = voxel_grid_gt.get_voxel_center_coordinate(coord)
-    # Append center
-    centers_found_gt_15.append(vox_center)
+# Get centers of the found voxels
+centers_found_gt_15 = centers_gt[found_voxels_TF_gt_15]
 
 print("Number of found centers in ground truth: ", len(centers_found_gt_15))
 
-# Convert list to numpy array
-centers_found_gt_15 = np.asarray(centers_found_gt_15)
-
-# Replicate centers 8 times
-centers_found_gt_15_8 = []
-
-for center in centers_found_gt_15:
-    for i in range(8):
-        centers_found_gt_15_8.append(center)
-
-if debug2:
-    print("Length of centers_found_gt_15_8: ", len(centers_found_gt_15_8))
-
-# Convert list to np array
-centers_found_gt_15_8 = np.asarray(centers_found_gt_15_8)
-
-# Replicate corner offsets len(coords_gt_found) times
-corner_offsets_found_gt_15_8 = []
-
-for i in range(len((coords_gt_found_15))):
-    for point_offset in corner_offsets:
-        corner_offsets_found_gt_15_8.append(point_offset)
-
-if debug2:
-    print("len(coords_gt_found_15): ", len(coords_gt_found_15))        
-    print("len(corner_offsets_found_gt_15_8): ", len(corner_offsets_found_gt_15_8))
-
-# Transform list to np array    
-corner_offsets_found_gt_15_8 = np.asarray(corner_offsets_found_gt_15_8)
-
-# Calculate the corner points
-corner_points_found_gt_15 = centers_found_gt_15_8 + corner_offsets_found_gt_15_8
-
-if debug2:
-    print("len(corner_points_found_gt_15): ", len(corner_points_found_gt_15))
-
-
-unique_points_found_gt_15, num_duplicates_15, unique_indices_found_gt_15 = remove_duplicate_points_and_count(corner_points_found_gt_15)
-
-if debug2:
-    print("Number of duplicates found at gt 15: ", num_duplicates_15)
-
-# Initialize a point cloud
-point_cloud_gt_15 = o3d.geometry.PointCloud()
-
-# Set the points to the unique points
-point_cloud_gt_15.points = o3d.utility.Vector3dVector(unique_points_found_gt_15)
-
-# Sets random colors at the point cloud and voxel grid
+# Sets random colors at the voxel grid
 if random_colors_TF:
-    # Generate random colors for each point in the point cloud 
-    # Get number of points
-    num_points = len(point_cloud_gt_15.points)
-    # Generate random color for each point
-    colors = np.random.randint(0, 255, size=(num_points, 3), dtype=np.uint8)
-    # Set the colors to the point cloud
-    point_cloud_gt_15.colors = o3d.utility.Vector3dVector(colors / 255.0)  # Normalize the colors to the range [0, 1]
-# Sets colors at the point cloud and voxel grid from the ground truth
+    # Generate random color for each voxel
+    colors_found_gt_15 = get_random_colors(len(centers_found_gt_15), rng)
+# Sets colors at the voxel grid from the ground truth
 else:
-    # Initialize list to store replicated values 
-    values_gt_found_15_8 = []
+    colors_found_gt_15 = values_gt_found_15
 
-    # Iterate through each value (color) found
-    for index, value in enumerate(values_gt_found_15):
-        # Repeat 8 times
-        for i in range(8):
-            values_gt_found_15_8.append(value)
-
-    if debug2:    
-        print("len(values_gt_found_15_8: ", len(values_gt_found_15_8))
-
-    # Convert list to numpy array
-    values_gt_found_15_8 = np.asarray(values_gt_found_15_8)
-    
-    # Create a mask to select only the first occurrence of each unique point
-    mask = np.full(len(values_gt_found_15_8), False)
-    mask[unique_indices_found_gt_15] = True
-    
-    # Remove duplicates and get the count of duplicates
-    values_gt_found_15_8 = values_gt_found_15_8[mask]
-    
-    point_cloud_gt_15.colors = o3d.utility.Vector3dVector(values_gt_found_15_8) 
-    
 if debug:
-    o3d.visualization.draw_geometries([point_cloud_gt_15])
-
-# Create a VoxelGrid from the PointCloud
-voxel_grid_gt_15 = o3d.geometry.VoxelGrid.create_from_point_cloud(point_cloud_gt_15, voxel_size)
-
-if debug:
-    o3d.visualization.draw_geometries([voxel_grid_gt_15])
+    # Create a VoxelGrid directly from the grid indices of the found voxels
+    voxel_grid_gt_15 = create_voxel_grid(coords_gt[found_voxels_TF_gt_15], colors_found_gt_15, voxel_size_gt, origin_gt)
+    draw_geometries([voxel_grid_gt_15], "voxel_grid_gt_15")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -655,62 +447,14 @@ print("Color found voxels with original (blue) and not found with red\n")
 ## Get centers gt
 # #5
     
-# Initialize color list for storing color values of found and not found ground truth voxels
-colors_test5_17 = []
-
-# Iterate through all voxels of ground truth T/F
-for index, is_true in enumerate(found_voxels_TF_gt_15):
-    if is_true:
-        # Append original color (blue)
-        colors_test5_17.append(values_gt[index])
-    else:
-        # Append modified color (red)
-        # colors_test5_17.append(np.array([1.0, 0.0, 0.0]))
-        # Append a random variation of red
-        red_component = np.random.uniform(0.0, 1.0)   # Full red
-        colors_test5_17.append(np.array([red_component, 0.0, 0.0]))
-    
-# Convert list to numpy array
-colors_test5_17 = np.asarray(colors_test5_17)
-
-# Initialize a point cloud
-point_cloud_gt_17 = o3d.geometry.PointCloud()
-
-# Set the points to the unique points
-point_cloud_gt_17.points = o3d.utility.Vector3dVector(unique_points_gt)
-
-# Initialize list to store replicated values 
-values_gt_17_8 = []
-
-# Iterate through each value(color) found
-for index, value in enumerate(colors_test5_17):
-    # Repeat 8 times
-    for i in range(8):
-        values_gt_17_8.append(value)
-
-if debug2:    
-    print("len(values_gt_17_8): ", len(values_gt_17_8))
-
-# Convert list to numpy array
-values_gt_17_8 = np.asarray(values_gt_17_8)
-
-# Create a mask to select only the first occurrence of each unique point
-mask = np.full(len(values_gt_17_8), False)
-mask[unique_indices_gt] = True
-
-# Remove duplicates and get the count of duplicates
-values_gt_17_8 = values_gt_17_8[mask]
-
-point_cloud_gt_17.colors = o3d.utility.Vector3dVector(values_gt_17_8) 
-
-if debug:
-    o3d.visualization.draw_geometries([point_cloud_gt_17])
-
-# Create a VoxelGrid from the PointCloud
-voxel_grid_gt_17 = o3d.geometry.VoxelGrid.create_from_point_cloud(point_cloud_gt_17, voxel_size)
+# Color all voxels of ground truth T/F at once: found with original color (blue),
+# not found with a random variation of red
+colors_test5_17 = get_found_colors(found_voxels_TF_gt_15, values_gt, random_red_TF=True, rng=rng)
 
 if debug:
-    o3d.visualization.draw_geometries([voxel_grid_gt_17])
+    # Create a VoxelGrid directly from the grid indices of all ground truth voxels
+    voxel_grid_gt_17 = create_voxel_grid(coords_gt, colors_test5_17, voxel_size_gt, origin_gt)
+    draw_geometries([voxel_grid_gt_17], "voxel_grid_gt_17")
 #===================================================================================
 #===================================================================================
 #==================================================================================
@@ -732,7 +476,7 @@ print("Print and save comparison metrics for matching (based on center w boundar
 
 # Printing
 print("#Voxels at ground truth: ", len(coords_gt))
-print("#Voxels at estimate: ", len(voxels_colmap))
+print("#Voxels at estimate: ", len(coords_colmap))
 print("#Voxels matched: ", len(coords_gt_found_15))
 print("%Voxels matched: {:.2f}%".format((len(coords_gt_found_15)/len(coords_gt))*100))
 print("")
@@ -746,10 +490,11 @@ content = """# START GT MATCH
 # GT Voxels matched: {}
 # GT %Voxels matched: {:.2f}%
 # END GT MATCH
-""".format(len(coords_gt), len(voxels_colmap), len(coords_gt_found_15), (len(coords_gt_found_15)/len(coords_gt))*100)
+""".format(len(coords_gt), len(coords_colmap), len(coords_gt_found_15), (len(coords_gt_found_15)/len(coords_gt))*100)
 
-# Specify the file path
-file_path_data = os.path.join(file_path_metrics, str(id_current_object) + "_data.txt")
+# Specify the file path (<id>_data_gt.txt, its own file so that it can run at the same time as compare_voxel_grid_colmap.py,
+# compare_voxel_grid_pair.py writes both directions in <id>_data.txt)
+file_path_data = os.path.join(file_path_metrics, str(id_current_object) + "_data_gt.txt")
 
 # Write the content to the file
 with open(file_path_data, 'w') as file:
@@ -783,92 +528,53 @@ maximum_distance_gt_w_bound = np.max(distances_gt_w_bound)
 ## Convert distances into colors
 print("Converting distances into colors...")
 
-# Define the colormap 
-cmap = plt.get_cmap(color_map_value)  
-
-# Normalize distances to [0, 1] to map them to the colormap
-norm = plt.Normalize(minimum_distance_gt_w_bound, maximum_distance_gt_w_bound)
-
-# Create a list of RGB values for each distance
-colors = [cmap(norm(distance)) for distance in distances_gt_w_bound]
-
-# Convert the list of RGB values to a numpy array
-color_array_gt = np.array(colors)
+# Map all the distances to RGB colors at once (normalized between the minimum and maximum distance)
+color_array_gt = get_distance_colors(distances_gt_w_bound, color_map_value)
 
 # Print the color array
 if debug2:
     print(color_array_gt)
 
-# Saving scatterplot
-print("Saving scatterplot")
-plt.scatter(distances_gt_w_bound, np.arange(len(distances_gt_w_bound)), c=color_array_gt)
-plt.xlabel("Ground truth | Distances with boundaries")
-plt.ylabel("Index")
-#plt.show()
-#plt.savefig("ground_truth_scatterplot.png")  path_gt_color_points
-plt.savefig(path_gt_scatterplot)  
-plt.close()  
-
-# Save the colors for visualization
-print("Saving color points")
-fig, ax = plt.subplots(figsize=(8, 2))
-ax.imshow([colors], aspect='auto')
-ax.set_xticks([])
-ax.set_yticks([])
-ax.set_title("Ground truth | Distance Color Map with boundaries")
-#plt.show()
-#plt.savefig("ground_truth_color_points.png")  path_gt_color_points
-plt.savefig(path_gt_color_points)
-plt.close()
-
-## Convert voxel grid gt -> to points -> add color -> convert back to voxel grid
-## Convert centers to point cloud
-# #5
-
-## Add color
-# Initialize list to store replicated values 
-color_array_gt_8 = []
-
-# Iterate through each value(color)
-for index, value in enumerate(color_array_gt):
-    # Repeat 8 times
-    for i in range(8):
-        color_array_gt_8.append(value)
-
-if debug2:
-    print("len(color_array_gt_8): ", len(color_array_gt_8))
-
-# Convert list to numpy array
-color_array_gt_8 = np.asarray(color_array_gt_8)
-
-# Create a mask to select only the first occurrence of each unique point
-mask = np.full(len(color_array_gt_8), False)
-mask[unique_indices_gt] = True
-
-# Remove duplicates
-color_array_gt_8 = color_array_gt_8[mask]
-
-# Extract RGB from RGBA
-color_array_gt_8 = color_array_gt_8[:, :3]
-
-# Set colors to point cloud
-point_cloud_gt.colors = o3d.utility.Vector3dVector(color_array_gt_8) 
-
+if distance_plots_mode == "histogram":
+    # Saving histogram and color points (fixed number of bins)
+    print("Saving histogram and color points")
+    save_distance_plots(distances_gt_w_bound, color_map_value, "Ground truth | Distances with boundaries", "Ground truth | Distance Color Map with boundaries",
+                        path_gt_histogram, path_gt_color_points)
+else:
+    # Saving scatterplot
+    print("Saving scatterplot")
+    plt.scatter(distances_gt_w_bound, np.arange(len(distances_gt_w_bound)), c=color_array_gt)
+    plt.xlabel("Ground truth | Distances with boundaries")
+    plt.ylabel("Index")
+    #plt.show()
+    #plt.savefig("ground_truth_scatterplot.png")  path_gt_color_points
+    plt.savefig(path_gt_scatterplot)  
+    plt.close()  
+
+    # Save the colors for visualization
+    print("Saving color points")
+    fig, ax = plt.subplots(figsize=(8, 2))
+    ax.imshow([color_array_gt], aspect='auto')
+    ax.set_xticks([])
+    ax.set_yticks([])
+    ax.set_title("Ground truth | Distance Color Map with boundaries")
+    #plt.show()
+    #plt.savefig("ground_truth_color_points.png")  path_gt_color_points
+    plt.savefig(path_gt_color_points)
+    plt.close()
+
+## Create the ground truth voxel grid colored by distance directly from the grid indices
 if debug2:
-    print(len(color_array_gt_8))
-    print(type(color_array_gt_8))
-    print(type(color_array_gt_8[0]))
-    print(color_array_gt_8[0])
-
-if debug:
-    o3d.visualization.draw_geometries([point_cloud_gt])
-
-print("Creating ground truth voxel grid from points...")
-# Create a VoxelGrid from the PointCloud
-voxel_grid_gt = o3d.geometry.VoxelGrid.create_from_point_cloud(point_cloud_gt, voxel_size)
+    print(len(color_array_gt))
+    print(type(color_array_gt))
+    print(type(color_array_gt[0]))
+    print(color_array_gt[0])
 
 if debug:
-    o3d.visualization.draw_geometries([voxel_grid_gt])
+    print("Creating ground truth voxel grid from grid indices...")
+    # Create a VoxelGrid directly from the grid indices
+    voxel_grid_gt = create_voxel_grid(coords_gt, color_array_gt, voxel_size_gt, origin_gt)
+    draw_geometries([voxel_grid_gt], "voxel_grid_gt")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -918,7 +624,7 @@ content = """
 """.format(minimum_distance_gt_w_bound, maximum_distance_gt_w_bound, mae_gt_w_bound, rmse_gt_w_bound, mse_gt_w_bound)
 
 # Specify the file path
-file_path_data = os.path.join(file_path_metrics, str(id_current_object) + "_data.txt")
+file_path_data = os.path.join(file_path_metrics, str(id_current_object) + "_data_gt.txt")
 
 # Write the content to the file
 with open(file_path_data, 'a') as file:
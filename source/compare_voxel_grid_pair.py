@@ -0,0 +1,922 @@
+### The script performs the following:
+### (Ground truth -> Estimated (Colmap) and Estimated (Colmap) -> Ground truth in a single run,
+###  it replaces running compare_voxel_grid_gt.py and compare_voxel_grid_colmap.py one after the other)
+
+#########################  GENERAL  #########################
+# 0. Importing modules
+# 1. Defining functions
+# 2. Configuration
+#    (Sections 3-15 run in compare_pair(), called directly by compare_voxel_grids_all.py for every object)
+# 3. Read voxel grids of ground truth and estimated (colmap)
+# 4. Extract from the voxels the coordinates and the values from both ground truth and colmap
+# 5. Extract from the coordinates the ground truth and colmap centers, look up the cached matching results
+#    and (if they are not cached) build one KD-tree for each
+
+#########################   MATCHING WITH INDEX   #########################
+## TEST_1: VOXEL MATCHING GROUND TRUTH -> COLMAP (based on index)
+## TEST_2: VOXEL MATCHING COLMAP -> GROUND TRUTH (based on index)
+# 6. Find voxels that exist in the other voxel grid (based on index) and print comparison metrics
+
+#########################   DISTANCE WITHOUT BOUNDARIES   #########################
+## TEST_3 VOXEL DISTANCE GROUND TRUTH -> COLMAP (wo boundaries)
+## TEST_4 VOXEL DISTANCE COLMAP -> GROUND TRUTH (wo boundaries)
+# 7. Find nearest voxel at the other voxel grid (wo boundaries) and print comparison metrics
+
+#########################  VOXEL MATCHING WITH BOUNDARIES   #########################
+## TEST_5: VOXEL MATCHING GROUND TRUTH -> COLMAP (based on center w boundaries)
+## TEST_6: VOXEL MATCHING COLMAP -> GROUND TRUTH (based on center w boundaries)
+# 8. Find voxels that exist in the other voxel grid (based on center w boundaries), both directions
+#    from a single radius query (kdtree) or from a distance transform of the other voxel grid (dense, see matching_engine)
+# 9. GROUND TRUTH: Convert matched voxel coords to voxel grid and color found voxels with original (blue) and not found with red
+# 10. COLMAP: Convert matched voxel coords to voxel grid and color found voxels with original (green) and not found with red
+# 11. Print comparison metrics for matching (based on center w boundaries)
+
+#########################   DISTANCE CALCULATION WITH BOUNDARIES   #########################
+## TEST_7: VOXEL DISTANCE GROUND TRUTH -> COLMAP (based on center with boundaries)
+## TEST_8: VOXEL DISTANCE COLMAP -> GROUND TRUTH (based on center with boundaries)
+# 12. GROUND TRUTH: Convert distances to colors, save scatterplot and color points
+# 13. COLMAP: Convert distances to colors, save scatterplot and color points
+# 14. Print comparison metrics for distances (based on center with boundaries)
+
+#########################   SAVE   #########################
+# 15. Save all comparison metrics
+
+#########################   COMMAND LINE   #########################
+# 16. Reading arguments and comparing the pair
+
+## Section: 0
+## Importing modules
+#===================================================================================
+#===================================================================================
+#===================================================================================
+import numpy as np
+from voxel_matching import MATCHING_ENGINE_VERSION, build_center_tree, get_chunk_size, match_centers_w_bound_both, match_centers_wo_bound, match_indices, \
+    match_centers_w_bound, match_centers_w_bound_dense, select_matching_engine
+from ply_io import read_voxel_grid_arrays
+from voxel_grid_utils import get_voxel_centers, create_voxel_grid, get_distance_colors, get_found_colors, get_random_colors
+from distance_plots import save_distance_plots
+from visualization_sink import draw_geometries, read_headless_argument
+from voxel_metrics import get_metrics_folder, get_gt_match_content, get_colmap_match_content, get_distances_content
+from metrics_store import get_store_path, get_model_name, get_metrics_row, write_object_metrics
+from result_cache import get_cache_key, read_cached_results, write_cached_results
+import matplotlib.pyplot as plt
+import os
+import sys
+
+# Get the name of the script (also when compare_pair() is called by another script)
+script_name = os.path.basename(__file__)
+#===================================================================================
+#===================================================================================
+#===================================================================================
+
+## Section: 1
+## Defining functions
+#===================================================================================
+#===================================================================================
+#===================================================================================
+# Function to extract parent folder and filename
+def extract_folder_and_filename(path):
+    folder = os.path.dirname(path)
+    filename = os.path.basename(path)
+    filename = filename.split(".")[0]  # Remove everything after the first dot
+    return folder, filename
+
+# Function to create absolute file path with ".png" extension
+def create_png_path(folder, filename):
+    return os.path.join(folder, filename + "_scatterplot.png")
+
+# Function to create absolute file path with ".png" extension
+def create_png_path_2(folder, filename):
+    return os.path.join(folder, filename + "_color_points.png")
+
+# Function to create absolute file path with ".png" extension (histogram of the distances)
+def create_png_path_3(folder, filename):
+    return os.path.join(folder, filename + "_histogram.png")
+#===================================================================================
+#===================================================================================
+#===================================================================================
+
+## Section: 2
+## Configuration
+#===================================================================================
+#===================================================================================
+#===================================================================================
+# Debug Mode: True to run in debug mode, False to run in normal mode
+debug = False # For visualizations
+debug2 = False # For terminal prints
+
+# Memory budget (MB) for the candidate pairs of matching w boundaries, the voxels are processed in chunks
+# that fit in the budget (None: all voxels at once, fastest for small voxel grids)
+memory_budget_mb = 2048
+
+# Matching engine w boundaries: "auto" (dense for each direction if the other voxel grid fills enough of its bounding box, otherwise kdtree),
+# "kdtree" (search the voxels of the other voxel grid around each center) or "dense" (distance transform on a 3D array of the voxels
+# of the other voxel grid, needs voxel grids with the same voxel size)
+matching_engine = "auto"
+# Minimum ratio of occupied voxels in the bounding box of the other voxel grid for "auto" to select "dense"
+dense_fill_ratio = 0.1
+
+# Seed of the random colors (random colors and random variations of red), None: different colors at each run
+# (the colors of a pair are the same whether it is compared alone or in a batch)
+random_seed = None
+
+# Distance plots: "histogram" (default): histogram, cumulative distribution and percentiles of the distances (<name>_histogram.png)
+# and the colors of the sorted distances with a fixed number of columns (<name>_color_points.png), the same render time for any number of voxels
+# "scatter": scatterplot of every distance vs. its index (<name>_scatterplot.png) and the color of every voxel (<name>_color_points.png)
+distance_plots_mode = "histogram"
+
+# Cache of the matching results (see result_cache.py): a rerun with the same voxel grids, voxel size and bound
+# reads the found T/F, distances and indices instead of matching again (e.g. after changing only the color map)
+use_cache = True
+# Maximum size of the cache (MB), the least recently used results are removed first (None: no maximum)
+cache_max_size_mb = 1024
+#===================================================================================
+#===================================================================================
+#===================================================================================
+
+# In: The paths to the ground truth and colmap voxel grids, the voxel size (used for naming the metrics folder), the bound,
+#     random_colors_TF (True: the voxel grids of the matched voxels have random colors), the color map of the distances
+#     and the number of worker processes used for matching
+# Out: The path to the <id>_data.txt of the pair (the metrics are also saved in the metrics table of the project)
+def compare_pair(path_to_gt_voxel_grid, path_to_colmap_voxel_grid, voxel_size, bound, random_colors_TF=False, color_map_value="viridis", workers=1):
+    # Check if ground truth voxel grid exists
+    if not os.path.exists(path_to_gt_voxel_grid):
+        raise FileNotFoundError(f"The ground truth file '{path_to_gt_voxel_grid}' does not exist. Please provide a valid path.")
+
+    # Check if colmap voxel grid exists
+    if not os.path.exists(path_to_colmap_voxel_grid):
+        raise FileNotFoundError(f"The colmap file '{path_to_colmap_voxel_grid}' does not exist. Please provide a valid path.")
+
+    # Random colors and random variations of red of this pair
+    rng = np.random.default_rng(random_seed)
+
+    # Extract parent folder and name of ground truth and colmap voxel_grids
+    parent_folder_gt, filename_gt = extract_folder_and_filename(path_to_gt_voxel_grid)
+    parent_folder_colmap, filename_colmap = extract_folder_and_filename(path_to_colmap_voxel_grid)
+
+    if debug2:
+        print("Extracting gt voxel grid path:")
+        print("Parent folder gt:", parent_folder_gt)
+        print("Filename gt:", filename_gt)
+        print("Extracting colmap voxel grid path:")
+        print("Parent folder colmap:", parent_folder_colmap)
+        print("Filename colmap:", filename_colmap)
+
+    # Get the parent folder of parent_folder_gt
+    project_folder = os.path.dirname(parent_folder_gt)
+
+    # The cache is shared by all the metrics folders of the project
+    path_to_cache = os.path.join(project_folder, "comparison_cache")
+
+    # Create general metrics folder path
+    file_path_metrics_general = get_metrics_folder(project_folder, voxel_size, bound)
+
+    # Get id of current object
+    id_current_object = filename_gt.split('_')[0]
+
+    # Create the individual metrics folder path
+    file_path_metrics = os.path.join(file_path_metrics_general, id_current_object + "_metrics")
+
+    # Check if the general metrics folder exist, if not create it
+    if not os.path.exists(file_path_metrics_general):
+        os.makedirs(file_path_metrics_general)
+
+    # Check if the individual metrics folder exist, if not create it
+    if not os.path.exists(file_path_metrics):
+        os.makedirs(file_path_metrics)
+
+    # Used to save the scatterplots
+    path_gt_scatterplot =  create_png_path(file_path_metrics, filename_gt)
+    path_gt_color_points = create_png_path_2(file_path_metrics, filename_gt)
+    path_gt_histogram = create_png_path_3(file_path_metrics, filename_gt)
+    path_colmap_scatterplot =  create_png_path(file_path_metrics, filename_colmap)
+    path_colmap_color_points = create_png_path_2(file_path_metrics, filename_colmap)
+    path_colmap_histogram = create_png_path_3(file_path_metrics, filename_colmap)
+
+    ## Section: 3
+    ## Read voxel grids of ground truth and estimated (colmap)
+    ## arg0: groundtruth, arg1: estimated (colmap)
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+    print("\n")
+    print("==============================================================================================")
+    print("==============================================================================================")
+    print("Section: 3 | " + script_name)
+    print("Read voxel grids of ground truth and estimated (colmap)\n")
+    print("arg0: groundtruth, arg1: colmap")
+
+    # Read voxel grid of ground truth
+    coords_gt, colors_gt, voxel_size_gt, origin_gt = read_voxel_grid_arrays(path_to_gt_voxel_grid)
+
+    # Read voxel grid of colmap
+    coords_colmap, colors_colmap, voxel_size_colmap, origin_colmap = read_voxel_grid_arrays(path_to_colmap_voxel_grid)
+
+    # Visualize voxel grids
+    if debug:
+        # Voxel grids only for the visualization
+        voxel_grid_gt = create_voxel_grid(coords_gt, colors_gt, voxel_size_gt, origin_gt)
+        voxel_grid_colmap = create_voxel_grid(coords_colmap, colors_colmap, voxel_size_colmap, origin_colmap)
+        print("Visualizing ground truth voxel grid...")
+        draw_geometries([voxel_grid_gt], "voxel_grid_gt")
+        print("Visualizing colmap voxel grid...")
+        draw_geometries([voxel_grid_colmap], "voxel_grid_colmap")
+        print("Visualizing combined ground truth (blue) and colmap (green) voxel grids...")
+        draw_geometries([voxel_grid_gt, voxel_grid_colmap], "voxel_grid_gt")
+
+    print("Ground truth voxel grid: VoxelGrid with {} voxels (voxel size: {})".format(len(coords_gt), voxel_size_gt))
+    print("Colmap voxel grid: VoxelGrid with {} voxels (voxel size: {})".format(len(coords_colmap), voxel_size_colmap))
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+
+    # Section: 4
+    # Extract from the voxels the coordinates and the values from both ground truth and estimate (colmap)
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+    print("\n")
+    print("==============================================================================================")
+    print("==============================================================================================")
+    print("Section: 4 | " + script_name)
+    print("Extract from the pcds the positions and the colors from both ground truth and estimate (colmap)")
+
+    # The grid indices and the colors (uint8) were read as numpy arrays,
+    # the values are the colors in [0, 1] (the same as voxel.color)
+    values_gt = colors_gt / 255.0
+    values_colmap = colors_colmap / 255.0
+
+    print("Number of ground truth coordinates: ", len(coords_gt))
+    print("Number of colmap coordinates: ", len(coords_colmap))
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+
+    # Section: 5
+    # Extract from the coordinates the ground truth and colmap centers, look up the cached matching results
+    # and (if they are not cached) build one KD-tree for each
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+    print("\n")
+    print("==============================================================================================")
+    print("==============================================================================================")
+    print("Section: 5 | " + script_name)
+    print("Extract from the coordinates the ground truth and colmap centers, look up the cached matching results")
+    print("and (if they are not cached) build one KD-tree for each\n")
+
+    # Get centers of ground truth
+    print("Getting ground truth centers....")
+    centers_gt = get_voxel_centers(coords_gt, voxel_size_gt, origin_gt)
+
+    # Get centers of colmap
+    print("Getting colmap centers....")
+    centers_colmap = get_voxel_centers(coords_colmap, voxel_size_colmap, origin_colmap)
+
+    # Look up the matching results of the pair, if they are cached the matching of Section 6, 7 and 8 is skipped
+    cached_results = None
+    if use_cache:
+        cache_key = get_cache_key([path_to_gt_voxel_grid, path_to_colmap_voxel_grid], voxel_size, bound, MATCHING_ENGINE_VERSION)
+        cached_results = read_cached_results(path_to_cache, cache_key)
+        print("Cached matching results: ", "found" if cached_results is not None else "not found")
+        if debug2:
+            print("Cache key: ", cache_key)
+
+    # Build the KD-trees, they are used by all the tests below
+    if cached_results is None:
+        print("Building KD-trees....")
+        tree_gt = build_center_tree(centers_gt)
+        tree_colmap = build_center_tree(centers_colmap)
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+
+    ## Section: 6
+    ## TEST_1: VOXEL MATCHING GROUND TRUTH -> COLMAP (based on index)
+    ## TEST_2: VOXEL MATCHING COLMAP -> GROUND TRUTH (based on index)
+    # Find voxels that exist in the other voxel grid (based on index) and print comparison metrics
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+    print("\n")
+    print("==============================================================================================")
+    print("==============================================================================================")
+    print("Section: 6 | " + script_name)
+    print("TEST_1: VOXEL MATCHING GROUND TRUTH -> COLMAP (based on index)")
+    print("TEST_2: VOXEL MATCHING COLMAP -> GROUND TRUTH (based on index)")
+    print("Find voxels that exist in the other voxel grid (based on index) and print comparison metrics\n")
+
+    if cached_results is None:
+        # found_voxels_TF_gt_index: T: Found in estimated, F: Not found in estimated
+        found_voxels_TF_gt_index = match_indices(coords_gt, coords_colmap)
+
+        # found_voxels_TF_colmap_index: T: Found in ground truth, F: Not found in ground truth
+        found_voxels_TF_colmap_index = match_indices(coords_colmap, coords_gt)
+    else:
+        found_voxels_TF_gt_index = cached_results["found_voxels_TF_gt_index"]
+        found_voxels_TF_colmap_index = cached_results["found_voxels_TF_colmap_index"]
+
+    # Get number of found voxels
+    true_count_gt_index = np.sum(found_voxels_TF_gt_index)
+    true_count_colmap_index = np.sum(found_voxels_TF_colmap_index)
+
+    print("GROUND TRUTH")
+    print("#Voxels at ground truth: ", len(coords_gt))
+    print("#Voxels at estimate: ", len(coords_colmap))
+    print("#Voxels matched: ", true_count_gt_index)
+    print("%Voxels matched: {:.2f}%".format((true_count_gt_index/len(coords_gt))*100))
+    print("")
+    print("COLMAP")
+    print("#Voxels matched at colmap: ", true_count_colmap_index)
+    print("%Voxels matched at colmap (%Precision = TP / (TP + FP) * 100): {:.2f}%".format((true_count_colmap_index/len(coords_colmap))*100))
+    print("Recall = TP/(TP+FN): {:.2f}".format(true_count_colmap_index/(true_count_colmap_index + (len(coords_gt) - true_count_colmap_index))))
+
+    # Define the content to write to the file
+    content_index = "\n" + get_gt_match_content(len(coords_gt), len(coords_colmap), true_count_gt_index, "GT INDEX") + \
+                    get_colmap_match_content(len(coords_gt), len(coords_colmap), true_count_colmap_index, "COLMAP INDEX")
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+
+    ## Section: 7
+    ## TEST_3 VOXEL DISTANCE GROUND TRUTH -> COLMAP (wo boundaries)
+    ## TEST_4 VOXEL DISTANCE COLMAP -> GROUND TRUTH (wo boundaries)
+    # Find nearest voxel at the other voxel grid (wo boundaries) and print comparison metrics
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+    print("\n")
+    print("==============================================================================================")
+    print("==============================================================================================")
+    print("Section: 7 | " + script_name)
+    print("TEST_3 VOXEL DISTANCE GROUND TRUTH -> COLMAP (wo boundaries)")
+    print("TEST_4 VOXEL DISTANCE COLMAP -> GROUND TRUTH (wo boundaries)")
+    print("Find nearest voxel at the other voxel grid (wo boundaries) and print comparison metrics\n")
+
+    if cached_results is None:
+        # distances_gt: minimum distance for each voxel in ground truth
+        # distance_index_gt: for each voxel in ground truth the index of the nearest voxel in colmap
+        distances_gt, distance_index_gt = match_centers_wo_bound(centers_gt, tree_colmap, workers)
+
+        # distances_colmap: minimum distance for each voxel in estimate
+        # distance_index_colmap: for each voxel in estimate the index of the nearest voxel in ground truth
+        distances_colmap, distance_index_colmap = match_centers_wo_bound(centers_colmap, tree_gt, workers)
+    else:
+        distances_gt, distance_index_gt = cached_results["distances_gt"], cached_results["distance_index_gt"]
+        distances_colmap, distance_index_colmap = cached_results["distances_colmap"], cached_results["distance_index_colmap"]
+
+    # Calculate MAE, RMSE, MSE
+    mae_gt = np.mean(np.abs(distances_gt))
+    rmse_gt = np.sqrt(np.mean(distances_gt**2))
+    mse_gt = np.mean(distances_gt**2)
+
+    mae_colmap = np.mean(np.abs(distances_colmap))
+    rmse_colmap = np.sqrt(np.mean(distances_colmap**2))
+    mse_colmap = np.mean(distances_colmap**2)
+
+    print("GROUND TRUTH")
+    print("Minimum Distance: {:.2f}".format(np.min(distances_gt)))
+    print("Maximum Distance: {:.2f}".format(np.max(distances_gt)))
+    print("Distances Mean Absolute Error (MAE): {:.2f}".format(mae_gt))
+    print("Distances Root Mean Square Error (RMSE): {:.2f}".format(rmse_gt))
+    print("Distances Mean Squared Error (MSE): {:.2f}".format(mse_gt))
+    print("")
+    print("COLMAP")
+    print("Minimum Distance: {:.2f}".format(np.min(distances_colmap)))
+    print("Maximum Distance: {:.2f}".format(np.max(distances_colmap)))
+    print("Distances Mean Absolute Error (MAE): {:.2f}".format(mae_colmap))
+    print("Distances Root Mean Square Error (RMSE): {:.2f}".format(rmse_colmap))
+    print("Distances Mean Squared Error (MSE): {:.2f}".format(mse_colmap))
+
+    # Define the content to write to the file
+    content_unbounded = get_distances_content(distances_gt, "GT UNBOUNDED") + get_distances_content(distances_colmap, "COLMAP UNBOUNDED")
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+
+    ## Section: 8
+    ## TEST_5: VOXEL MATCHING GROUND TRUTH -> COLMAP (based on center w boundaries)
+    ## TEST_6: VOXEL MATCHING COLMAP -> GROUND TRUTH (based on center w boundaries)
+    # Find voxels that exist in the other voxel grid (based on center w boundaries), both directions
+    # from a single radius query
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+    print("\n")
+    print("==============================================================================================")
+    print("==============================================================================================")
+    print("Section: 8 | " + script_name)
+    print("TEST_5: VOXEL MATCHING GROUND TRUTH -> COLMAP (based on center w boundaries)")
+    print("TEST_6: VOXEL MATCHING COLMAP -> GROUND TRUTH (based on center w boundaries)")
+    print("Find voxels that exist in the other voxel grid (based on center w boundaries)\n")
+
+    # found_voxels_TF_*: T: Found in the other voxel grid, F: Not found in the other voxel grid
+    # distances_*_w_bound: minimum distance for each voxel
+    # (voxels of the other voxel grid outside of the bound have distance bound)
+    # distance_index_*_w_bound: for each voxel the index of the voxel in the other voxel grid
+    # that corresponds to the minimum distance
+    if cached_results is None:
+        ## For each center find the centers of the other voxel grid inside the bound
+        print("Finding the closest distance with boundaries for ground truth and colmap voxels...")
+
+        # Number of voxels processed at once so that the candidate pairs fit in memory_budget_mb
+        chunk_size = get_chunk_size(max(len(centers_gt), len(centers_colmap)), bound,
+                                    min(voxel_size_gt, voxel_size_colmap), memory_budget_mb, workers)
+        if debug2:
+            print("Chunk size: ", chunk_size)
+
+        # Select the engine of each direction (the results are the same for both engines)
+        if matching_engine == "auto":
+            matching_engine_gt = select_matching_engine(centers_gt, centers_colmap, coords_colmap, voxel_size_colmap, bound, memory_budget_mb, dense_fill_ratio)
+            matching_engine_colmap = select_matching_engine(centers_colmap, centers_gt, coords_gt, voxel_size_gt, bound, memory_budget_mb, dense_fill_ratio)
+        else:
+            matching_engine_gt = matching_engine
+            matching_engine_colmap = matching_engine
+
+        print("Matching engine ground truth -> colmap: ", matching_engine_gt)
+        print("Matching engine colmap -> ground truth: ", matching_engine_colmap)
+
+        if matching_engine_gt == "kdtree" and matching_engine_colmap == "kdtree":
+            # Both directions from a single radius query
+            (found_voxels_TF_gt_15, distances_gt_w_bound, distance_index_gt_w_bound), \
+            (found_voxels_TF_colmap_w_bound, distances_colmap_w_bound, distance_index_colmap_w_bound) = match_centers_w_bound_both(centers_gt, centers_colmap, bound, bound, tree_gt, tree_colmap, chunk_size, workers)
+        else:
+            if matching_engine_gt == "dense":
+                found_voxels_TF_gt_15, distances_gt_w_bound, distance_index_gt_w_bound = match_centers_w_bound_dense(centers_gt, centers_colmap, coords_colmap, voxel_size_colmap, bound, bound)
+            else:
+                found_voxels_TF_gt_15, distances_gt_w_bound, distance_index_gt_w_bound = match_centers_w_bound(centers_gt, centers_colmap, bound, bound, tree_colmap, chunk_size, workers)
+
+            if matching_engine_colmap == "dense":
+                found_voxels_TF_colmap_w_bound, distances_colmap_w_bound, distance_index_colmap_w_bound = match_centers_w_bound_dense(centers_colmap, centers_gt, coords_gt, voxel_size_gt, bound, bound)
+            else:
+                found_voxels_TF_colmap_w_bound, distances_colmap_w_bound, distance_index_colmap_w_bound = match_centers_w_bound(centers_colmap, centers_gt, bound, bound, tree_gt, chunk_size, workers)
+
+        # Save the matching results of all the tests for the next runs
+        if use_cache:
+            path_to_cache_file = write_cached_results(path_to_cache, cache_key, {
+                "found_voxels_TF_gt_index": found_voxels_TF_gt_index,
+                "found_voxels_TF_colmap_index": found_voxels_TF_colmap_index,
+                "distances_gt": distances_gt,
+                "distance_index_gt": distance_index_gt,
+                "distances_colmap": distances_colmap,
+                "distance_index_colmap": distance_index_colmap,
+                "found_voxels_TF_gt_15": found_voxels_TF_gt_15,
+                "distances_gt_w_bound": distances_gt_w_bound,
+                "distance_index_gt_w_bound": distance_index_gt_w_bound,
+                "found_voxels_TF_colmap_w_bound": found_voxels_TF_colmap_w_bound,
+                "distances_colmap_w_bound": distances_colmap_w_bound,
+                "distance_index_colmap_w_bound": distance_index_colmap_w_bound,
+            }, cache_max_size_mb)
+            print("Matching results saved in the cache: ", path_to_cache_file)
+    else:
+        print("Using the cached closest distances with boundaries for ground truth and colmap voxels...")
+        found_voxels_TF_gt_15 = cached_results["found_voxels_TF_gt_15"]
+        distances_gt_w_bound, distance_index_gt_w_bound = cached_results["distances_gt_w_bound"], cached_results["distance_index_gt_w_bound"]
+        found_voxels_TF_colmap_w_bound = cached_results["found_voxels_TF_colmap_w_bound"]
+        distances_colmap_w_bound, distance_index_colmap_w_bound = cached_results["distances_colmap_w_bound"], cached_results["distance_index_colmap_w_bound"]
+
+    # Get number of found voxels
+    true_count_gt_15 = np.sum(found_voxels_TF_gt_15)
+    true_count_colmap_w_bound = np.sum(found_voxels_TF_colmap_w_bound)
+
+    # Print number of voxels found
+    print("# of voxels in ground truth: ", len(coords_gt))
+    print("Number of voxels found in ground truth (based on center w boundaries): ", true_count_gt_15)
+    print("# of voxels in estimate: ", len(coords_colmap))
+    print("Number of voxels found in estimate (based on center w boundaries): ", true_count_colmap_w_bound)
+
+    # Get coords and values that were found in the other voxel grid
+    coords_gt_found_15 = coords_gt[found_voxels_TF_gt_15]
+    values_gt_found_15 = values_gt[found_voxels_TF_gt_15]
+    coords_colmap_found_w_bound = coords_colmap[found_voxels_TF_colmap_w_bound]
+    values_colmap_found_w_bound = values_colmap[found_voxels_TF_colmap_w_bound]
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+
+    ## Section: 9
+    ## TEST_5: VOXEL MATCHING GROUND TRUTH -> COLMAP (based on center w boundaries)
+    ## GROUND TRUTH
+    # Convert matched voxel coords to voxel grid and color found voxels with original (blue) and not found with red
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+    print("\n")
+    print("==============================================================================================")
+    print("==============================================================================================")
+    print("Section: 9 | " + script_name)
+    print("TEST_5: VOXEL MATCHING GROUND TRUTH -> COLMAP (based on center w boundaries)")
+    print("GROUND TRUTH")
+    print("Convert matched voxel coords to voxel grid and color found voxels with original (blue) and not found with red\n")
+
+    # Sets random colors at the voxel grid
+    if random_colors_TF:
+        # Generate random color for each voxel
+        colors_found_gt_15 = get_random_colors(len(coords_gt_found_15), rng)
+    # Sets colors at the voxel grid from the ground truth
+    else:
+        colors_found_gt_15 = values_gt_found_15
+
+    if debug:
+        # Create a VoxelGrid directly from the grid indices of the found voxels
+        voxel_grid_gt_15 = create_voxel_grid(coords_gt_found_15, colors_found_gt_15, voxel_size_gt, origin_gt)
+        draw_geometries([voxel_grid_gt_15], "voxel_grid_gt_15")
+
+    # Color all voxels of ground truth T/F at once: found with original color (blue),
+    # not found with a random variation of red
+    colors_test5_17 = get_found_colors(found_voxels_TF_gt_15, values_gt, random_red_TF=True, rng=rng)
+
+    if debug:
+        # Create a VoxelGrid directly from the grid indices of all ground truth voxels
+        voxel_grid_gt_17 = create_voxel_grid(coords_gt, colors_test5_17, voxel_size_gt, origin_gt)
+        draw_geometries([voxel_grid_gt_17], "voxel_grid_gt_17")
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+
+    ## Section: 10
+    ## TEST_6: VOXEL MATCHING COLMAP -> GROUND TRUTH (based on center w boundaries)
+    ## COLMAP
+    # Convert matched voxel coords to voxel grid and color found voxels with original (green) and not found with red
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+    print("\n")
+    print("==============================================================================================")
+    print("==============================================================================================")
+    print("Section: 10 | " + script_name)
+    print("TEST_6: VOXEL MATCHING COLMAP -> GROUND TRUTH (based on center w boundaries)")
+    print("COLMAP")
+    print("Convert matched voxel coords to voxel grid and color found voxels with original (green) and not found with red\n")
+
+    # Sets random colors at the voxel grid
+    if random_colors_TF:
+        # Generate random color for each voxel
+        colors_found_colmap_w_bound = get_random_colors(len(coords_colmap_found_w_bound), rng)
+    # Sets colors at the voxel grid from the colmap
+    else:
+        colors_found_colmap_w_bound = values_colmap_found_w_bound
+
+    if debug:
+        # Create a VoxelGrid directly from the grid indices of the found voxels
+        voxel_grid_colmap_w_bound = create_voxel_grid(coords_colmap_found_w_bound, colors_found_colmap_w_bound, voxel_size_colmap, origin_colmap)
+        draw_geometries([voxel_grid_colmap_w_bound], "voxel_grid_colmap_w_bound")
+
+    # Color all voxels of colmap T/F at once: found with original color (green),
+    # not found with red
+    colors_test6_21 = get_found_colors(found_voxels_TF_colmap_w_bound, values_colmap)
+
+    if debug:
+        # Create a VoxelGrid directly from the grid indices of all colmap voxels
+        voxel_grid_colmap_w_bound_color = create_voxel_grid(coords_colmap, colors_test6_21, voxel_size_colmap, origin_colmap)
+        draw_geometries([voxel_grid_colmap_w_bound_color], "voxel_grid_colmap_w_bound_color")
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+
+    ## Section: 11
+    ## TEST_5: VOXEL MATCHING GROUND TRUTH -> COLMAP (based on center w boundaries)
+    ## TEST_6: VOXEL MATCHING COLMAP -> GROUND TRUTH (based on center w boundaries)
+    # Print comparison metrics for matching (based on center w boundaries)
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+    print("\n")
+    print("==============================================================================================")
+    print("==============================================================================================")
+    print("Section: 11 | " + script_name)
+    print("TEST_5: VOXEL MATCHING GROUND TRUTH -> COLMAP (based on center w boundaries)")
+    print("TEST_6: VOXEL MATCHING COLMAP -> GROUND TRUTH (based on center w boundaries)")
+    print("Print comparison metrics for matching (based on center w boundaries)\n")
+
+    print("GROUND TRUTH")
+    print("#Voxels at ground truth: ", len(coords_gt))
+    print("#Voxels at estimate: ", len(coords_colmap))
+    print("#Voxels matched: ", len(coords_gt_found_15))
+    print("%Voxels matched: {:.2f}%".format((len(coords_gt_found_15)/len(coords_gt))*100))
+    print("")
+    print("COLMAP")
+    print("#Voxels matched at colmap: ", len(coords_colmap_found_w_bound))
+    print("%Voxels matched at colmap (%Precision = TP / (TP + FP) * 100): {:.2f}%".format((len(coords_colmap_found_w_bound)/len(coords_colmap))*100))
+    print("Recall = TP/(TP+FN): {:.2f}".format(len(coords_colmap_found_w_bound)/(len(coords_colmap_found_w_bound) + (len(coords_gt) - len(coords_colmap_found_w_bound)))))
+
+    # Define the content to write to the file (same as compare_voxel_grid_gt.py and compare_voxel_grid_colmap.py)
+    content_gt_match = get_gt_match_content(len(coords_gt), len(coords_colmap), len(coords_gt_found_15))
+    content_colmap_match = get_colmap_match_content(len(coords_gt), len(coords_colmap), len(coords_colmap_found_w_bound))
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+
+    ## Section: 12
+    ## TEST_7: VOXEL DISTANCE GROUND TRUTH -> COLMAP (based on center with boundaries)
+    ## GROUND TRUTH
+    # Convert distances to colors, save scatterplot and color points
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+    print("\n")
+    print("==============================================================================================")
+    print("==============================================================================================")
+    print("Section: 12 | " + script_name)
+    print("TEST_7: VOXEL DISTANCE GROUND TRUTH -> COLMAP (based on center with boundaries)")
+    print("GROUND TRUTH")
+    print("Convert distances to colors, save scatterplot and color points\n")
+
+    # Find minimum distance with boundaries
+    minimum_distance_gt_w_bound = np.min(distances_gt_w_bound)
+
+    # Find maximimum distance with boundaries
+    maximum_distance_gt_w_bound = np.max(distances_gt_w_bound)
+
+    ## Convert distances into colors
+    print("Converting distances into colors...")
+
+    # Map all the distances to RGB colors at once (normalized between the minimum and maximum distance)
+    color_array_gt = get_distance_colors(distances_gt_w_bound, color_map_value)
+
+    # Print the color array
+    if debug2:
+        print(color_array_gt)
+
+    if distance_plots_mode == "histogram":
+        # Saving histogram and color points (fixed number of bins)
+        print("Saving histogram and color points")
+        save_distance_plots(distances_gt_w_bound, color_map_value, "Ground truth | Distances with boundaries", "Ground truth | Distance Color Map with boundaries",
+                            path_gt_histogram, path_gt_color_points)
+    else:
+        # Saving scatterplot
+        print("Saving scatterplot")
+        plt.scatter(distances_gt_w_bound, np.arange(len(distances_gt_w_bound)), c=color_array_gt)
+        plt.xlabel("Ground truth | Distances with boundaries")
+        plt.ylabel("Index")
+        plt.savefig(path_gt_scatterplot)
+        plt.close()
+
+        # Save the colors for visualization
+        print("Saving color points")
+        fig, ax = plt.subplots(figsize=(8, 2))
+        ax.imshow([color_array_gt], aspect='auto')
+        ax.set_xticks([])
+        ax.set_yticks([])
+        ax.set_title("Ground truth | Distance Color Map with boundaries")
+        plt.savefig(path_gt_color_points)
+        plt.close()
+
+    ## Create the ground truth voxel grid colored by distance directly from the grid indices
+    if debug:
+        print("Creating ground truth voxel grid from grid indices...")
+        # Create a VoxelGrid directly from the grid indices
+        voxel_grid_gt_distance = create_voxel_grid(coords_gt, color_array_gt, voxel_size_gt, origin_gt)
+        draw_geometries([voxel_grid_gt_distance], "voxel_grid_gt_distance")
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+
+    ## Section: 13
+    ## TEST_8: VOXEL DISTANCE COLMAP -> GROUND TRUTH (based on center with boundaries)
+    ## COLMAP
+    # Convert distances to colors, save scatterplot and color points
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+    print("\n")
+    print("==============================================================================================")
+    print("==============================================================================================")
+    print("Section: 13 | " + script_name)
+    print("TEST_8: VOXEL DISTANCE COLMAP -> GROUND TRUTH (based on center with boundaries)")
+    print("COLMAP")
+    print("Convert distances to colors, save scatterplot and color points\n")
+
+    # Find minimum distance with boundaries
+    minimum_distance_colmap_w_bound = np.min(distances_colmap_w_bound)
+
+    # Find maximimum distance with boundaries
+    maximum_distance_colmap_w_bound = np.max(distances_colmap_w_bound)
+
+    ## Convert distances into colors
+    print("Converting distances into colors...")
+
+    # Map all the distances to RGB colors at once (normalized between the minimum and maximum distance)
+    color_array_colmap = get_distance_colors(distances_colmap_w_bound, color_map_value)
+
+    # Print the color array
+    if debug2:
+        print(color_array_colmap)
+
+    if distance_plots_mode == "histogram":
+        # Saving histogram and color points (fixed number of bins)
+        print("Saving histogram and color points")
+        save_distance_plots(distances_colmap_w_bound, color_map_value, "Colmap | Distances with boundaries", "Colmap | Distance Color Map with boundaries",
+                            path_colmap_histogram, path_colmap_color_points)
+    else:
+        # Saving scatterplot
+        print("Saving scatterplot")
+        plt.scatter(distances_colmap_w_bound, np.arange(len(distances_colmap_w_bound)), c=color_array_colmap)
+        plt.xlabel("Colmap | Distances with boundaries")
+        plt.ylabel("Index")
+        plt.savefig(path_colmap_scatterplot)
+        plt.close()
+
+        # Save the colors for visualization
+        print("Saving color points")
+        fig, ax = plt.subplots()
+        ax.imshow([color_array_colmap], aspect='auto')
+        ax.set_xticks([])
+        ax.set_yticks([])
+        ax.set_title("Colmap | Distance Color Map with boundaries")
+        plt.savefig(path_colmap_color_points)
+        plt.close()
+
+    ## Create the colmap voxel grid colored by distance directly from the grid indices
+    if debug:
+        print("Creating colmap voxel grid from grid indices...")
+        # Create a VoxelGrid directly from the grid indices
+        voxel_grid_colmap_distance = create_voxel_grid(coords_colmap, color_array_colmap, voxel_size_colmap, origin_colmap)
+        draw_geometries([voxel_grid_colmap_distance], "voxel_grid_colmap_distance")
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+
+    ## Section: 14
+    ## TEST_7: VOXEL DISTANCE GROUND TRUTH -> COLMAP (based on center with boundaries)
+    ## TEST_8: VOXEL DISTANCE COLMAP -> GROUND TRUTH (based on center with boundaries)
+    # Print comparison metrics for distances (based on center with boundaries)
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+    print("\n")
+    print("==============================================================================================")
+    print("==============================================================================================")
+    print("Section: 14 | " + script_name)
+    print("TEST_7: VOXEL DISTANCE GROUND TRUTH -> COLMAP (based on center with boundaries)")
+    print("TEST_8: VOXEL DISTANCE COLMAP -> GROUND TRUTH (based on center with boundaries)")
+    print("Print comparison metrics for distances (based on center with boundaries)\n")
+
+    # Calculate Mean Absolute Error (MAE), Root Mean Square Error (RMSE), Mean Squared Error (MSE) with bound
+    mae_gt_w_bound = np.mean(np.abs(distances_gt_w_bound))
+    rmse_gt_w_bound = np.sqrt(np.mean(distances_gt_w_bound**2))
+    mse_gt_w_bound = np.mean(distances_gt_w_bound**2)
+
+    mae_colmap_w_bound = np.mean(np.abs(distances_colmap_w_bound))
+    rmse_colmap_w_bound = np.sqrt(np.mean(distances_colmap_w_bound**2))
+    mse_colmap_w_bound = np.mean(distances_colmap_w_bound**2)
+
+    print("GROUND TRUTH")
+    print("Minimum Distance: {:.2f}".format(minimum_distance_gt_w_bound))
+    print("Maximum Distance: {:.2f}".format(maximum_distance_gt_w_bound))
+    print("Distances Mean Absolute Error (MAE): {:.2f}".format(mae_gt_w_bound))
+    print("Distances Root Mean Square Error (RMSE): {:.2f}".format(rmse_gt_w_bound))
+    print("Distances Mean Squared Error (MSE): {:.2f}".format(mse_gt_w_bound))
+    print("")
+    print("COLMAP")
+    print("Minimum Distance: {:.2f}".format(minimum_distance_colmap_w_bound))
+    print("Maximum Distance: {:.2f}".format(maximum_distance_colmap_w_bound))
+    print("Distances Mean Absolute Error (MAE): {:.2f}".format(mae_colmap_w_bound))
+    print("Distances Root Mean Square Error (RMSE): {:.2f}".format(rmse_colmap_w_bound))
+    print("Distances Mean Squared Error (MSE): {:.2f}".format(mse_colmap_w_bound))
+
+    # Define the content to write to the file (same as compare_voxel_grid_gt.py and compare_voxel_grid_colmap.py)
+    content_gt_distances = get_distances_content(distances_gt_w_bound, "GT")
+    content_colmap_distances = get_distances_content(distances_colmap_w_bound, "COLMAP")
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+
+    ## Section: 15
+    ## Save all comparison metrics
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+    print("\n")
+    print("==============================================================================================")
+    print("==============================================================================================")
+    print("Section: 15 | " + script_name)
+    print("Save all comparison metrics\n")
+
+    # The blocks of compare_voxel_grid_gt.py and compare_voxel_grid_colmap.py come first and in the same order,
+    # so that compare_voxel_grids_all.py reads them as before
+    content = content_gt_match + content_gt_distances + content_colmap_match + content_colmap_distances + content_index + content_unbounded
+
+    # Specify the file path
+    file_path_data = os.path.join(file_path_metrics, str(id_current_object) + "_data.txt")
+
+    # Write the content to the file
+    with open(file_path_data, 'w') as file:
+        file.write(content)
+
+    print("Metrics saved in: ", file_path_data)
+
+    # Save the same metrics unrounded in the metrics table of the project (used for the average metrics)
+    rows = [get_metrics_row("gt", "bound", len(coords_gt), len(coords_colmap), len(coords_gt_found_15), distances_gt_w_bound),
+            get_metrics_row("colmap", "bound", len(coords_gt), len(coords_colmap), len(coords_colmap_found_w_bound), distances_colmap_w_bound),
+            get_metrics_row("gt", "index", len(coords_gt), len(coords_colmap), num_matched=true_count_gt_index),
+            get_metrics_row("colmap", "index", len(coords_gt), len(coords_colmap), num_matched=true_count_colmap_index),
+            get_metrics_row("gt", "unbounded", len(coords_gt), len(coords_colmap), distances=distances_gt),
+            get_metrics_row("colmap", "unbounded", len(coords_gt), len(coords_colmap), distances=distances_colmap)]
+    write_object_metrics(get_store_path(project_folder), id_current_object, get_model_name(filename_gt), voxel_size, bound, rows)
+
+    print("Metrics saved in: ", get_store_path(project_folder))
+
+    return file_path_data
+    #===================================================================================
+    #===================================================================================
+    #===================================================================================
+
+## Section: 16
+## Reading arguments and comparing the pair (command line)
+#===================================================================================
+#===================================================================================
+#===================================================================================
+if __name__ == "__main__":
+    print("\n")
+    print("==============================================================================================")
+    print("==============================================================================================")
+    print("Section: 16 | " + script_name)
+    print("Reading arguments and comparing the pair\n")
+
+    print("Reading arguments")
+
+    # Read the optional --headless <skip|save|show> (it can be placed anywhere after the script name)
+    # Visualizations are skipped or saved to files instead of opening viewer windows (also for the scripts run by this one)
+    read_headless_argument(sys.argv)
+
+    # Read the optional --workers <number_of_workers> (it can be placed anywhere after the script name)
+    # Number of worker processes used for matching, the results are the same for any number of workers
+    workers = 1 # default value
+
+    if "--workers" in sys.argv:
+        position_workers = sys.argv.index("--workers")
+        try:
+            workers = int(sys.argv[position_workers + 1])
+        except (IndexError, ValueError):
+            print("Error: --workers must be followed by a valid integer")
+            sys.exit(1)
+
+        if workers < 1:
+            print("Error: --workers must be at least 1")
+            sys.exit(1)
+
+        # Remove the option so that the rest of the arguments keep their positions
+        del sys.argv[position_workers:position_workers + 2]
+
+    if len(sys.argv) < 5 or len(sys.argv) > 7:
+        print("Length of arguments: ", len(sys.argv))
+        print("Usage: python compare_voxel_grid_pair.py 1<path_to_gt_voxel_grid> 2<path_to_colmap_voxel_grid>  3<voxel_size> 4<bound> 5<random_colors_TF>(true or false) 6<color_map_value> [--workers <number_of_workers>] [--headless <skip|save|show>]")
+        sys.exit(1)
+
+    # Read arg for voxel grid of ground truth
+    path_to_gt_voxel_grid = sys.argv[1]
+
+    # Read arg for voxel grid of colmap
+    path_to_colmap_voxel_grid = sys.argv[2]
+
+    # voxel_size: It is used for naming the metrics folder, the voxel grids that are created
+    # from the matched voxels keep the voxel size and origin of the input voxel grids
+    # Attempt to convert voxel_size (third argument) to a float
+    try:
+        voxel_size = float(sys.argv[3])
+    except ValueError:
+        print("Error: voxel_size (third argument) must be a valid float.")
+        sys.exit(1)
+
+    # bound: It is used for searching the area around a center both for matching and distance
+    # Attempt to convert bound (forth argument) to a float
+    try:
+        bound = float(sys.argv[4])
+    except ValueError:
+        print("Error: bound (forth argument) must be a valid float.")
+        sys.exit(1)
+
+    # random_colors_TF color:
+    # True: the final voxel grids will have random colors,
+    # False: the final voxel grids will have original colors
+    random_colors_TF = False  # Default value for random_colors_TF
+
+    # Check if random_colors_TF is provided
+    if len(sys.argv) >= 6:
+        # Check if the string is "True" and assign the boolean value
+        random_colors_str = sys.argv[5]
+        if random_colors_str.lower() == "true":
+            random_colors_TF = True
+
+        # Check if the string is "False" and assign the boolean value
+        elif random_colors_str.lower() == "false":
+            random_colors_TF = False
+
+        else:
+            # Handle the case where the input is neither "True" nor "False"
+            raise ValueError("Error: random_colors_TF (fifth argument) must be either true or false.")
+
+    # color_map_value:
+    # viridis:  Low:Blue, High: Yellow
+    # RdYlGn_r: Low:Green, Red - High
+    # check matplotlib doc for other
+    color_map_value = "viridis" # Default value for color_map_value
+
+    if len(sys.argv) == 7:
+        color_map_value = sys.argv[6]
+
+    compare_pair(path_to_gt_voxel_grid, path_to_colmap_voxel_grid, voxel_size, bound, random_colors_TF, color_map_value, workers)
+#===================================================================================
+#===================================================================================
+#===================================================================================
@@ -4,8 +4,8 @@
 # 1. Defining classes and functions
 # 2. Configuration
 # 3. Read gt and colmap voxelized .ply files
-# 4. Runs compare_voxel_grid_gt.py and compare_voxel_grid_colmap.py
-#    for voxelized cropped objects found in the project
+# 4. Runs compare_pair() of compare_voxel_grid_pair.py (ground truth -> colmap and colmap -> ground truth)
+#    for voxelized cropped objects found in the project (objects done by a previous run are skipped, see batch_manifest.py)
 # 5. Calculates and saves the total average metrics
 
 ## Section: 0
@@ -17,6 +17,17 @@ import os
 import sys
 import subprocess
 import glob
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from voxel_metrics import get_metrics_folder
+from metrics_store import get_store_path, read_object_ids, write_avg_metrics
+from visualization_sink import read_headless_argument
+from script_runner import run_function_in_process, run_function_in_process_timed, get_script_command
+from compare_voxel_grid_pair import compare_pair
+from batch_manifest import get_input_hashes, get_object_key, read_manifest, is_object_done, record_object_done
+from voxel_matching import MATCHING_ENGINE_VERSION
+from voxel_grid_utils import find_voxelized_ply_files
 
 # Get the path to the current script
 script_path = sys.argv[0]
@@ -31,9 +42,51 @@ print("Importing modules and reading arguments\n")
 
 print("Reading arguments")
 
+# Read the optional --headless <skip|save|show> (it can be placed anywhere after the script name)
+# Visualizations are skipped or saved to files instead of opening viewer windows (also for the scripts run by this one)
+read_headless_argument(sys.argv)
+
+# Read the optional --workers <number_of_workers> (it can be placed anywhere after the script name)
+# Number of worker processes used for matching, the results are the same for any number of workers
+workers = 1 # default value
+
+if "--workers" in sys.argv:
+    position_workers = sys.argv.index("--workers")
+    try:
+        workers = int(sys.argv[position_workers + 1])
+    except (IndexError, ValueError):
+        print("Error: --workers must be followed by a valid integer")
+        sys.exit(1)
+
+    if workers < 1:
+        print("Error: --workers must be at least 1")
+        sys.exit(1)
+
+    # Remove the option so that the rest of the arguments keep their positions
+    del sys.argv[position_workers:position_workers + 2]
+
+# Read the optional --jobs <number_of_jobs> (it can be placed anywhere after the script name)
+# Number of objects compared at the same time (each by its own worker process), the results are the same for any number of jobs
+jobs = 1 # default value
+
+if "--jobs" in sys.argv:
+    position_jobs = sys.argv.index("--jobs")
+    try:
+        jobs = int(sys.argv[position_jobs + 1])
+    except (IndexError, ValueError):
+        print("Error: --jobs must be followed by a valid integer")
+        sys.exit(1)
+
+    if jobs < 1:
+        print("Error: --jobs must be at least 1")
+        sys.exit(1)
+
+    # Remove the option so that the rest of the arguments keep their positions
+    del sys.argv[position_jobs:position_jobs + 2]
+
 if len(sys.argv) < 4 or len(sys.argv) > 6:
     print("Length of arguments: ", len(sys.argv))
-    print("Usage: python compare_voxel_grids_all.py 1<path_to_project> 2<voxel_size>  3<bound> 4<random_colors_TF>(true or false) 5<color_map_value>")
+    print("Usage: python compare_voxel_grids_all.py 1<path_to_project> 2<voxel_size>  3<bound> 4<random_colors_TF>(true or false) 5<color_map_value> [--workers <number_of_workers>] [--jobs <number_of_jobs>] [--headless <skip|save|show>]")
     print("path_to_project: provide the path to the project (that contains colmap_a_cropped_objects and gt_cropped_objects)")
     print("voxel_size: provide the voxel size of the voxel grids")
     print("bound: provide the bound parameter that will be used to search around the center for matching and distance (+-bound)")
@@ -106,6 +159,8 @@ print("2. voxel_size: ", voxel_size)
 print("3. bound: ", bound)
 print("4. random_colors_TF: ", random_colors_TF)
 print("5. color_map_value: ", color_map_value)
+print("--workers: ", workers)
+print("--jobs: ", jobs)
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -126,56 +181,28 @@ class DataObject:
         self.title = ""
         self.value = ""
 
-def find_voxelized_ply_files(directory_path):
-    voxelized_ply_files = []
-
-    # Walk through the directory and its subdirectories
-    for root, _, files in os.walk(directory_path):
-        for file in files:
-            if file.endswith(".ply") and file.endswith("voxelized.ply"):
-                # Combine the root and file to get the full path
-                full_path = os.path.join(root, file)
-                voxelized_ply_files.append(full_path)
-
-    return voxelized_ply_files
+# In: The path to a ground truth voxelized .ply file
+# Out: The path to the corresponding colmap voxelized .ply file
+def get_colmap_path(gt_path):
+    colmap_path = gt_path.replace("gt_cropped_objects", "colmap_a_cropped_objects")
+    return colmap_path.replace("_gt_", "_colmap_")
+
+# In: The metrics folder and the path to a ground truth voxelized .ply file
+# Out: The path to the log file of the object (<id>_metrics/<id>_log.txt, used with --jobs)
+def get_log_path(path_to_metrics, gt_path):
+    id_object = os.path.basename(gt_path).split("_")[0]
+    return os.path.join(path_to_metrics, id_object + "_metrics", id_object + "_log.txt")
+
+# In: The path to the project, the voxel size, the bound and the manifest
+# Out: - (saves the average metrics of the objects done so far, used when the run stops because of an error)
+def write_partial_avg_metrics(path_to_project, voxel_size, bound, manifest):
+    if len(manifest["objects"]) == 0:
+        print("No object is done, avg_metrics.txt is not created")
+        return
+
+    path_to_avg_metrics = write_avg_metrics(path_to_project, voxel_size, bound, debug2)
+    print(f"avg_metrics.txt of the {len(manifest['objects'])} objects done so far has been created in {path_to_avg_metrics}")
                     
-def extract_specific_lines(root_dir):
-    titles_to_extract = [
-        "GT %Voxels matched",
-        "GT Minimum Distance",
-        "GT Maximum Distance",
-        "GT Distances Mean Absolute Error (MAE)",
-        "GT Distances Root Mean Square Error (RMSE)",
-        "GT Distances Mean Squared Error (MSE)",
-        "COLMAP %Voxels matched at colmap",
-        "COLMAP Recall = TP/(TP+FN)",
-        "COLMAP Minimum Distance",
-        "COLMAP Maximum Distance",
-        "COLMAP Distances Mean Absolute Error (MAE)",
-        "COLMAP Distances Root Mean Square Error (RMSE)",
-        "COLMAP Distances Mean Squared Error (MSE)"
-    ]
-
-    data_lists = {title: [] for title in titles_to_extract}
-    
-    for dirpath, _, filenames in os.walk(root_dir):
-        for filename in filenames:
-            base_name, file_extension = os.path.splitext(filename)
-            if base_name.endswith("_data") and base_name[:-5].isdigit() and file_extension == ".txt":
-                file_path = os.path.join(dirpath, filename)
-                try:
-                    with open(file_path, 'r') as file:
-                        for line in file:
-                            line = line.strip()
-                            if line.startswith("#"):
-                                for title in titles_to_extract:
-                                    if title in line:
-                                        value = line.split(":")[1].strip()
-                                        data_lists[title].append(value)
-                except Exception as e:
-                    print(f"Error reading {file_path}: {e}")
-
-    return data_lists    
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -194,6 +221,16 @@ print("Configuration\n")
 debug = False # For visualizations
 debug2 = False # For terminal prints
 
+# True: compare_pair() of compare_voxel_grid_pair.py is called inside this process for every object (Open3D, SciPy and Matplotlib
+# are imported once and the script is not executed again for every object),
+# False: compare_voxel_grid_pair.py runs in its own process for every object
+run_in_process = True
+
+# True: the objects that are recorded as done in the manifest of the metrics folder (manifest.json) with the same
+# voxel grids and settings are skipped, so an interrupted run continues where it stopped
+# False: all objects are compared again
+resume_TF = True
+
 # Construct path to gt cropped objects directory
 path_to_gt_cropped = os.path.join(path_to_project, "gt_cropped_objects")
 
@@ -213,7 +250,7 @@ if not os.path.exists(path_to_colmap_cropped):
     sys.exit(1)
 
 # Construct path to metrics directory
-path_to_metrics = os.path.join(path_to_project, "metrics_vox_" + str(voxel_size).replace(".", "_") + "_bound_" + str(bound).replace(".", "_"))
+path_to_metrics = get_metrics_folder(path_to_project, voxel_size, bound)
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -229,7 +266,8 @@ print("=========================================================================
 print("Section: 3 | " + script_name)
 print("Read gt and colmap voxelized .ply files\n")
 # Call the function to find the ground truth voxelized .ply files
-voxelized_gt_ply_files = find_voxelized_ply_files(path_to_gt_cropped)
+# (<name>_voxelized_vox_<voxel_size>.ply if crop_objects.py stored the voxel size, otherwise <name>_voxelized.ply)
+voxelized_gt_ply_files = find_voxelized_ply_files(path_to_gt_cropped, voxel_size)
 
 print("==============================================================================================")
 print("ground truth: Found voxelized ply files")
@@ -239,7 +277,7 @@ for file_path in voxelized_gt_ply_files:
     print("\n\n")
 
 # Call the function to find the colmap voxelized .ply files
-voxelized_colmap_ply_files = find_voxelized_ply_files(path_to_colmap_cropped)
+voxelized_colmap_ply_files = find_voxelized_ply_files(path_to_colmap_cropped, voxel_size)
 
 print("==============================================================================================")
 print("colmap: Found voxelized ply files")
@@ -286,7 +324,7 @@ else:
 #===================================================================================
 
 ## Section: 4
-## Runs compare_voxel_grid_gt.py and compare_voxel_grid_colmap.py
+## Runs compare_voxel_grid_pair.py (ground truth -> colmap and colmap -> ground truth)
 ## for voxelized cropped objects found in the project
 #===================================================================================
 #===================================================================================
@@ -295,83 +333,119 @@ print("\n")
 print("==============================================================================================")
 print("==============================================================================================")
 print("Section: 4 | " + script_name)
-print("Runs compare_voxel_grid_gt.py and compare_voxel_grid_colmap.py")
+print("Runs compare_voxel_grid_pair.py (ground truth -> colmap and colmap -> ground truth)")
 print("for voxelized cropped objects found in the project\n")
 
-for i in range(len(voxelized_gt_ply_files)):
-    print(f"Iteration: {i}\n")
-    
-    # Construct the paths
-    gt_path = voxelized_gt_ply_files[i]
-    colmap_path = voxelized_gt_ply_files[i].replace("gt_cropped_objects", "colmap_a_cropped_objects")
-    colmap_path = colmap_path.replace("_gt_", "_colmap_")
-
-    # Print paths
-    print("ground truth path:", gt_path)
-    print("\n")
-    print("colmap path:", colmap_path)
-    print("\n")
-
-    # Construct commands to execute
-    run_gt_command = f"python3.10 compare_voxel_grid_gt.py {gt_path} {colmap_path} {voxel_size} {bound} {random_colors_TF} {color_map_value}"
-    run_colmap_command = f"python3.10 compare_voxel_grid_colmap.py {gt_path} {colmap_path} {voxel_size} {bound} {random_colors_TF} {color_map_value}"
-
-    ## SUBPROCESS GROUND TRUTH
-    # Run the subprocess for ground truth compare and capture its output
-    print("Running ground truth compare")
-
-    run_subprocess_gt = subprocess.Popen(run_gt_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, universal_newlines=True)
-
-    # Read and print the output while the subprocess is running
-    while run_subprocess_gt.poll() is None:
-        output_gt = run_subprocess_gt.stdout.readline()
-        print(output_gt, end='')
-
-    # Once the subprocess is done, print any remaining output
-    remaining_output_gt = run_subprocess_gt.communicate()[0]
-    print(remaining_output_gt)
-    print("Running ground truth compare done\n")
-
-    # Check the return code of the subprocess 
-    return_code_gt = run_subprocess_gt.returncode
-
-    if return_code_gt == 0:
-        print("Subprocess for ground truth exited normally\n")
-    else:
-        print(f"Subprocess for ground truth exited with return code {return_code_gt}. An error occurred.\n")
-        sys.exit(1)
-
-    # Waiting to finish the subprocess for ground truth
-    run_subprocess_gt.wait()
-    
-    ## SUBPROCESS COLMAP
-    # Run the subprocess for colmap compare and capture its output
-    print("Running colmap compare")
-
-    run_subprocess_colmap = subprocess.Popen(run_colmap_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, universal_newlines=True)
-
-    # Read and print the output while the subprocess is running
-    while run_subprocess_colmap.poll() is None:
-        output_colmap = run_subprocess_colmap.stdout.readline()
-        print(output_colmap, end='')
-
-    # Once the subprocess is done, print any remaining output
-    remaining_output_colmap = run_subprocess_colmap.communicate()[0]
-    print(remaining_output_colmap)
-    print("Running colmap compare done")
-
-    # Check the return code of the subprocess 
-    return_code_colmap = run_subprocess_colmap.returncode
-
-    if return_code_colmap == 0:
-        print("Subprocess for colmap exited normally")
-    else:
-        print(f"Subprocess for colmap exited with return code {return_code_colmap}. An error occurred.")
+# Read the manifest of the metrics folder and the objects that have metrics in the metrics table (the objects done by previous runs)
+manifest = read_manifest(path_to_metrics)
+stored_ids = read_object_ids(get_store_path(path_to_project), voxel_size, bound)
+
+# Settings that change the outputs of an object (a change compares the object again)
+object_settings = {"mode": "pair", "voxel_size": voxel_size, "bound": bound, "engine": MATCHING_ENGINE_VERSION,
+                   "random_colors_TF": random_colors_TF, "color_map_value": color_map_value}
+
+# Construct the arguments of every object that is not done
+# compare_voxel_grid_pair.py loads the pair once and runs both ground truth -> colmap
+# and colmap -> ground truth (same metrics as compare_voxel_grid_gt.py and compare_voxel_grid_colmap.py)
+pending_objects = []
+for gt_path in voxelized_gt_ply_files:
+    colmap_path = get_colmap_path(gt_path)
+    id_object = os.path.basename(gt_path).split("_")[0]
+
+    input_hashes = get_input_hashes([gt_path, colmap_path])
+    object_key = get_object_key(input_hashes, object_settings)
+
+    if resume_TF and is_object_done(manifest, path_to_metrics, id_object, object_key) and int(id_object) in stored_ids:
+        if debug2:
+            print(f"Object {id_object} is done, skipped")
+        continue
+
+    # The arguments of compare_pair() (the same as the arguments of compare_voxel_grid_pair.py)
+    pair_arguments = [gt_path, colmap_path, voxel_size, bound, random_colors_TF, color_map_value, workers]
+    pending_objects.append((id_object, object_key, input_hashes, pair_arguments))
+
+print(f"{len(voxelized_gt_ply_files) - len(pending_objects)} objects are done (manifest), {len(pending_objects)} objects will be compared\n")
+
+if jobs == 1:
+    for i, (id_object, object_key, input_hashes, pair_arguments) in enumerate(pending_objects):
+        print(f"Iteration: {i}\n")
+
+        # Print paths
+        print("ground truth path:", pair_arguments[0])
+        print("\n")
+        print("colmap path:", pair_arguments[1])
+        print("\n")
+
+        ## GROUND TRUTH AND COLMAP
+        print("Running ground truth and colmap compare")
+        time_start = time.perf_counter()
+
+        if run_in_process:
+            # Compare the pair in this process, its output is printed directly
+            return_code_pair = run_function_in_process(compare_pair, pair_arguments)
+        else:
+            # Run the subprocess for ground truth and colmap compare and print its output (and errors) line by line
+            run_pair_command = get_script_command("compare_voxel_grid_pair.py", pair_arguments[:-1] + ["--workers", workers])
+            run_subprocess_pair = subprocess.Popen(run_pair_command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, shell=True, universal_newlines=True)
+
+            for output_pair in run_subprocess_pair.stdout:
+                print(output_pair, end='')
+
+            # Waiting to finish the subprocess for ground truth and colmap
+            return_code_pair = run_subprocess_pair.wait()
+
+        print("Running ground truth and colmap compare done\n")
+
+        # Check the return code
+        if return_code_pair == 0:
+            print("Ground truth and colmap compare exited normally\n")
+            record_object_done(path_to_metrics, manifest, id_object, object_key, pair_arguments[:2], input_hashes, time.perf_counter() - time_start)
+        else:
+            print(f"Ground truth and colmap compare exited with return code {return_code_pair}. An error occurred.\n")
+            write_partial_avg_metrics(path_to_project, voxel_size, bound, manifest)
+            sys.exit(1)
+else:
+    # The objects are compared at the same time by a pool of jobs worker processes (the modules are imported once per worker)
+    # Every object writes only to its own <id>_metrics folder, its output goes to <id>_metrics/<id>_log.txt
+    # and the metrics of all objects are merged in Section 5 when all of them are done
+    # Only this process writes the manifest, every object is recorded when it is done
+    print(f"Comparing {len(pending_objects)} objects with {jobs} jobs (output of each object in <id>_metrics/<id>_log.txt)\n")
+
+    start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+    failed_objects = []
+
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context(start_method)) as executor:
+        futures = {}
+        for id_object, object_key, input_hashes, pair_arguments in pending_objects:
+            path_to_log = get_log_path(path_to_metrics, pair_arguments[0])
+            future = executor.submit(run_function_in_process_timed, compare_pair, pair_arguments, path_to_log)
+            futures[future] = (id_object, object_key, input_hashes, pair_arguments, path_to_log)
+
+        # Print and record every object when it is done
+        for number_done, future in enumerate(as_completed(futures), start=1):
+            id_object, object_key, input_hashes, pair_arguments, path_to_log = futures[future]
+            gt_path = pair_arguments[0]
+
+            try:
+                return_code_pair, seconds = future.result()
+            except Exception as e:
+                print(f"Worker of {gt_path} failed: {e}")
+                return_code_pair = 1
+
+            if return_code_pair == 0:
+                print(f"[{number_done}/{len(futures)}] {gt_path} done in {seconds:.1f} s (log: {path_to_log})")
+                record_object_done(path_to_metrics, manifest, id_object, object_key, pair_arguments[:2], input_hashes, seconds)
+            else:
+                print(f"[{number_done}/{len(futures)}] {gt_path} exited with return code {return_code_pair}. An error occurred (log: {path_to_log})")
+                failed_objects.append(gt_path)
+
+    if len(failed_objects) > 0:
+        print(f"{len(failed_objects)} objects could not be compared:")
+        for gt_path in failed_objects:
+            print(gt_path)
+        write_partial_avg_metrics(path_to_project, voxel_size, bound, manifest)
         sys.exit(1)
 
-    # Waiting to finish the subprocess for colmap
-    run_subprocess_colmap.wait()
-
 print("Successfully compared all cropped objects.")
 #===================================================================================
 #===================================================================================
@@ -393,203 +467,8 @@ if not os.path.exists(path_to_metrics):
     print(f"The metrics directory '{path_to_metrics}' does not exist.")
     sys.exit(1)
 
-
-data_lists = extract_specific_lines(path_to_metrics)
-
-if debug2:
-    for title, values in data_lists.items():
-        print(f"Title: {title}")
-        print(f"Values: {values}")
-
-#==============================================================================================
-### GT metrics
-#==============================================================================================
-## Calculating average of GT %Voxels matched
-avg_gt_voxels_matched = 0.0
-sum_gt_voxels_matched = 0.0
-
-# Summing GT %Voxels matched
-for gt_perc_vox_match in data_lists["GT %Voxels matched"]:
-    
-    # Remove the '%' character and convert the remaining string to a float
-    gt_perc_vox_match = float(gt_perc_vox_match.rstrip('%'))
-    # Sum
-    sum_gt_voxels_matched += gt_perc_vox_match
-
-# Calculate average
-avg_gt_voxels_matched = sum_gt_voxels_matched / len(data_lists["GT %Voxels matched"])
-#==============================================================================================
-## Find minimum of all GT Minimum Distances
-# Convert the strings to floats and find the minimum float value
-min_gt_distance = min(float(x) for x in data_lists["GT Minimum Distance"])
-
-## Find maximum of all GT Minimum Distance
-# Convert the strings to floats and find the maximum float value
-max_gt_distance = max(float(x) for x in data_lists["GT Maximum Distance"])
-#==============================================================================================
-## Calculating average of GT Distances Mean Absolute Error (MAE)
-
-avg_gt_mae = 0.0
-sum_gt_mae = 0.0
-
-# Summing GT Distances Mean Absolute Error (MAE)
-for gt_mae in data_lists["GT Distances Mean Absolute Error (MAE)"]:
-    
-    # Convert the string to a float
-    gt_mae = float(gt_mae)
-    # Sum
-    sum_gt_mae += gt_mae
-
-# Calculate average
-avg_gt_mae = sum_gt_mae / len(data_lists["GT Distances Mean Absolute Error (MAE)"])
-#==============================================================================================
-## Calculating average of GT Distances Root Mean Square Error (RMSE)
-avg_gt_rmse = 0.0
-sum_gt_rmse = 0.0
-
-# Summing GT Distances Root Mean Square Error (RMSE)
-for gt_rmse in data_lists["GT Distances Root Mean Square Error (RMSE)"]:
-    
-    # Convert the string to a float
-    gt_rmse = float(gt_rmse)
-    # Sum
-    sum_gt_rmse += gt_rmse
-
-# Calculate average
-avg_gt_rmse = sum_gt_rmse / len(data_lists["GT Distances Root Mean Square Error (RMSE)"])
-#==============================================================================================
-## Calculating average of GT Distances Mean Squared Error (MSE)
-
-avg_gt_mse = 0.0
-sum_gt_mse = 0.0
-
-# Summing GT Distances Mean Squared Error (MSE)
-for gt_mse in data_lists["GT Distances Mean Squared Error (MSE)"]:
-    
-    # Convert the string to a float
-    gt_mse = float(gt_mse)
-    # Sum
-    sum_gt_mse += gt_mse
-
-# Calculate average
-avg_gt_mse = sum_gt_mse / len(data_lists["GT Distances Mean Squared Error (MSE)"])
-#==============================================================================================
-### COLMAP metrics
-#==============================================================================================
-## Calculating average of COLMAP %Voxels matched at colmap
-
-avg_colmap_voxels_matched = 0.0
-sum_colmap_voxels_matched = 0.0
-
-# Summing COLMAP %Voxels matched at colmap
-for colmap_perc_vox_match in data_lists["COLMAP %Voxels matched at colmap"]:
-    
-    # Remove the '%' character and convert the remaining string to a float
-    colmap_perc_vox_match = float(colmap_perc_vox_match.rstrip('%'))
-    # Sum
-    sum_colmap_voxels_matched += colmap_perc_vox_match
-
-# Calculate average
-avg_colmap_voxels_matched = sum_colmap_voxels_matched / len(data_lists["COLMAP %Voxels matched at colmap"])
-#==============================================================================================
-## Calculating average of COLMAP Recall = TP/(TP+FN)
-
-avg_colmap_recall = 0.0
-sum_colmap_recall = 0.0
-
-# Summing COLMAP Recall = TP/(TP+FN)
-for colmap_recall in data_lists["COLMAP Recall = TP/(TP+FN)"]:
-    
-    # Convert the string to a float
-    colmap_recall = float(colmap_recall)
-    # Sum
-    sum_colmap_recall += colmap_recall
-
-# Calculate average
-avg_colmap_recall = sum_colmap_recall / len(data_lists["COLMAP Recall = TP/(TP+FN)"])
-#==============================================================================================
-## Find minimum of all COLMAP Minimum Distance
-# Convert the strings to floats and find the minimum float value
-min_colmap_distance = min(float(x) for x in data_lists["COLMAP Minimum Distance"])
-#==============================================================================================
-## Find maximum of all COLMAP Minimum Distance
-# Convert the strings to floats and find the maximum float value
-max_colmap_distance = max(float(x) for x in data_lists["COLMAP Maximum Distance"])
-#==============================================================================================
-## Calculating average of COLMAP Distances Mean Absolute Error (MAE)
-
-avg_colmap_mae = 0.0
-sum_colmap_mae = 0.0
-
-# Summing COLMAP Distances Mean Absolute Error (MAE)
-for colmap_mae in data_lists["COLMAP Distances Mean Absolute Error (MAE)"]:
-    
-    # Convert the string to a float
-    colmap_mae = float(colmap_mae)
-    # Sum
-    sum_colmap_mae += colmap_mae
-
-# Calculate average
-avg_colmap_mae = sum_colmap_mae / len(data_lists["COLMAP Distances Mean Absolute Error (MAE)"])
-#==============================================================================================
-## Calculating average of COLMAP Distances Root Mean Square Error (RMSE)
-
-avg_colmap_rmse = 0.0
-sum_colmap_rmse = 0.0
-
-# Summing COLMAP Distances Root Mean Square Error (RMSE)
-for colmap_rmse in data_lists["COLMAP Distances Root Mean Square Error (RMSE)"]:
-    
-    # Convert the string to a float
-    colmap_rmse = float(colmap_rmse)
-    # Sum
-    sum_colmap_rmse += colmap_rmse
-
-# Calculate average
-avg_colmap_rmse = sum_colmap_rmse / len(data_lists["COLMAP Distances Root Mean Square Error (RMSE)"])
-#==============================================================================================
-## Calculating average of COLMAP Distances Mean Squared Error (MSE)
-
-avg_colmap_mse = 0.0
-sum_colmap_mse = 0.0
-
-# Summing COLMAP Distances Mean Squared Error (MSE)
-for colmap_mse in data_lists["COLMAP Distances Mean Squared Error (MSE)"]:
-    
-    # Convert the string to a float
-    colmap_mse = float(colmap_mse)
-    # Sum
-    sum_colmap_mse += colmap_mse
-
-# Calculate average
-avg_colmap_mse = sum_colmap_mse / len(data_lists["COLMAP Distances Mean Squared Error (MSE)"])
-#==============================================================================================
-# Define the content for "avg_metrics.txt"
-content_avg_metrics = f"""
-## GT
-avg_gt_voxels_matched: {avg_gt_voxels_matched/100.0:.2f}
-min_gt_distance: {min_gt_distance:.2f}
-max_gt_distance: {max_gt_distance:.2f}
-avg_gt_mae: {avg_gt_mae:.2f}
-avg_gt_rmse: {avg_gt_rmse:.2f}
-avg_gt_mse: {avg_gt_mse:.2f}
-
-## COLMAP 
-avg_colmap_voxels_matched: {avg_colmap_voxels_matched/100.0:.2f}
-avg_colmap_recall: {avg_colmap_recall:.2f}
-min_colmap_distance: {min_colmap_distance:.2f}
-max_colmap_distance: {max_colmap_distance:.2f}
-avg_colmap_mae: {avg_colmap_mae:.2f}
-avg_colmap_rmse: {avg_colmap_rmse:.2f}
-avg_colmap_mse: {avg_colmap_mse:.2f}
-"""
-#==============================================================================================
-# Define the file path for "avg_metrics.txt" within the directory
-path_to_avg_metrics = os.path.join(path_to_metrics, "avg_metrics.txt")
-
-# Write the content to the file
-with open(path_to_avg_metrics, "w") as file:
-    file.write(content_avg_metrics)
+# Calculate and save the average metrics of all objects (from the metrics table of the project)
+path_to_avg_metrics = write_avg_metrics(path_to_project, voxel_size, bound, debug2)
 
 # Print a confirmation message
 print(f"avg_metrics.txt has been created in {path_to_avg_metrics}")
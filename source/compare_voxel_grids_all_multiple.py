@@ -1,7 +1,11 @@
 #
 # The following script performs the following
 # 0. Importing modules and reading arguments
-# 1. Run multiple times compare_voxel_grids_all.py but change the bound each time
+# 1. Defining functions
+# 2. Configuration
+# 3. (sweep_TF false) Run multiple times compare_voxel_grids_all.py but change the bound each time
+# 4. (sweep_TF true) Sweep: for each object find the distances once and threshold them for all bounds,
+#    save the metrics of each bound (metrics_vox_<bound>_bound_<bound>) and their averages
 
 
 
@@ -13,6 +17,16 @@
 import subprocess
 import sys
 import os
+import time
+import numpy as np
+from ply_io import read_voxel_grid_arrays
+from voxel_grid_utils import get_voxel_centers, find_voxelized_ply_files, get_voxelized_ply_path
+from voxel_matching import MATCHING_ENGINE_VERSION, build_center_tree, match_indices, get_sweep_distances, threshold_distances_w_bound
+from visualization_sink import read_headless_argument
+from script_runner import run_script_in_process, get_script_command
+from batch_manifest import get_input_hashes, get_object_key, read_manifest, is_object_done, record_object_done
+from voxel_metrics import get_metrics_folder, get_gt_match_content, get_colmap_match_content, get_distances_content
+from metrics_store import get_store_path, get_model_name, get_metrics_row, write_object_metrics, read_object_ids, write_avg_metrics
 
 # Get the path to the current script
 script_path = sys.argv[0]
@@ -27,15 +41,66 @@ print("Importing modules and reading arguments\n")
 
 print("Reading arguments")
 
-if len(sys.argv) < 2 or len(sys.argv) > 4:
+# Read the optional --headless <skip|save|show> (it can be placed anywhere after the script name)
+# Visualizations are skipped or saved to files instead of opening viewer windows (also for the scripts run by this one)
+read_headless_argument(sys.argv)
+
+# Read the optional --workers <number_of_workers> (it can be placed anywhere after the script name)
+# Number of worker processes used for matching, the results are the same for any number of workers
+workers = 1 # default value
+
+if "--workers" in sys.argv:
+    position_workers = sys.argv.index("--workers")
+    try:
+        workers = int(sys.argv[position_workers + 1])
+    except (IndexError, ValueError):
+        print("Error: --workers must be followed by a valid integer")
+        sys.exit(1)
+
+    if workers < 1:
+        print("Error: --workers must be at least 1")
+        sys.exit(1)
+
+    # Remove the option so that the rest of the arguments keep their positions
+    del sys.argv[position_workers:position_workers + 2]
+
+# Read the optional --jobs <number_of_jobs> (it can be placed anywhere after the script name)
+# (sweep_TF false) Number of objects compared at the same time, passed to compare_voxel_grids_all.py
+jobs = 1 # default value
+
+if "--jobs" in sys.argv:
+    position_jobs = sys.argv.index("--jobs")
+    try:
+        jobs = int(sys.argv[position_jobs + 1])
+    except (IndexError, ValueError):
+        print("Error: --jobs must be followed by a valid integer")
+        sys.exit(1)
+
+    if jobs < 1:
+        print("Error: --jobs must be at least 1")
+        sys.exit(1)
+
+    # Remove the option so that the rest of the arguments keep their positions
+    del sys.argv[position_jobs:position_jobs + 2]
+
+# Read the optional --sweep (it can be placed anywhere after the script name)
+# The distances of each object are found once and thresholded for all bounds (only the metrics are saved),
+# without it compare_voxel_grids_all.py runs once for each bound (the same as the fourth argument sweep_TF true)
+sweep_flag_TF = "--sweep" in sys.argv
+if sweep_flag_TF:
+    sys.argv.remove("--sweep")
+
+if len(sys.argv) < 2 or len(sys.argv) > 5:
     print("Length of arguments: ", len(sys.argv))
-    print("Usage: python compare_voxel_grids_all_multiple.py 1<path_to_project> 2<random_colors_TF>(true or false) 3<color_map_value>")
+    print("Usage: python compare_voxel_grids_all_multiple.py 1<path_to_project> 2<random_colors_TF>(true or false) 3<color_map_value> 4<sweep_TF>(true or false) [--sweep] [--workers <number_of_workers>] [--jobs <number_of_jobs>] [--headless <skip|save|show>]")
     print("path_to_project: provide the path to the project (that contains colmap_a_cropped_objects and gt_cropped_objects)")
     print("voxel_size (statically set): static values have been set")
     print("bound (statically set): static values have been set")
     print("random_colors_TF (optional): true -> random colors to voxel grids reconstructed to show matching voxels and distance coloring, false (default) -> original colors")
     print("color_map_value (optional): color mapping of distances is done using matplotlib and they are a lot of options")
     print("e.g. viridis (default): Low - Blue / High - Yellow, RdY1Gn: Low - Green / High - Red")
+    print("sweep_TF (optional): true (or --sweep) -> distances are found once per object and thresholded for all bounds (only metrics are saved),")
+    print("false (default) -> compare_voxel_grids_all.py runs once for each bound (metrics, scatterplots and color points are saved)")
     sys.exit(1)
 
 # 1. Read path to project
@@ -81,9 +146,26 @@ if len(sys.argv) >= 3:
 # check matplotlib doc for other
 color_map_value = "viridis" # default value
 
-if len(sys.argv) == 4:
+if len(sys.argv) >= 4:
     color_map_value = sys.argv[3]
 
+# 4. Read sweep_TF
+# True: the distances of each object are found once and thresholded for all bounds
+# False: compare_voxel_grids_all.py runs once for each bound
+sweep_TF = sweep_flag_TF # default value: False (True with --sweep)
+
+if len(sys.argv) == 5:
+    sweep_str = sys.argv[4]
+    if sweep_str.lower() == "true":
+        sweep_TF = True
+
+    elif sweep_str.lower() == "false":
+        sweep_TF = False
+
+    else:
+        # Handle the case where the input is neither "True" nor "False"
+        raise ValueError("Error: sweep_TF (forth argument) must be either true or false.")
+
 # Print read arguments
 print("==============================================================================================")
 print("Read arguments")
@@ -91,51 +173,232 @@ print("1. path_to_project: ", path_to_project)
 #print("2. voxel_size: ", voxel_size)
 print("2. random_colors_TF: ", random_colors_TF)
 print("3. color_map_value: ", color_map_value)
+print("4. sweep_TF: ", sweep_TF)
+print("--workers: ", workers)
+print("--jobs: ", jobs)
 #===================================================================================
 #===================================================================================
 #===================================================================================
 
-# Section: 1
-## Run multiple times compare_voxel_grids_all.py but change the bound each time
+## Section: 1
+## Defining functions
+#===================================================================================
 #===================================================================================
 #===================================================================================
+print("\n")
+print("==============================================================================================")
+print("==============================================================================================")
+print("Section: 1 | " + script_name)
+print("Defining functions\n")
+
+# In: The path to a voxel grid (.ply)
+# Out: Numpy array of the grid indices (N, 3) and numpy array of the centers (N, 3) of its voxels
+def read_voxel_grid_centers(path_to_voxel_grid):
+    # Get coords (the colors are not needed)
+    coords, _, voxel_size, origin = read_voxel_grid_arrays(path_to_voxel_grid)
+
+    return coords, get_voxel_centers(coords, voxel_size, origin)
+#===================================================================================
+#===================================================================================
+#===================================================================================
+
+## Section: 2
+## Configuration
 #===================================================================================
-# List of values for the third argument
+#===================================================================================
+#===================================================================================
+print("\n")
+print("==============================================================================================")
+print("==============================================================================================")
+print("Section: 2 | " + script_name)
+print("Configuration\n")
+
+# Debug Mode: True to run in debug mode, False to run in normal mode
+debug2 = False # For terminal prints
+
+# (sweep_TF false) True: compare_voxel_grids_all.py runs inside this process for every bound (the modules are imported once),
+# False: compare_voxel_grids_all.py runs in its own process for every bound
+run_in_process = True
+
+# True: the objects that are recorded as done in the manifests of the metrics folders (manifest.json) with the same
+# voxel grids and settings are skipped, so an interrupted run continues where it stopped (sweep and compare_voxel_grids_all.py)
+# False: all objects are compared again
+resume_TF = True
+
+# List of values for the third argument (used both as voxel size and bound)
 #third_argument_values = [0.05, 0.1, 0.2, 0.7, 0.9, 1.2, 1.5, 2.0, 2.5, 3.0]
 third_argument_values = [0.2, 0.3, 0.4, 0.5, 0.7, 0.9, 1.2, 1.5, 1.7, 2.0]
+#===================================================================================
+#===================================================================================
+#===================================================================================
 
-# Construct command to execute
-base_compare_all_command = f"python3.10 compare_voxel_grids_all.py {path_to_project}"
-
-# Loop through the third argument values and execute the command
-for third_arg_value in third_argument_values:
-    print(third_arg_value)
-    # Build the full command with the current third argument value
-    full_compare_all_command= f"{base_compare_all_command} {third_arg_value} {third_arg_value} {random_colors_TF} {color_map_value}"
-    
-    print(f"Running command: {full_compare_all_command}")
-    
-    # Execute the command
-    try:
-        result = subprocess.run(full_compare_all_command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+## Section: 3
+## (sweep_TF false) Run multiple times compare_voxel_grids_all.py but change the bound each time
+#===================================================================================
+#===================================================================================
+#===================================================================================
+if not sweep_TF:
+    print("\n")
+    print("==============================================================================================")
+    print("==============================================================================================")
+    print("Section: 3 | " + script_name)
+    print("Run multiple times compare_voxel_grids_all.py but change the bound each time\n")
 
-        # Print the command's output
-        print(result.stdout)
+    # Loop through the third argument values and run compare_voxel_grids_all.py
+    for third_arg_value in third_argument_values:
+        print(third_arg_value)
+        # Build the arguments with the current third argument value
+        compare_all_arguments = [path_to_project, third_arg_value, third_arg_value, random_colors_TF, color_map_value, "--workers", workers, "--jobs", jobs]
+        full_compare_all_command = get_script_command("compare_voxel_grids_all.py", compare_all_arguments)
+
+        print(f"Running command: {full_compare_all_command}")
+
+        if run_in_process:
+            # Run the script in this process, its output is printed directly
+            return_code = run_script_in_process("compare_voxel_grids_all.py", compare_all_arguments)
+        else:
+            # Execute the command and print its output (and errors)
+            result = subprocess.run(full_compare_all_command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+            print(result.stdout)
+            return_code = result.returncode
 
         # Check if the command terminated normally (return code 0)
-        if result.returncode == 0:
+        if return_code == 0:
             print("Command terminated normally.")
         else:
             # The command returned a non-zero exit code, indicating an error
-            print(f"Command terminated with an error (return code {result.returncode}).")
-            print(f"The following command caused the exit: {full_compare_all_command}") 
+            print(f"Command terminated with an error (return code {return_code}).")
+            print(f"The following command caused the exit: {full_compare_all_command}")
             sys.exit(1)
+#===================================================================================
+#===================================================================================
+#===================================================================================
+
+## Section: 4
+## (sweep_TF true) Sweep: for each object find the distances once and threshold them for all bounds,
+## save the metrics of each bound (metrics_vox_<bound>_bound_<bound>) and their averages
+#===================================================================================
+#===================================================================================
+#===================================================================================
+if sweep_TF:
+    print("\n")
+    print("==============================================================================================")
+    print("==============================================================================================")
+    print("Section: 4 | " + script_name)
+    print("Sweep: for each object find the distances once and threshold them for all bounds\n")
 
-    except subprocess.CalledProcessError as e:
-        print(f"Error executing the command: {e}")
-        print(f"The following command caused the exit: {full_compare_all_command}")
+    # Find the ground truth voxelized .ply files
+    voxelized_gt_ply_files = find_voxelized_ply_files(os.path.join(path_to_project, "gt_cropped_objects"))
+
+    if len(voxelized_gt_ply_files) == 0:
+        print("No ground truth voxelized .ply files found in gt_cropped_objects")
         sys.exit(1)
 
+    # Read the manifests of the metrics folders (the objects done by previous runs)
+    manifests = {bound: read_manifest(get_metrics_folder(path_to_project, bound, bound)) for bound in third_argument_values}
+    path_to_store = get_store_path(path_to_project)
+    stored_ids = {bound: read_object_ids(path_to_store, bound, bound) for bound in third_argument_values}
+
+    for voxelized_gt_ply_file in voxelized_gt_ply_files:
+        # The voxel grids of each bound (the bound is also the voxel size, as in Section 3):
+        # <name>_voxelized_vox_<bound>.ply if crop_objects.py stored that voxel size, otherwise <name>_voxelized.ply
+        # The distances are found once for each voxel grid and thresholded for all its bounds
+        bounds_by_gt_path = {}
+        for bound in third_argument_values:
+            bounds_by_gt_path.setdefault(get_voxelized_ply_path(voxelized_gt_ply_file, bound), []).append(bound)
+
+        for gt_path, bounds in bounds_by_gt_path.items():
+            # Construct the colmap path
+            colmap_path = gt_path.replace("gt_cropped_objects", "colmap_a_cropped_objects")
+            colmap_path = colmap_path.replace("_gt_", "_colmap_")
+
+            if not os.path.exists(colmap_path):
+                print(f"A voxelized .ply correspondence is missing for {gt_path}")
+                sys.exit(1)
+
+            # Get id of current object
+            id_current_object = os.path.basename(gt_path).split('_')[0]
+
+            # Skip the object if it is done for all bounds (the same voxel grids and settings)
+            input_hashes = get_input_hashes([gt_path, colmap_path])
+            object_keys = {bound: get_object_key(input_hashes, {"mode": "sweep", "bound": bound, "engine": MATCHING_ENGINE_VERSION}) for bound in bounds}
+
+            if resume_TF and all(is_object_done(manifests[bound], get_metrics_folder(path_to_project, bound, bound), id_current_object, object_keys[bound])
+                                 and int(id_current_object) in stored_ids[bound] for bound in bounds):
+                print(f"Object {id_current_object} is done for all bounds (manifest), skipped\n")
+                continue
+
+            print("ground truth path:", gt_path)
+            print("colmap path:", colmap_path)
+            time_start = time.perf_counter()
+
+            ## Read the voxel grids once and build one KD-tree for each
+            coords_gt, centers_gt = read_voxel_grid_centers(gt_path)
+            coords_colmap, centers_colmap = read_voxel_grid_centers(colmap_path)
+
+            tree_gt = build_center_tree(centers_gt)
+            tree_colmap = build_center_tree(centers_colmap)
+
+            ## Metrics that do not depend on the bound (based on index and wo boundaries)
+            found_voxels_TF_gt_index = match_indices(coords_gt, coords_colmap)
+            found_voxels_TF_colmap_index = match_indices(coords_colmap, coords_gt)
+
+            # Find the distances once (for all bounds)
+            sweep_distances_gt = get_sweep_distances(centers_gt, centers_colmap, tree_colmap, workers)
+            sweep_distances_colmap = get_sweep_distances(centers_colmap, centers_gt, tree_gt, workers)
+
+            content_index = "\n" + get_gt_match_content(len(coords_gt), len(coords_colmap), np.sum(found_voxels_TF_gt_index), "GT INDEX") + \
+                            get_colmap_match_content(len(coords_gt), len(coords_colmap), np.sum(found_voxels_TF_colmap_index), "COLMAP INDEX")
+            content_unbounded = get_distances_content(sweep_distances_gt[0], "GT UNBOUNDED") + get_distances_content(sweep_distances_colmap[0], "COLMAP UNBOUNDED")
+
+            rows_index_unbounded = [get_metrics_row("gt", "index", len(coords_gt), len(coords_colmap), num_matched=np.sum(found_voxels_TF_gt_index)),
+                                    get_metrics_row("colmap", "index", len(coords_gt), len(coords_colmap), num_matched=np.sum(found_voxels_TF_colmap_index)),
+                                    get_metrics_row("gt", "unbounded", len(coords_gt), len(coords_colmap), distances=sweep_distances_gt[0]),
+                                    get_metrics_row("colmap", "unbounded", len(coords_gt), len(coords_colmap), distances=sweep_distances_colmap[0])]
+
+            ## Threshold the distances for each bound and save the metrics
+            for bound in bounds:
+                found_voxels_TF_gt_w_bound, distances_gt_w_bound = threshold_distances_w_bound(*sweep_distances_gt, bound)
+                found_voxels_TF_colmap_w_bound, distances_colmap_w_bound = threshold_distances_w_bound(*sweep_distances_colmap, bound)
+
+                # Same content as compare_voxel_grid_pair.py
+                content = get_gt_match_content(len(coords_gt), len(coords_colmap), np.sum(found_voxels_TF_gt_w_bound)) + \
+                          get_distances_content(distances_gt_w_bound, "GT") + \
+                          get_colmap_match_content(len(coords_gt), len(coords_colmap), np.sum(found_voxels_TF_colmap_w_bound)) + \
+                          get_distances_content(distances_colmap_w_bound, "COLMAP") + \
+                          content_index + content_unbounded
+
+                # Create the individual metrics folder (the bound is also used as voxel size, as in Section 3)
+                file_path_metrics = os.path.join(get_metrics_folder(path_to_project, bound, bound), id_current_object + "_metrics")
+
+                if not os.path.exists(file_path_metrics):
+                    os.makedirs(file_path_metrics)
+
+                # Write the content to the file
+                file_path_data = os.path.join(file_path_metrics, str(id_current_object) + "_data.txt")
+                with open(file_path_data, 'w') as file:
+                    file.write(content)
+
+                if debug2:
+                    print("Saved: ", file_path_data)
+
+                # Save the same metrics unrounded in the metrics table
+                rows = [get_metrics_row("gt", "bound", len(coords_gt), len(coords_colmap), np.sum(found_voxels_TF_gt_w_bound), distances_gt_w_bound),
+                        get_metrics_row("colmap", "bound", len(coords_gt), len(coords_colmap), np.sum(found_voxels_TF_colmap_w_bound), distances_colmap_w_bound)]
+                write_object_metrics(path_to_store, id_current_object, get_model_name(gt_path), bound, bound, rows + rows_index_unbounded)
+
+            # Record the object as done in the manifest of every bound
+            for bound in bounds:
+                record_object_done(get_metrics_folder(path_to_project, bound, bound), manifests[bound], id_current_object, object_keys[bound],
+                                   [gt_path, colmap_path], input_hashes, time.perf_counter() - time_start)
+
+            print(f"Object {id_current_object} done\n")
+
+    ## Calculate and save the average metrics of each bound
+    for bound in third_argument_values:
+        path_to_avg_metrics = write_avg_metrics(path_to_project, bound, bound, debug2)
+        print(f"avg_metrics.txt has been created in {path_to_avg_metrics}")
+
 print("Successfull termination: compare_voxel_grid_all_multiple.py")
 #===================================================================================
 #===================================================================================
@@ -87,6 +87,7 @@ debug2 = False # For terminal prints
 #===================================================================================
 #===================================================================================
 import open3d as o3d
+from visualization_sink import draw_geometries
 import numpy as np
 from scipy.spatial import distance
 import matplotlib.pyplot as plt
@@ -117,11 +118,11 @@ voxel_grid_colmap = o3d.io.read_voxel_grid("/home/christos/Desktop/Gate/thesis/3
 # Visualize voxel grids
 if debug:
     print("Visualizing ground truth voxel grid...")
-    o3d.visualization.draw_geometries([voxel_grid_gt])
+    draw_geometries([voxel_grid_gt], "voxel_grid_gt")
     print("Visualizing colmap voxel grid...")
-    o3d.visualization.draw_geometries([voxel_grid_colmap])
+    draw_geometries([voxel_grid_colmap], "voxel_grid_colmap")
     print("Visualizing combined ground truth (blue) and colmap (green) voxel grids...")
-    o3d.visualization.draw_geometries([voxel_grid_gt, voxel_grid_colmap])
+    draw_geometries([voxel_grid_gt, voxel_grid_colmap], "voxel_grid_gt")
 
 print("Ground truth voxel grid: ", voxel_grid_gt)
 print("Colmap voxel grid: ", voxel_grid_colmap)
@@ -378,13 +379,13 @@ else:
     point_cloud.colors = o3d.utility.Vector3dVector(values_gt_found_8) 
     
 if debug:
-    o3d.visualization.draw_geometries([point_cloud])
+    draw_geometries([point_cloud], "point_cloud")
 
 # Create a VoxelGrid from the PointCloud
 voxel_grid = o3d.geometry.VoxelGrid.create_from_point_cloud(point_cloud, voxel_size)
 
 if debug:
-    o3d.visualization.draw_geometries([voxel_grid])
+    draw_geometries([voxel_grid], "voxel_grid")
 
 #===================================================================================
 #===================================================================================
@@ -498,13 +499,13 @@ values_gt_8 = values_gt_8[mask]
 point_cloud_gt.colors = o3d.utility.Vector3dVector(values_gt_8) 
 
 if debug:
-    o3d.visualization.draw_geometries([point_cloud_gt])
+    draw_geometries([point_cloud_gt], "point_cloud_gt")
 
 # Create a VoxelGrid from the PointCloud
 voxel_grid_gt = o3d.geometry.VoxelGrid.create_from_point_cloud(point_cloud_gt, voxel_size)
 
 if debug:
-    o3d.visualization.draw_geometries([voxel_grid_gt])
+    draw_geometries([voxel_grid_gt], "voxel_grid_gt")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -699,13 +700,13 @@ else:
     point_cloud_found_colmap.colors = o3d.utility.Vector3dVector(values_colmap_found_8) 
     
 if debug:
-    o3d.visualization.draw_geometries([point_cloud_found_colmap])
+    draw_geometries([point_cloud_found_colmap], "point_cloud_found_colmap")
 
 # Create a VoxelGrid from the PointCloud
 voxel_grid_found_colmap = o3d.geometry.VoxelGrid.create_from_point_cloud(point_cloud_found_colmap, voxel_size)
 
 if debug:
-    o3d.visualization.draw_geometries([voxel_grid_found_colmap])
+    draw_geometries([voxel_grid_found_colmap], "voxel_grid_found_colmap")
 
 #===================================================================================
 #===================================================================================
@@ -815,13 +816,13 @@ values_colmap_8 = values_colmap_8[mask]
 point_cloud_colmap.colors = o3d.utility.Vector3dVector(values_colmap_8) 
 
 if debug:
-    o3d.visualization.draw_geometries([point_cloud_colmap])
+    draw_geometries([point_cloud_colmap], "point_cloud_colmap")
 
 # Create a VoxelGrid from the PointCloud
 voxel_grid_colmap = o3d.geometry.VoxelGrid.create_from_point_cloud(point_cloud_colmap, voxel_size)
 
 if debug:
-    o3d.visualization.draw_geometries([voxel_grid_colmap])
+    draw_geometries([voxel_grid_colmap], "voxel_grid_colmap")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -979,13 +980,13 @@ if debug2:
     print(color_array_gt_8[0])
 
 if debug:
-    o3d.visualization.draw_geometries([point_cloud_gt])
+    draw_geometries([point_cloud_gt], "point_cloud_gt")
 
 print("Creating ground truth voxel grid from points...")
 # Create a VoxelGrid from the PointCloud
 voxel_grid_gt = o3d.geometry.VoxelGrid.create_from_point_cloud(point_cloud_gt, voxel_size)
 
-o3d.visualization.draw_geometries([voxel_grid_gt])
+draw_geometries([voxel_grid_gt], "voxel_grid_gt")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -1150,13 +1151,13 @@ if debug2:
     print(color_array_colmap_8[0])
 
 if debug:
-    o3d.visualization.draw_geometries([point_cloud_colmap])
+    draw_geometries([point_cloud_colmap], "point_cloud_colmap")
 
 print("Creating ground truth voxel grid from points...")
 # Create a VoxelGrid from the PointCloud
 voxel_grid_colmap = o3d.geometry.VoxelGrid.create_from_point_cloud(point_cloud_colmap, voxel_size)
 
-o3d.visualization.draw_geometries([voxel_grid_colmap])
+draw_geometries([voxel_grid_colmap], "voxel_grid_colmap")
 #===================================================================================
 #===================================================================================
 #===================================================================================    
@@ -1399,13 +1400,13 @@ else:
     point_cloud_gt_15.colors = o3d.utility.Vector3dVector(values_gt_found_15_8) 
     
 if debug:
-    o3d.visualization.draw_geometries([point_cloud_gt_15])
+    draw_geometries([point_cloud_gt_15], "point_cloud_gt_15")
 
 # Create a VoxelGrid from the PointCloud
 voxel_grid_gt_15 = o3d.geometry.VoxelGrid.create_from_point_cloud(point_cloud_gt_15, voxel_size)
 
 if debug:
-    o3d.visualization.draw_geometries([voxel_grid_gt_15])
+    draw_geometries([voxel_grid_gt_15], "voxel_grid_gt_15")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -1477,13 +1478,13 @@ values_gt_17_8 = values_gt_17_8[mask]
 point_cloud_gt_17.colors = o3d.utility.Vector3dVector(values_gt_17_8) 
 
 if debug:
-    o3d.visualization.draw_geometries([point_cloud_gt_17])
+    draw_geometries([point_cloud_gt_17], "point_cloud_gt_17")
 
 # Create a VoxelGrid from the PointCloud
 voxel_grid_gt_17 = o3d.geometry.VoxelGrid.create_from_point_cloud(point_cloud_gt_17, voxel_size)
 
 if debug:
-    o3d.visualization.draw_geometries([voxel_grid_gt_17])
+    draw_geometries([voxel_grid_gt_17], "voxel_grid_gt_17")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -1704,13 +1705,13 @@ else:
     point_cloud_colmap_w_bound.colors = o3d.utility.Vector3dVector(values_colmap_found_w_bound_8) 
     
 if debug:
-    o3d.visualization.draw_geometries([point_cloud_colmap_w_bound])
+    draw_geometries([point_cloud_colmap_w_bound], "point_cloud_colmap_w_bound")
 
 # Create a VoxelGrid from the PointCloud
 voxel_grid_colmap_w_bound = o3d.geometry.VoxelGrid.create_from_point_cloud(point_cloud_colmap_w_bound, voxel_size)
 
 if debug:
-    o3d.visualization.draw_geometries([voxel_grid_colmap_w_bound])
+    draw_geometries([voxel_grid_colmap_w_bound], "voxel_grid_colmap_w_bound")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -1779,13 +1780,13 @@ values_colmap_w_bound_8 = values_colmap_w_bound_8[mask]
 point_cloud_colmap_w_bound_color.colors = o3d.utility.Vector3dVector(values_colmap_w_bound_8) 
 
 if debug:
-    o3d.visualization.draw_geometries([point_cloud_colmap_w_bound_color])
+    draw_geometries([point_cloud_colmap_w_bound_color], "point_cloud_colmap_w_bound_color")
 
 # Create a VoxelGrid from the PointCloud
 voxel_grid_colmap_w_bound_color = o3d.geometry.VoxelGrid.create_from_point_cloud(point_cloud_colmap_w_bound_color, voxel_size)
 
 if debug:
-    o3d.visualization.draw_geometries([voxel_grid_colmap_w_bound_color])
+    draw_geometries([voxel_grid_colmap_w_bound_color], "voxel_grid_colmap_w_bound_color")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -1911,13 +1912,13 @@ if debug2:
     print(color_array_gt_8[0])
 
 if debug:
-    o3d.visualization.draw_geometries([point_cloud_gt])
+    draw_geometries([point_cloud_gt], "point_cloud_gt")
 
 print("Creating ground truth voxel grid from points...")
 # Create a VoxelGrid from the PointCloud
 voxel_grid_gt = o3d.geometry.VoxelGrid.create_from_point_cloud(point_cloud_gt, voxel_size)
 
-o3d.visualization.draw_geometries([voxel_grid_gt])
+draw_geometries([voxel_grid_gt], "voxel_grid_gt")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -2053,13 +2054,13 @@ if debug2:
     print(color_array_colmap_8[0])
 
 if debug:
-    o3d.visualization.draw_geometries([point_cloud_colmap])
+    draw_geometries([point_cloud_colmap], "point_cloud_colmap")
 
 print("Creating ground truth voxel grid from points...")
 # Create a VoxelGrid from the PointCloud
 voxel_grid_colmap = o3d.geometry.VoxelGrid.create_from_point_cloud(point_cloud_colmap, voxel_size)
 
-o3d.visualization.draw_geometries([voxel_grid_colmap])
+draw_geometries([voxel_grid_colmap], "voxel_grid_colmap")
 #===================================================================================
 #===================================================================================
 #===================================================================================
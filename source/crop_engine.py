@@ -0,0 +1,348 @@
+#
+# The following module contains the cropping engine used by crop_objects.py
+# (instead of one pcd.crop(bounding_box) per object, which reads the whole scene for every object)
+# 1. Build the oriented bounding box of an object directly from the axis aligned bounding box of its model and its pose
+#    (center, extent and the rotation around the Z-axis, no points and no PCA)
+#    and get the frame of every oriented bounding box (center, rotation and half extent)
+# 2. Build a spatial index (uniform grid) over the axis aligned bounds of the boxes
+# 3. Find for every point the boxes of its cell (candidates) and test the candidates in the frames of the boxes
+# 4. Process the points in chunks so that the memory of the candidate pairs stays bounded
+# 5. Return for every box the indices of the points inside of it (ascending, like pcd.crop)
+# 6. Process the chunks in parallel with a pool of worker processes that share the points and the grid
+# 7. Streaming: read a point cloud (.ply or .xyz) chunk by chunk and keep only the points inside the boxes
+#    (the memory depends on the chunk size and the cropped points, not on the size of the point cloud)
+# 8. Voxelize the cropped objects with one or more voxel sizes, in parallel with one random generator per object
+#
+# Every point is read once, so the time depends on the number of points (and candidates), not on points x objects
+# A point inside several boxes is assigned to all of them, the same as cropping every box on its own
+
+import itertools
+import multiprocessing
+import numpy as np
+import open3d as o3d
+from voxel_grid_utils import get_point_voxels
+from ply_io import read_point_cloud_chunks
+
+# Number of points that are processed at once (the candidate pairs of a chunk are a few times this number)
+CROP_CHUNK_SIZE = 1_000_000
+
+# Arrays shared with the worker processes of crop_points_by_boxes and voxelize_cropped_objects
+# (set before the pool is created, so with fork the workers read them without copying or pickling)
+_shared_crop = {}
+
+# In: The yaw (rotation around the Z-axis) in degrees
+# Out: Numpy array of the rotation matrix (3, 3)
+def get_yaw_rotation(yaw):
+    rotation_radians = np.radians(yaw)
+
+    return np.array([
+        [np.cos(rotation_radians), -np.sin(rotation_radians), 0],
+        [np.sin(rotation_radians), np.cos(rotation_radians), 0],
+        [0, 0, 1]
+    ])
+
+# In: The minimum and maximum corners of the axis aligned bounding box of a model (3), the position of the object (3)
+#     and its yaw in degrees
+# Out: o3d.geometry.OrientedBoundingBox of the object: the axis aligned bounding box rotated around the Z-axis by the yaw
+#      and then translated to the position (the same box as transforming its 8 corners)
+def get_oriented_box(aabb_min, aabb_max, position, yaw):
+    aabb_min = np.asarray(aabb_min, dtype=float)
+    aabb_max = np.asarray(aabb_max, dtype=float)
+    rotation = get_yaw_rotation(yaw)
+    center = rotation @ ((aabb_min + aabb_max) / 2) + np.asarray(position, dtype=float)
+
+    return o3d.geometry.OrientedBoundingBox(center, rotation, aabb_max - aabb_min)
+
+# In: List of o3d.geometry.OrientedBoundingBox
+# Out: Numpy arrays of the centers (K, 3), rotations (K, 3, 3, columns are the axes of the boxes) and half extents (K, 3)
+def get_box_frames(bounding_boxes):
+    centers = np.array([np.asarray(box.center) for box in bounding_boxes], dtype=float).reshape(-1, 3)
+    rotations = np.array([np.asarray(box.R) for box in bounding_boxes], dtype=float).reshape(-1, 3, 3)
+    half_extents = np.array([np.asarray(box.extent) for box in bounding_boxes], dtype=float).reshape(-1, 3) / 2
+
+    return centers, rotations, half_extents
+
+# In: Numpy arrays of the centers, rotations and half extents of the boxes
+# Out: Numpy arrays of the minimum and maximum corners (K, 3) of the axis aligned bounds of the boxes
+def get_box_bounds(centers, rotations, half_extents):
+    # Half extent of the rotated box along the x, y and z axes of the scene
+    world_half_extents = np.einsum("kij,kj->ki", np.abs(rotations), half_extents)
+
+    return centers - world_half_extents, centers + world_half_extents
+
+# Uniform grid over the axis aligned bounds of the boxes, every cell has the list of the boxes that overlap it
+class box_grid:
+    # In: Numpy arrays of the centers, rotations and half extents of the boxes
+    def __init__(self, centers, rotations, half_extents):
+        bounds_min, bounds_max = get_box_bounds(centers, rotations, half_extents)
+
+        # Small padding, so that a point on the boundary of a box is not lost in a neighboring cell by rounding
+        padding = 1e-9 * (1 + np.max(np.abs(np.concatenate((bounds_min, bounds_max)))))
+        bounds_min = bounds_min - padding
+        bounds_max = bounds_max + padding
+
+        # Cell size: the median size of the boxes, a box overlaps a few cells and a cell has a few boxes
+        self.origin = bounds_min.min(axis=0)
+        self.cell_size = np.maximum(np.median(bounds_max - bounds_min, axis=0), 1e-9)
+        self.shape = np.floor((bounds_max.max(axis=0) - self.origin) / self.cell_size).astype(np.int64) + 1
+
+        # Cells of every box: all the cells between the cells of its minimum and maximum corners
+        cells_min = self.get_cells(bounds_min)
+        cells_max = self.get_cells(bounds_max)
+        cell_keys = []
+        box_ids = []
+        for id_box, (cell_min, cell_max) in enumerate(zip(cells_min, cells_max)):
+            ranges = [np.arange(cell_min[axis], cell_max[axis] + 1) for axis in range(3)]
+            cells = np.stack(np.meshgrid(*ranges, indexing="ij"), axis=-1).reshape(-1, 3)
+            cell_keys.append(self.get_keys(cells))
+            box_ids.append(np.full(len(cells), id_box, dtype=np.int64))
+
+        # Sorted by cell key, the boxes of a cell are the range [start, end) found with searchsorted
+        cell_keys = np.concatenate(cell_keys) if cell_keys else np.empty(0, dtype=np.int64)
+        box_ids = np.concatenate(box_ids) if box_ids else np.empty(0, dtype=np.int64)
+        order = np.argsort(cell_keys, kind="stable")
+        self.cell_keys = cell_keys[order]
+        self.box_ids = box_ids[order]
+
+    # In: Numpy array of positions (N, 3)
+    # Out: Numpy array of the cells of the positions (N, 3), not clipped to the grid
+    def get_cells(self, positions):
+        return np.floor((positions - self.origin) / self.cell_size).astype(np.int64)
+
+    # In: Numpy array of cells (N, 3) inside the grid
+    # Out: Numpy array of the keys of the cells (N)
+    def get_keys(self, cells):
+        return (cells[:, 2] * self.shape[1] + cells[:, 1]) * self.shape[0] + cells[:, 0]
+
+    # In: Numpy array of points (N, 3)
+    # Out: Numpy arrays of the candidate pairs: index of the point and id of the box (the boxes of the cell of the point)
+    def get_candidate_pairs(self, points):
+        cells = self.get_cells(points)
+        inside_TF = np.all((cells >= 0) & (cells < self.shape), axis=1)
+        point_indices = np.flatnonzero(inside_TF)
+        keys = self.get_keys(cells[inside_TF])
+
+        starts = np.searchsorted(self.cell_keys, keys, side="left")
+        ends = np.searchsorted(self.cell_keys, keys, side="right")
+        counts = ends - starts
+
+        # One pair for every box of the cell of every point
+        pair_points = np.repeat(point_indices, counts)
+        offsets = np.arange(len(pair_points)) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_boxes = self.box_ids[np.repeat(starts, counts) + offsets]
+
+        return pair_points, pair_boxes
+
+# In: Numpy array of points (N, 3), numpy arrays of the centers, rotations and half extents of the boxes,
+#     the candidate pairs (index of the point, id of the box)
+# Out: Numpy boolean array, True if the point of the pair is inside the box of the pair (boundaries included)
+def test_pairs_inside(points, centers, rotations, half_extents, pair_points, pair_boxes):
+    # Coordinates of the points in the frames of the boxes: R^T (point - center)
+    local = np.einsum("kij,ki->kj", rotations[pair_boxes], points[pair_points] - centers[pair_boxes])
+
+    return np.all(np.abs(local) <= half_extents[pair_boxes], axis=1)
+
+# In: Numpy array of points (N, 3), numpy arrays of the centers, rotations and half extents of the boxes and their grid
+# Out: The pairs with the point inside the box: indices of the points and ids of the boxes
+def assign_points_to_boxes(points, centers, rotations, half_extents, grid):
+    pair_points, pair_boxes = grid.get_candidate_pairs(points)
+    inside_TF = test_pairs_inside(points, centers, rotations, half_extents, pair_points, pair_boxes)
+
+    return pair_points[inside_TF], pair_boxes[inside_TF]
+
+# In: The pairs (indices of the points and ids of the boxes) and the number of boxes
+# Out: List of (id of the box, indices of its points) for the boxes that have points
+#      (the stable sort keeps the points of a box in the order of the pairs)
+def group_pairs_by_box(pair_points, pair_boxes, num_boxes):
+    order = np.argsort(pair_boxes, kind="stable")
+    splits = np.searchsorted(pair_boxes[order], np.arange(1, num_boxes))
+
+    return [(id_box, indices) for id_box, indices in enumerate(np.split(pair_points[order], splits)) if len(indices) > 0]
+
+# In: The arrays of _shared_crop
+# Out: - (sets _shared_crop of a worker process, needed only when the workers are not forked)
+def _init_worker(shared_crop):
+    _shared_crop.update(shared_crop)
+
+# In: The index of the first point of a chunk
+# Out: The pairs of the chunk with the point inside the box: indices of the points (in the whole point cloud) and ids of the boxes
+#      (run by a worker process)
+def _crop_chunk(chunk_start):
+    points_chunk = np.asarray(_shared_crop["points"][chunk_start:chunk_start + _shared_crop["chunk_size"]], dtype=float)
+
+    pair_points, pair_boxes = assign_points_to_boxes(points_chunk, _shared_crop["centers"], _shared_crop["rotations"],
+                                                     _shared_crop["half_extents"], _shared_crop["grid"])
+
+    return pair_points + chunk_start, pair_boxes
+
+# In: Numpy array of points (N, 3), list of o3d.geometry.OrientedBoundingBox, the number of points of a chunk,
+#     optionally the number of worker processes (1: no parallel processing) and a function without arguments that is called
+#     before the workers are forked (e.g. background_writer.wait, so that no other thread runs while forking)
+# Out: List with one numpy array for every box: the indices of the points inside the box (ascending)
+#      The results are the same for any number of workers and any chunk size
+def crop_points_by_boxes(points, bounding_boxes, chunk_size=CROP_CHUNK_SIZE, workers=1, before_fork=None):
+    points = np.asarray(points)
+    num_boxes = len(bounding_boxes)
+    num_points = len(points)
+
+    if num_boxes == 0:
+        return []
+
+    # With several workers split the points in (at least) 4 chunks per worker, so that they stay busy
+    if workers > 1:
+        chunk_size = min(chunk_size, max(-(-num_points // (4 * workers)), 1))
+
+    centers, rotations, half_extents = get_box_frames(bounding_boxes)
+    _shared_crop.update(points=points, centers=centers, rotations=rotations, half_extents=half_extents,
+                        grid=box_grid(centers, rotations, half_extents), chunk_size=chunk_size)
+
+    chunk_starts = range(0, num_points, chunk_size)
+    indices_chunks = [[] for _ in range(num_boxes)]
+
+    # In: The pairs of a chunk
+    # Out: - (groups the pairs by box, the points of a box stay ascending)
+    def add_chunk(pair_points, pair_boxes):
+        for id_box, indices in group_pairs_by_box(pair_points, pair_boxes, num_boxes):
+            indices_chunks[id_box].append(indices)
+
+    try:
+        if workers > 1 and len(chunk_starts) > 1:
+            # The workers are forked after _shared_crop is set, so they share the points and the grid
+            # (where fork is not available they are copied once to every worker)
+            start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+            if before_fork is not None:
+                before_fork()
+            with multiprocessing.get_context(start_method).Pool(workers, initializer=_init_worker, initargs=(dict(_shared_crop),)) as pool:
+                # imap returns the results in the order of the chunks, so the indices stay ascending
+                for pair_points, pair_boxes in pool.imap(_crop_chunk, chunk_starts):
+                    add_chunk(pair_points, pair_boxes)
+        else:
+            for chunk_start in chunk_starts:
+                add_chunk(*_crop_chunk(chunk_start))
+    finally:
+        _shared_crop.clear()
+
+    return [np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64) for chunks in indices_chunks]
+
+# In: The path to a .xyz file (x y z on every line) and the number of points of a chunk
+# Out: Generator of chunks: the points (M, 3) float64 and no colors and normals (None, None)
+def read_xyz_chunks(path_to_xyz, chunk_size=CROP_CHUNK_SIZE):
+    with open(path_to_xyz, "r") as file:
+        while True:
+            lines = list(itertools.islice(file, chunk_size))
+            if len(lines) == 0:
+                break
+
+            yield np.loadtxt(lines, dtype=float, usecols=(0, 1, 2), ndmin=2).reshape(-1, 3), None, None
+
+# In: The path to a point cloud (.ply or .xyz) and the number of points of a chunk
+# Out: Generator of chunks: the points (M, 3) float64, the colors (M, 3) uint8 and the normals (M, 3) float64
+#      (None if the point cloud has no colors / normals)
+def read_point_chunks(path_to_file, chunk_size=CROP_CHUNK_SIZE):
+    if path_to_file.lower().endswith(".ply"):
+        return read_point_cloud_chunks(path_to_file, chunk_size)
+
+    return read_xyz_chunks(path_to_file, chunk_size)
+
+# In: The path to a point cloud (.ply or .xyz), list of o3d.geometry.OrientedBoundingBox and the number of points of a chunk
+# Out: List with one tuple for every box: the points (M, 3), the colors (M, 3) uint8 and the normals (M, 3) of the points inside the box
+#      (the same points as crop_points_by_boxes in the order of the file, None if the point cloud has no colors / normals)
+#      The point cloud is read chunk by chunk, only one chunk and the points inside the boxes are in memory
+def crop_file_by_boxes(path_to_file, bounding_boxes, chunk_size=CROP_CHUNK_SIZE):
+    num_boxes = len(bounding_boxes)
+    centers, rotations, half_extents = get_box_frames(bounding_boxes)
+    grid = box_grid(centers, rotations, half_extents) if num_boxes > 0 else None
+
+    # Parts (points, colors, normals) of every box, one for each chunk with points inside the box
+    parts = [[] for _ in range(num_boxes)]
+    colors_TF = False
+    normals_TF = False
+
+    for points, colors, normals in read_point_chunks(path_to_file, chunk_size):
+        colors_TF = colors is not None
+        normals_TF = normals is not None
+
+        if num_boxes == 0:
+            continue
+
+        pair_points, pair_boxes = assign_points_to_boxes(points, centers, rotations, half_extents, grid)
+        for id_box, indices in group_pairs_by_box(pair_points, pair_boxes, num_boxes):
+            parts[id_box].append((points[indices],
+                                  colors[indices] if colors_TF else None,
+                                  normals[indices] if normals_TF else None))
+
+    # In: List of arrays (N, 3) and the dtype of the empty array
+    # Out: The arrays concatenated (an empty array if there are none)
+    def concatenate(arrays, dtype):
+        return np.concatenate(arrays) if len(arrays) > 0 else np.empty((0, 3), dtype=dtype)
+
+    cropped = []
+    for parts_box in parts:
+        points = concatenate([part[0] for part in parts_box], float)
+        colors = concatenate([part[1] for part in parts_box], np.uint8) if colors_TF else None
+        normals = concatenate([part[2] for part in parts_box], float) if normals_TF else None
+        cropped.append((points, colors, normals))
+
+    return cropped
+
+# In: Numpy arrays of the points (N, 3), the colors (N, 3) uint8 (or None) and the normals (N, 3) (or None)
+# Out: o3d.geometry.PointCloud with the points, colors (in [0, 1] as o3d.io.read_point_cloud) and normals
+def create_point_cloud(points, colors=None, normals=None):
+    pcd = o3d.geometry.PointCloud(o3d.utility.Vector3dVector(np.asarray(points, dtype=float)))
+
+    if colors is not None:
+        pcd.colors = o3d.utility.Vector3dVector(np.asarray(colors) / 255.0)
+    if normals is not None:
+        pcd.normals = o3d.utility.Vector3dVector(np.asarray(normals, dtype=float))
+
+    return pcd
+
+# In: Numpy array of the points of a cropped object (N, 3) with N > 0, list of voxel sizes, the color channel of the random shades
+#     (0: red, 1: green, 2: blue) and the numpy random generator of the object
+# Out: List with one voxel grid for every voxel size: grid indices (M, 3), origin (3) and colors (M, 3) in [0, 1]
+#      (random shades of the color channel, the other channels are 0)
+def voxelize_cropped_points(points, voxel_sizes, color_channel, rng):
+    voxel_grids = []
+    for voxel_size in voxel_sizes:
+        coords, origin, _ = get_point_voxels(points, voxel_size)
+
+        colors = np.zeros((len(coords), 3))
+        colors[:, color_channel] = rng.uniform(0.0, 1.0, size=len(coords))
+
+        voxel_grids.append((coords, origin, colors))
+
+    return voxel_grids
+
+# In: The index of a cropped object
+# Out: The voxel grids of the cropped object (run by a worker process), None if it has no points
+def _voxelize_object(index_object):
+    points = _shared_crop["points_list"][index_object]
+
+    if len(points) == 0:
+        return None
+
+    # One random generator for each object, so the colors do not depend on the number of workers
+    random_seed = _shared_crop["random_seed"]
+    rng = np.random.default_rng(None if random_seed is None else [random_seed, _shared_crop["color_channel"], index_object])
+
+    return voxelize_cropped_points(points, _shared_crop["voxel_sizes"], _shared_crop["color_channel"], rng)
+
+# In: List of numpy arrays of the points of the cropped objects, list of voxel sizes, the color channel of the random shades,
+#     the seed of the random colors (None: different colors at each run), optionally the number of worker processes
+#     and a function without arguments that is called before the workers are forked (see crop_points_by_boxes)
+# Out: List with the voxel grids of every cropped object (see voxelize_cropped_points), None for objects without points
+#      (in the order of the objects, the same for any number of workers)
+def voxelize_cropped_objects(points_list, voxel_sizes, color_channel, random_seed=None, workers=1, before_fork=None):
+    _shared_crop.update(points_list=points_list, voxel_sizes=list(voxel_sizes), color_channel=color_channel, random_seed=random_seed)
+
+    try:
+        if workers > 1 and len(points_list) > 1:
+            start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+            if before_fork is not None:
+                before_fork()
+            with multiprocessing.get_context(start_method).Pool(workers, initializer=_init_worker, initargs=(dict(_shared_crop),)) as pool:
+                return pool.map(_voxelize_object, range(len(points_list)))
+
+        return [_voxelize_object(index_object) for index_object in range(len(points_list))]
+    finally:
+        _shared_crop.clear()
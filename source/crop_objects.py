@@ -10,19 +10,53 @@
 # 7. Combines and visualizes pcd of ground truth and colmap (aligned)
 # 8. Crop objects from ground truth pcd and store them
 # 9. Crop objects from colmap (aligned) pcd and store them
-# 10. Visualize and store combined ground truth and colmap (aligned) cropped objects
-# 11. Voxelize ground truth and colmap (aligned) cropped objects
+# 10. Visualize combined ground truth and colmap (aligned) cropped objects (stored only with combined_mode "eager",
+#     otherwise they are created on demand by show_combined_cropped_objects.py)
+# 11. Voxelize ground truth and colmap (aligned) cropped objects (in memory, with one or more voxel sizes)
 
 
 # Configuration:
 # Debug Mode: True to run in debug mode, False to run in normal mode
-debug = True
-debug2 = True
-debug3 = True
-debug4 = True
-debug5 = True
-debug6 = True
-
+# (every True flag opens its viewer windows, unless --headless skip or save is given, so a run does not wait for them by default)
+debug = False
+debug2 = False
+debug3 = False
+debug4 = False
+debug5 = False
+debug6 = False
+
+# Cropping: "single_pass" (default): every point of a point cloud is assigned to the boxes that contain it in one pass
+# over the point cloud (see crop_engine.py), "per_object": pcd.crop(bounding_box) for every object (the point cloud is read once per object)
+# "streaming": the point clouds are not loaded, they are read in chunks of streaming_chunk_size points and only the points
+# inside the boxes are kept (the memory depends on the chunk size and the cropped points, for point clouds larger than the memory,
+# the visualizations of the whole point clouds are skipped)
+crop_mode = "single_pass"
+
+# Number of points read at once by the "streaming" cropping
+streaming_chunk_size = 1_000_000
+
+# Extent cache: the aabb of the models are kept in <file_path_to_model_dir>/model_extents.json (see model_extents.py),
+# a model file is read only if it is new or changed (False: every model file is read once per run)
+use_extent_cache = True
+
+# Voxel sizes of the voxelized cropped objects (Section 11), all voxelized from the cropped points in memory
+# The first voxel size is stored as <name>_voxelized.ply, the others as <name>_voxelized_vox_<voxel_size>.ply
+# (compare_voxel_grids_all.py reads <name>_voxelized_vox_<voxel_size>.ply of its voxel size if it exists, otherwise <name>_voxelized.ply)
+voxel_sizes = [0.3]
+
+# Seed of the random colors of the voxels, None: different colors at each run
+# (every object has its own random generator, so the colors do not depend on the number of workers)
+random_seed = None
+
+# Number of files that wait to be written by the background writer (see background_writer.py), the writes overlap
+# with the cropping and voxelizing (0: every file is written before the script continues)
+# With --workers the queued files are written and the writer thread is stopped before the worker processes are forked
+writer_queue_size = 8
+
+# Combined cropped objects (ground truth blue and colmap (aligned) green): "lazy" (default): they are not stored, they are
+# created on demand from the two cropped objects (see combined_crops.py and show_combined_cropped_objects.py),
+# "eager": they are also stored in combined_cropped_objects (a third copy of the points of every cropped object)
+combined_mode = "lazy"
 
 # Section: 0
 # Importing modules
@@ -33,7 +67,13 @@ import sys
 import os
 import open3d as o3d
 import numpy as np
-import glob
+from visualization_sink import draw_geometries, read_headless_argument, get_headless_mode
+from crop_engine import crop_points_by_boxes, crop_file_by_boxes, create_point_cloud, get_oriented_box, voxelize_cropped_objects
+from model_extents import get_model_aabbs, EXTENT_CACHE_FILENAME
+from voxel_grid_utils import get_point_voxels, create_voxel_grid, get_voxelized_file_name
+from ply_io import write_voxel_grid_arrays, write_point_cloud_arrays
+from background_writer import background_writer
+from combined_crops import get_combined_arrays, create_combined_point_cloud, get_cropped_object_paths, COMBINED_DIRECTORY
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -44,9 +84,32 @@ import glob
 #===================================================================================
 #===================================================================================
 #===================================================================================
+# Read the optional --headless <skip|save|show> (it can be placed anywhere after the script name)
+# Visualizations are skipped or saved to files instead of opening viewer windows
+read_headless_argument(sys.argv)
+
+# Read the optional --workers <number_of_workers> (it can be placed anywhere after the script name)
+# Number of worker processes used for cropping and voxelizing, the results are the same for any number of workers
+workers = 1 # default value
+
+if "--workers" in sys.argv:
+    position_workers = sys.argv.index("--workers")
+    try:
+        workers = int(sys.argv[position_workers + 1])
+    except (IndexError, ValueError):
+        print("Error: --workers must be followed by a valid integer")
+        sys.exit(1)
+
+    if workers < 1:
+        print("Error: --workers must be at least 1")
+        sys.exit(1)
+
+    # Remove --workers and its value so that the rest of the arguments keep their positions
+    del sys.argv[position_workers:position_workers + 2]
+
 # Check if a command-line argument is provided
 if len(sys.argv) != 3:
-    print("Error: Usage python crop_objects.py <file_path_to_project> <file_path_to_model_dir>")
+    print("Error: Usage python crop_objects.py <file_path_to_project> <file_path_to_model_dir> [--workers <number_of_workers>] [--headless <skip|save|show>]")
     print("file_path_to_project: provide the path to the project that contains output_dataset_txt and ground_truth_point_cloud.xyz")
     print("file_path_to_parent_of_model_dir: provide the path to the parent directory that in resources/model has the models e.g. check vrg_crop_gen")
     print(len(sys.argv))
@@ -165,13 +228,16 @@ print("Reading and visualizing ground truth\n")
 
 # Construct ground truth file path
 ground_truth_file_path = os.path.join(file_path_to_project, "ground_truth_point_cloud.xyz")
-# Read ground truth point cloud
-print("Reading ground truth point cloud...")
-pcd_ground_truth = o3d.io.read_point_cloud(ground_truth_file_path)
-if debug:
+# Read ground truth point cloud (streaming: it is read in chunks in Section 8)
+if crop_mode == "streaming":
+    print("Streaming: the ground truth point cloud is read in chunks in Section 8")
+else:
+    print("Reading ground truth point cloud...")
+    pcd_ground_truth = o3d.io.read_point_cloud(ground_truth_file_path)
+if debug and crop_mode != "streaming":
     # Visualize ground truth point cloud
     print("Visualizing ground truth point cloud...")
-    o3d.visualization.draw_geometries([pcd_ground_truth])
+    draw_geometries([pcd_ground_truth], "pcd_ground_truth")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -188,14 +254,17 @@ print("Reading and visualizing colmap (aligned) point cloud\n")
 
 # Construct colmap file path
 colmap_aligned_file_path = os.path.join(file_path_to_project, "align", "fused.ply")
-# Read colmap (aligned) point cloud
-print("Reading colmap (aligned) point cloud...")
-pcd_colmap_aligned = o3d.io.read_point_cloud(colmap_aligned_file_path)
-
-if debug:
+# Read colmap (aligned) point cloud (streaming: it is read in chunks in Section 9)
+if crop_mode == "streaming":
+    print("Streaming: the colmap (aligned) point cloud is read in chunks in Section 9")
+else:
+    print("Reading colmap (aligned) point cloud...")
+    pcd_colmap_aligned = o3d.io.read_point_cloud(colmap_aligned_file_path)
+
+if debug and crop_mode != "streaming":
     # Visualize colmap (aligned) point cloud
     print("Visualizing colmap (aligned) point cloud...")
-    o3d.visualization.draw_geometries([pcd_colmap_aligned])
+    draw_geometries([pcd_colmap_aligned], "pcd_colmap_aligned")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -222,6 +291,9 @@ def find_ply_files(directory):
                 ply_files.append((file, file_path))
     return ply_files
 
+# Path to the extent cache of the models
+path_to_extent_cache = os.path.join(file_path_to_model_dir, EXTENT_CACHE_FILENAME)
+
 # Search for .ply files in the file_path_to_model_dir directory and its subdirectories
 ply_files = find_ply_files(file_path_to_model_dir)
 
@@ -267,131 +339,120 @@ print("This section reads the axis aligned bounding box(aabb) for each selected_
      Then combines and visualizes all aabbs (both pcd and mesh) for the selected_objects with the ground truth and colmap (aligned) point_clouds\
     ")
 
+# Visualizations are requested (the geometries that are only used by visualizations are created only if this is True)
+visualize_TF = get_headless_mode() != "skip"
+
+# This function receives an oriented bounding box
+# and creates its mesh (only used for the visualizations)
+def get_aabb_mesh(bounding_box):
+    # Set the pairs of points to be used to create the triangles of the mesh
+    triangles = np.array([
+    [3, 6, 5],
+    [4, 5, 6],
+    [2, 1, 0],
+    [1, 2, 7],
+    [0, 3, 2],
+    [3, 5, 2],
+    [7, 4, 1],
+    [1, 4, 6],
+    [6, 3, 0],
+    [0, 1, 6],
+    [2, 5, 4],
+    [2, 4, 7]
+    ])
+    
+    # Create an empty object of a triangle mesh
+    mesh = o3d.geometry.TriangleMesh()
+    # Set the vertices of the mesh to the points of the box (same order as the points of the aabb)
+    mesh.vertices = bounding_box.get_box_points()
+    # Set the pairs to create the triangles
+    mesh.triangles = o3d.utility.Vector3iVector(triangles)
+
+    return mesh
+
 # This function receives the list of object_poses
-# and finds all the aabb for each object
-# transforms, and rotates each one
+# and finds all the aabb for each object (once for each model, from the extent cache if the model did not change)
+# Then creates the oriented bounding box of each object directly from the aabb and the pose
+# (rotated around the Z-axis by the yaw and translated to the position)
 # Then combines them into a single list 
-def combine_all_aabb(object_poses, all_aabb):
+def combine_all_aabb(object_poses, all_bounding_boxes):
+    # Get the aabb of every model (see model_extents.py)
+    print("Getting aabb of the models...")
+    model_aabbs = get_model_aabbs([obj.path_to_ply for obj in object_poses], path_to_extent_cache if use_extent_cache else None)
+
     for obj in object_poses:
-        # Load the PLY file
-        print("Reading pcd of object")
-        pcd_obj = o3d.io.read_point_cloud(obj.path_to_ply)
-        
-        # Calculate aabb
-        aabb = pcd_obj.get_axis_aligned_bounding_box()
-        # Set color of aabb to red
-        aabb.color = (1, 0, 0)
-        if debug:
+        # Get the aabb of the model of the object
+        aabb_min, aabb_max = model_aabbs[obj.path_to_ply]
+
+        if debug and visualize_TF:
+            # Load the PLY file (only for the visualization)
+            print("Reading pcd of object")
+            pcd_obj = o3d.io.read_point_cloud(obj.path_to_ply)
+            aabb = o3d.geometry.AxisAlignedBoundingBox(aabb_min, aabb_max)
+            # Set color of aabb to red
+            aabb.color = (1, 0, 0)
             print("Visualizing pcd of object with aabb")
-            o3d.visualization.draw_geometries([pcd_obj, aabb])
-
-        # Get points of axis aligned bounding box
-        points_of_aabb = aabb.get_box_points()
+            draw_geometries([pcd_obj, aabb], "pcd_obj")
 
-        # Set the translation matrix based on the position of the object
+        # Set the translation based on the position of the object
         translation = np.array([obj.x_coords, obj.y_coords, obj.z_coords])
 
-        # Create transformation matrices
-        translation_matrix = np.identity(4)
-        translation_matrix[:3, 3] = translation
-        # Rotation in degrees around the Z-axis
-        # Transform to radians
-        rotation_radians = np.radians(obj.yaw)
-        # Create the rotation matrix
-        rotation_matrix = np.array([
-            [np.cos(rotation_radians), -np.sin(rotation_radians), 0, 0],
-            [np.sin(rotation_radians), np.cos(rotation_radians), 0, 0],
-            [0, 0, 1, 0],
-            [0, 0, 0, 1]
-        ])
-
-        # Combine translation and rotation into a single transformation matrix
-        transformation_matrix = np.dot(translation_matrix, rotation_matrix)
-        
-        # Create an empty point cloud object
-        points_of_aabb_open3d_obj = o3d.geometry.PointCloud()
-        # Set the points of the point cloud to the points that we got from the aabb
-        points_of_aabb_open3d_obj.points = o3d.utility.Vector3dVector(points_of_aabb)
-        # Apply the transformation to the point cloud
-        points_of_aabb_open3d_obj.transform(transformation_matrix)
-
-        if debug:
+        # Create the oriented bounding box from the center, extent and rotation (yaw in degrees around the Z-axis)
+        bounding_box = get_oriented_box(aabb_min, aabb_max, translation, obj.yaw)
+
+        if debug and visualize_TF:
+            # Points of the oriented bounding box (the points of the aabb after the transform)
+            points_of_aabb_open3d_obj = o3d.geometry.PointCloud(bounding_box.get_box_points())
             print("Visualizing pcd of aabb (after transform)")
-            o3d.visualization.draw_geometries([points_of_aabb_open3d_obj])
-
-        # Set the pairs of points to be used to create the triangles of the mesh
-        triangles = np.array([
-        [3, 6, 5],
-        [4, 5, 6],
-        [2, 1, 0],
-        [1, 2, 7],
-        [0, 3, 2],
-        [3, 5, 2],
-        [7, 4, 1],
-        [1, 4, 6],
-        [6, 3, 0],
-        [0, 1, 6],
-        [2, 5, 4],
-        [2, 4, 7]
-        ])
-        
-        # Create an empty object of a triangle mesh
-        mesh = o3d.geometry.TriangleMesh()
-        # Set the vertices of the mesh to the transformed points
-        mesh.vertices = points_of_aabb_open3d_obj.points
-        # Set the pairs to create the triangles
-        mesh.triangles = o3d.utility.Vector3iVector(triangles)
-
-        if debug:
-            print("Visualizing mesh of aabb (after transform)")
-            o3d.visualization.draw_geometries([mesh])
+            draw_geometries([points_of_aabb_open3d_obj], "points_of_aabb_open3d_obj")
 
-        all_aabb.append(mesh)
+            print("Visualizing mesh of aabb (after transform)")
+            draw_geometries([get_aabb_mesh(bounding_box)], "mesh")
 
-        # Store the mesh in the list
-        #all_aabb.append(mesh_aabb)
+        all_bounding_boxes.append(bounding_box)
 
-    return all_aabb
+    return all_bounding_boxes
 
-# Initialize the list that will contain all the aabb
-all_aabb = []
+# Initialize the list that will contain all the oriented bounding boxes
+all_bounding_boxes = []
 
 # Call combine_all_aabb
 print("Getting all aabb...")
-all_aabb = combine_all_aabb(object_poses, all_aabb)
+all_bounding_boxes = combine_all_aabb(object_poses, all_bounding_boxes)
+
+if debug and visualize_TF and crop_mode != "streaming":
+    # Meshes of all the aabb (after transform)
+    all_aabb = [get_aabb_mesh(bounding_box) for bounding_box in all_bounding_boxes]
 
-# Number of points for each aabb
-number_of_points = 25000
-print(f"Number of points per aabb: {number_of_points}")
+    # Number of points for each aabb
+    number_of_points = 25000
+    print(f"Number of points per aabb: {number_of_points}")
 
-# Create a point cloud containing all the aabb(pcd)
-print("Creating pcd of combined aabb ...")
-all_aabb_pcd = o3d.geometry.PointCloud()
-for mesh in all_aabb:
-    all_aabb_pcd += mesh.sample_points_uniformly(number_of_points)
+    # Create a point cloud containing all the aabb(pcd)
+    print("Creating pcd of combined aabb ...")
+    all_aabb_pcd = o3d.geometry.PointCloud()
+    for mesh in all_aabb:
+        all_aabb_pcd += mesh.sample_points_uniformly(number_of_points)
 
-if debug:
     # Visualize the ground truth point cloud and all the aabb(pcd)
     print("Visualizing combined pcd of ground truth and aabb")
     all_geometries = [pcd_ground_truth] + [all_aabb_pcd]
-    o3d.visualization.draw_geometries(all_geometries)    
+    draw_geometries(all_geometries, "all_geometries")    
 
     # Visualize the ground truth point cloud and all the aabb(mesh)
     print("Visualizing combined pcd of ground truth and meshes of aabb")
     geometries = all_aabb + [pcd_ground_truth]  
-    o3d.visualization.draw_geometries(geometries)
+    draw_geometries(geometries, "geometries")
 
     # Visualize the colmap (aligned) point cloud and all the aabb(pcd)
     print("Visualizing combined pcd of colmap (aligned) and aabb")
     all_geometries = [pcd_colmap_aligned] + [all_aabb_pcd]
-    o3d.visualization.draw_geometries(all_geometries)
+    draw_geometries(all_geometries, "all_geometries")
 
     # Visualize the colmap (aligned) point cloud and all the aabb(mesh)
     print("Visualizing combined pcd of colmap (aligned) and meshes of aabb")
     geometries = all_aabb + [pcd_colmap_aligned]
-    o3d.visualization.draw_geometries(geometries)
-#===================================================================================
-#===================================================================================
+    draw_geometries(geometries, "geometries")
 #===================================================================================
 
 # Section: 7
@@ -404,10 +465,10 @@ print("=========================================================================
 print("Section: 7")
 print("Combines and visualizes pcd of ground truth and colmap (aligned)\n")
 # Visualize ground truth and colmap (aligned) point clouds
-if debug:
+if debug and crop_mode != "streaming":
     print("Visualizing combined pcd of ground truth and colmap (aligned)")
     all_geometries = [pcd_ground_truth] + [pcd_colmap_aligned]
-    o3d.visualization.draw_geometries(all_geometries)
+    draw_geometries(all_geometries, "all_geometries")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -422,41 +483,67 @@ print("=========================================================================
 print("Section: 8")
 print("Crop objects from ground truth pcd and store them\n")
 
+# Background writer of the cropped objects and voxel grids (all files are written at the end of Section 11)
+writer = background_writer(writer_queue_size)
+
+# This function receives the output file and a point cloud
+# and queues the point cloud to the background writer (the same file as o3d.io.write_point_cloud)
+def save_point_cloud(output_file, pcd):
+    # Point clouds without points are not stored (o3d.io.write_point_cloud does not write them)
+    if not pcd.has_points():
+        print(f"{output_file} has no points, it is not saved")
+        return
+
+    colors = np.asarray(pcd.colors) if pcd.has_colors() else None
+    normals = np.asarray(pcd.normals) if pcd.has_normals() else None
+    writer.submit(write_point_cloud_arrays, output_file, np.asarray(pcd.points), colors, normals)
+
+    print(f"Saving {output_file}")
+
 # Initialize list that will contain the cropped objects
 pcd_ground_truth_cropped_objects = []
 
-for mesh in all_aabb:
-    # Get vertices of mesh
-    vertices = mesh.vertices
-    # Transform to o3d vector
-    o3d_vertices = o3d.utility.Vector3dVector(vertices)
-    # Create oriented bounding box from the mesh vertices
-    bounding_box = o3d.geometry.OrientedBoundingBox.create_from_points(o3d_vertices) 
-
-    if debug2:
+if crop_mode == "streaming":
+    # Points of each object, the ground truth point cloud is read in chunks
+    print("Streaming the ground truth point cloud and assigning the points to the objects...")
+    streamed_ground_truth = crop_file_by_boxes(ground_truth_file_path, all_bounding_boxes, streaming_chunk_size)
+elif crop_mode == "single_pass":
+    # Indices of the points of each object, one pass over the ground truth point cloud
+    print("Assigning the points of the ground truth point cloud to the objects...")
+    indices_ground_truth = crop_points_by_boxes(np.asarray(pcd_ground_truth.points), all_bounding_boxes, workers=workers, before_fork=writer.wait)
+
+for i, bounding_box in enumerate(all_bounding_boxes):
+    if debug2 and visualize_TF:
         print("Visualizing bounding box...")
         # Visualize bounding box
         bounding_box.color = (1, 0, 0)
         print(bounding_box)
-        o3d.visualization.draw_geometries([bounding_box])
+        draw_geometries([bounding_box], "bounding_box")
 
     # Crop the point cloud using the bounding box
-    pcd_ground_truth_cropped = pcd_ground_truth.crop(bounding_box)
+    if crop_mode == "streaming":
+        pcd_ground_truth_cropped = create_point_cloud(*streamed_ground_truth[i])
+        # The arrays are not needed anymore (the point cloud has its own copy)
+        streamed_ground_truth[i] = None
+    elif crop_mode == "single_pass":
+        pcd_ground_truth_cropped = pcd_ground_truth.select_by_index(indices_ground_truth[i])
+    else:
+        pcd_ground_truth_cropped = pcd_ground_truth.crop(bounding_box)
 
     # Append cropped object
     pcd_ground_truth_cropped_objects.append(pcd_ground_truth_cropped)
 
-    if debug2:
+    if debug2 and visualize_TF:
         print("Visualizing cropped point cloud...")
         # Display the cropped point cloud:
-        o3d.visualization.draw_geometries([pcd_ground_truth_cropped])
+        draw_geometries([pcd_ground_truth_cropped], "pcd_ground_truth_cropped")
         print("Visualizing cropped point cloud. and aabb..")
         # Display the cropped point cloud and aabb
-        geometries = [mesh] + [pcd_ground_truth_cropped]  
-        o3d.visualization.draw_geometries(geometries)
+        geometries = [get_aabb_mesh(bounding_box)] + [pcd_ground_truth_cropped]  
+        draw_geometries(geometries, "geometries")
 
 # Visualize combined ground truth cropped objects
-if debug3:
+if debug3 and visualize_TF:
     # Initialize an empty point cloud to store the combined ground truth cropped objects
     pcd_ground_truth_cropped_objects_combined = o3d.geometry.PointCloud()
     
@@ -467,14 +554,14 @@ if debug3:
         
     # Visualize point cloud with all ground truth cropped objects
     print("Visualizing point cloud with all ground truth cropped objects...")
-    o3d.visualization.draw_geometries([pcd_ground_truth_cropped_objects_combined])
+    draw_geometries([pcd_ground_truth_cropped_objects_combined], "pcd_ground_truth_cropped_objects_combined")
        
 # Visualizes combined ground truth cropped objects and all the aabb(mesh)     
-if debug3:
+if debug3 and visualize_TF:
     # Visualizes combined ground truth cropped objects and all the aabb(mesh)    
     print("Visualizing combined pcd of ground truth and meshes of aabb")
-    geometries = all_aabb + [pcd_ground_truth_cropped_objects_combined]  
-    o3d.visualization.draw_geometries(geometries)
+    geometries = [get_aabb_mesh(bounding_box) for bounding_box in all_bounding_boxes] + [pcd_ground_truth_cropped_objects_combined]  
+    draw_geometries(geometries, "geometries")
 
 # Constructing ground truth cropped objects file path
 file_name_gt_cropped_objects = "gt_cropped_objects"
@@ -491,12 +578,10 @@ for i, pcd in enumerate(pcd_ground_truth_cropped_objects):
     output_file = os.path.join(file_path_gt_cropped_objects, f"{object_poses[i].ID_counter}_gt_{object_poses[i].object_name}.ply")  
         
     # Save the point cloud to the specified file
-    o3d.io.write_point_cloud(output_file, pcd)
-
-    print(f"Saved {output_file}")
+    save_point_cloud(output_file, pcd)
     
 
-print("Ground truth cropped objects saved successfully")
+print("Ground truth cropped objects queued to be saved")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -514,38 +599,47 @@ print("Crop objects from colmap (aligned) pcd and store them\n")
 # Initialize list that will contain the cropped objects
 pcd_colmap_a_cropped_objects = []
 
-for mesh in all_aabb:
-    # Get vertices of mesh
-    vertices = mesh.vertices
-    # Transform to o3d vector
-    o3d_vertices = o3d.utility.Vector3dVector(vertices)
-    # Create oriented bounding box from mesh vertices
-    bounding_box = o3d.geometry.OrientedBoundingBox.create_from_points(o3d_vertices) 
-
-    if debug4:
+if crop_mode == "streaming":
+    # Points of each object, the colmap (aligned) point cloud is read in chunks
+    print("Streaming the colmap (aligned) point cloud and assigning the points to the objects...")
+    streamed_colmap_a = crop_file_by_boxes(colmap_aligned_file_path, all_bounding_boxes, streaming_chunk_size)
+elif crop_mode == "single_pass":
+    # Indices of the points of each object, one pass over the colmap (aligned) point cloud
+    print("Assigning the points of the colmap (aligned) point cloud to the objects...")
+    indices_colmap_a = crop_points_by_boxes(np.asarray(pcd_colmap_aligned.points), all_bounding_boxes, workers=workers, before_fork=writer.wait)
+
+for i, bounding_box in enumerate(all_bounding_boxes):
+    if debug4 and visualize_TF:
         print("Visualizing bounding box...")
         # Visualize bounding box
         bounding_box.color = (1, 0, 0)
         print(bounding_box)
-        o3d.visualization.draw_geometries([bounding_box])
+        draw_geometries([bounding_box], "bounding_box")
 
     # Crop the colmap (aligned) using the bounding box
-    pcd_colmap_a_cropped = pcd_colmap_aligned.crop(bounding_box)
+    if crop_mode == "streaming":
+        pcd_colmap_a_cropped = create_point_cloud(*streamed_colmap_a[i])
+        # The arrays are not needed anymore (the point cloud has its own copy)
+        streamed_colmap_a[i] = None
+    elif crop_mode == "single_pass":
+        pcd_colmap_a_cropped = pcd_colmap_aligned.select_by_index(indices_colmap_a[i])
+    else:
+        pcd_colmap_a_cropped = pcd_colmap_aligned.crop(bounding_box)
 
     # Append cropped object
     pcd_colmap_a_cropped_objects.append(pcd_colmap_a_cropped)
 
-    if debug4:
+    if debug4 and visualize_TF:
         print("Visualizing cropped point cloud...")
         # Display the cropped point cloud:
-        o3d.visualization.draw_geometries([pcd_colmap_a_cropped])
+        draw_geometries([pcd_colmap_a_cropped], "pcd_colmap_a_cropped")
         print("Visualizing cropped point cloud. and aabb..")
         # Display the cropped point cloud and aabb
-        geometries = [mesh] + [pcd_colmap_a_cropped]  
-        o3d.visualization.draw_geometries(geometries)
+        geometries = [get_aabb_mesh(bounding_box)] + [pcd_colmap_a_cropped]  
+        draw_geometries(geometries, "geometries")
 
 # Visualize combined colmap (aligned) cropped objects
-if debug4:
+if debug4 and visualize_TF:
     # Initialize an empty point cloud to store the combined colmap (aligned) cropped objects
     pcd_colmap_a_cropped_objects_combined = o3d.geometry.PointCloud()
     
@@ -556,14 +650,14 @@ if debug4:
         
     # Visualize point cloud with all colmap (aligned) cropped objects
     print("Visualizing point cloud with all colmap (aligned) cropped objects...")
-    o3d.visualization.draw_geometries([pcd_colmap_a_cropped_objects_combined])
+    draw_geometries([pcd_colmap_a_cropped_objects_combined], "pcd_colmap_a_cropped_objects_combined")
        
 # Visualizes combined colmap (aligned) cropped objects and all the aabb(mesh)     
-if debug4:
+if debug4 and visualize_TF:
     # Visualizes combined colmap (aligned) cropped objects and all the aabb(mesh)    
     print("Visualizing combined pcd of colmap (aligned) and meshes of aabb")
-    geometries = all_aabb + [pcd_colmap_a_cropped_objects_combined]  
-    o3d.visualization.draw_geometries(geometries)
+    geometries = [get_aabb_mesh(bounding_box) for bounding_box in all_bounding_boxes] + [pcd_colmap_a_cropped_objects_combined]  
+    draw_geometries(geometries, "geometries")
 
 # Constructing colmap (aligned) cropped objects file path
 file_name_colmap_a_cropped_objects = "colmap_a_cropped_objects"
@@ -580,71 +674,59 @@ for i, pcd in enumerate(pcd_colmap_a_cropped_objects):
     output_file = os.path.join(file_path_colmap_a_cropped_objects, f"{object_poses[i].ID_counter}_colmap_{object_poses[i].object_name}.ply")  
         
     # Save the point cloud to the specified file
-    o3d.io.write_point_cloud(output_file, pcd)
-
-    print(f"Saved {output_file}")
+    save_point_cloud(output_file, pcd)
     
-print("Colmap (aligned) cropped objects saved successfully")
+print("Colmap (aligned) cropped objects queued to be saved")
 #===================================================================================
 #===================================================================================
 #===================================================================================
 
 # Section: 10 
-# Visualize and store combined ground truth and colmap (aligned) cropped objects
+# Visualize (and store with combined_mode "eager") combined ground truth and colmap (aligned) cropped objects
 #===================================================================================
 #===================================================================================
 #===================================================================================
 print("\n==============================================================================================")
 print("==============================================================================================")
 print("Section: 10")
-print("Visualize and store combined ground truth and colmap (aligned) cropped objects\n")
-# Constructing combined cropped objects file path
-file_name_combined_cropped_objects = "combined_cropped_objects"
-file_path_combined_cropped_objects = os.path.join(file_path_to_project, file_name_combined_cropped_objects)
-print("file_path_combined_cropped_objects: ", file_path_combined_cropped_objects)
+print("Visualize (and store with combined_mode \"eager\") combined ground truth and colmap (aligned) cropped objects\n")
+print("combined_mode: ", combined_mode)
 
-# Creating combined cropped objects directory
-os.makedirs(file_path_combined_cropped_objects, exist_ok=True)
+if combined_mode == "eager":
+    # Constructing combined cropped objects file path
+    file_path_combined_cropped_objects = os.path.join(file_path_to_project, COMBINED_DIRECTORY)
+    print("file_path_combined_cropped_objects: ", file_path_combined_cropped_objects)
 
-# Visualize and store combined cropped objects
-for i, gt_pcd in enumerate(pcd_ground_truth_cropped_objects):
-    
-    # Initialize object to store copy of object ground truth pcd
-    copy_gt_pcd = o3d.geometry.PointCloud()
-    # Transfer points
-    copy_gt_pcd.points = gt_pcd.points
-    # Set color to blue
-    blue_color = [0.0, 0.0, 1.0]
-    num_points = len(copy_gt_pcd.points)
-    copy_gt_pcd.colors = o3d.utility.Vector3dVector(np.tile(blue_color, (num_points, 1)))
-    
-    # Initialize object to store copy of object colmap (aligned) pcd
-    copy_colmap_pcd = o3d.geometry.PointCloud()
-    # Transfer points
-    copy_colmap_pcd.points = pcd_colmap_a_cropped_objects[i].points
-    # Set color to green
-    green_color = [0.0, 1.0, 0.0]
-    num_points = len(copy_colmap_pcd.points)
-    copy_colmap_pcd.colors = o3d.utility.Vector3dVector(np.tile(green_color, (num_points, 1)))
-    
-    # Construct combined pcd
-    print("Constructing combined pcd...")
-    combined_pcd = copy_gt_pcd + copy_colmap_pcd
-    
-    if debug5:
-        # Visualize combined pcd
-        print("Visualizing combined pcd...")
-        o3d.visualization.draw_geometries([combined_pcd])
-    
-    # Define the output file path
-    output_file = os.path.join(file_path_combined_cropped_objects, f"{object_poses[i].ID_counter}_combined_{object_poses[i].object_name}.ply")    
-    
-    # Save the point cloud to the specified file
-    o3d.io.write_point_cloud(output_file, combined_pcd) 
-    
-    print(f"Saved {output_file}")
-    
-print("Combined cropped objects saved successfully")
+    # Creating combined cropped objects directory
+    os.makedirs(file_path_combined_cropped_objects, exist_ok=True)
+
+# The combined cropped objects are only created if they are visualized or stored
+if combined_mode == "eager" or (debug5 and visualize_TF):
+    for i, gt_pcd in enumerate(pcd_ground_truth_cropped_objects):
+        # Combined points and colors (ground truth blue, colmap (aligned) green), without copies of the point clouds
+        print("Constructing combined pcd...")
+        combined_points, combined_colors = get_combined_arrays(np.asarray(gt_pcd.points), np.asarray(pcd_colmap_a_cropped_objects[i].points))
+
+        if debug5 and visualize_TF:
+            # Visualize combined pcd
+            print("Visualizing combined pcd...")
+            draw_geometries([create_combined_point_cloud(combined_points, combined_colors)], "combined_pcd")
+
+        if combined_mode == "eager":
+            # Define the output file path
+            _, _, output_file = get_cropped_object_paths(file_path_to_project, object_poses[i].ID_counter, object_poses[i].object_name)
+
+            # Queue the combined cropped object (objects without points are not stored)
+            if len(combined_points) == 0:
+                print(f"{output_file} has no points, it is not saved")
+                continue
+            writer.submit(write_point_cloud_arrays, output_file, combined_points, combined_colors)
+            print(f"Saving {output_file}")
+
+if combined_mode == "eager":
+    print("Combined cropped objects queued to be saved")
+else:
+    print("Combined cropped objects are not stored, they are created on demand from the cropped objects (show_combined_cropped_objects.py)")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -659,126 +741,57 @@ print("=========================================================================
 print("Section: 11")
 print("Voxelize ground truth and colmap (aligned) cropped objects\n")
 
-# Subsection: Voxelize ground truth cropped objects
-
-# Use the glob module to find .ply files in the ground truth directory
-search_pattern_gt = os.path.join(file_path_gt_cropped_objects, '*.ply')
-
-for ply_file in glob.glob(search_pattern_gt):
-    
-    # Check if the file has a .ply extension
-    if ply_file.endswith('.ply'):
-        
-        # Get the name of the file
-        file_name = os.path.basename(ply_file)
-        
-        # Get the name of the parent directory
-        parent_directory_name = os.path.basename(os.path.dirname(ply_file))
-        
-        print(f"Voxelizing {parent_directory_name}/{file_name}...")
-        
-        # Read point cloud
-        pcd = o3d.io.read_point_cloud(ply_file)
-        
-        # Get number of points of point cloud
-        num_of_points = len(pcd.points)
-        
-        # Generate random shades of blue
-        blue_colors = np.random.uniform(0.0, 1.0, size=(num_of_points, 3))
-        
-        # Set the Red and Green channels to 0
-        blue_colors[:, 0] = 0.0  # Red
-        blue_colors[:, 1] = 0.0  # Green
-        
-        # Create an Open3D color class from the NumPy array
-        blue_colors = o3d.utility.Vector3dVector(blue_colors)
-        
-        # Assign the blue colors to the point cloud
-        pcd.colors = blue_colors
-        
-        # Voxelize point cloud
-        voxel_grid = o3d.geometry.VoxelGrid.create_from_point_cloud(pcd, voxel_size=0.3)
-        
-        # Visualize point cloud and voxel grid
-        if debug6:
-            o3d.visualization.draw_geometries([pcd])
-            o3d.visualization.draw_geometries([voxel_grid])
-            
-        # Split the file_name into base name and extension
-        base_name, file_extension = os.path.splitext(file_name)
-        
-        # Append "_voxelized" to the base name
-        new_base_name = base_name + "_voxelized"
-        
-        # Extension to use
-        voxel_extension = ".ply"
-        
-        # Construct the output file name by combining the directory, new base name, and extension
-        output_file_name = os.path.join(file_path_gt_cropped_objects, new_base_name + voxel_extension)
-
-        # Save the voxel grid to the specified file
-        o3d.io.write_voxel_grid(output_file_name, voxel_grid) 
-        
-# Subsection: Voxelize colmap (aligned) cropped objects
-
-# Use the glob module to find .ply files in the colmap (aligned) directory
-search_pattern_colmap_a = os.path.join(file_path_colmap_a_cropped_objects, '*.ply')
-
-for ply_file in glob.glob(search_pattern_colmap_a):
-    
-    # Check if the file has a .ply extension
-    if ply_file.endswith('.ply'):
-        
-        # Get the name of the file
-        file_name = os.path.basename(ply_file)
-        
-        # Get the name of the parent directory
-        parent_directory_name = os.path.basename(os.path.dirname(ply_file))
-        
-        print(f"Voxelizing {parent_directory_name}/{file_name}...")
-        
-        # Read point cloud
-        pcd = o3d.io.read_point_cloud(ply_file)
-        
-        # Get number of points of point cloud
-        num_of_points = len(pcd.points)
-        
-        # Generate random shades of green
-        green_colors = np.random.uniform(0.0, 1.0, size=(num_of_points, 3))
-        
-        # Set the blue and red channels to 0
-        green_colors[:, 0] = 0.0  # Red
-        green_colors[:, 2] = 0.0  # Blue
-        
-        # Create an Open3D color class from the NumPy array
-        green_colors = o3d.utility.Vector3dVector(green_colors)
-        
-        # Assign the green colors to the point cloud
-        pcd.colors = green_colors
-        
-        # Voxelize point cloud
-        voxel_grid = o3d.geometry.VoxelGrid.create_from_point_cloud(pcd, voxel_size=0.3)
-        
-        # Visualize point cloud and voxel grid
-        if debug6:
-            o3d.visualization.draw_geometries([pcd])
-            o3d.visualization.draw_geometries([voxel_grid])
-            
-        # Split the file_name into base name and extension
-        base_name, file_extension = os.path.splitext(file_name)
-        
-        # Append "_voxelized" to the base name
-        new_base_name = base_name + "_voxelized"
-        
-        # Extension to use
-        voxel_extension = ".ply"
-        
-        # Construct the output file name by combining the directory, new base name, and extension
-        output_file_name = os.path.join(file_path_colmap_a_cropped_objects, new_base_name + voxel_extension)
-
-        # Save the voxel grid to the specified file
-        o3d.io.write_voxel_grid(output_file_name, voxel_grid) 
-
+# This function receives the cropped objects (in memory), their directory, the name in their file names (gt or colmap)
+# and the channel of the random shades of the voxels (2: blue, 1: green)
+# Then voxelizes all the cropped objects with every voxel size directly from their points (in parallel with --workers)
+# and stores the voxel grids (the cropped objects are not read again from the directory)
+def save_voxelized_cropped_objects(cropped_objects, file_path_cropped_objects, name, color_channel):
+    # Get the name of the directory
+    parent_directory_name = os.path.basename(file_path_cropped_objects)
+
+    # Voxelize all the cropped objects (the same voxels as o3d.geometry.VoxelGrid.create_from_point_cloud)
+    print(f"Voxelizing {parent_directory_name} (voxel sizes {voxel_sizes})...")
+    points_list = [np.asarray(pcd.points) for pcd in cropped_objects]
+    voxel_grids_list = voxelize_cropped_objects(points_list, voxel_sizes, color_channel, random_seed, workers, before_fork=writer.wait)
+
+    for i, voxel_grids in enumerate(voxel_grids_list):
+        # Name of the cropped object (the same as its .ply)
+        base_name = f"{object_poses[i].ID_counter}_{name}_{object_poses[i].object_name}"
+
+        # Objects without points are not stored, so they are not voxelized
+        if voxel_grids is None:
+            print(f"{parent_directory_name}/{base_name} has no points, it is not voxelized")
+            continue
+
+        for index_voxel_size, (voxel_size, (coords, origin, colors)) in enumerate(zip(voxel_sizes, voxel_grids)):
+            # Visualize point cloud and voxel grid
+            if debug6 and visualize_TF:
+                _, _, point_voxels = get_point_voxels(points_list[i], voxel_size)
+                pcd_colored = o3d.geometry.PointCloud(cropped_objects[i].points)
+                pcd_colored.colors = o3d.utility.Vector3dVector(colors[point_voxels])
+                draw_geometries([pcd_colored], "pcd")
+                draw_geometries([create_voxel_grid(coords, colors, voxel_size, origin)], "voxel_grid")
+
+            # Append "_voxelized" to the base name (and the voxel size for all but the first voxel size)
+            new_file_name = get_voxelized_file_name(base_name, None if index_voxel_size == 0 else voxel_size)
+
+            # Construct the output file name by combining the directory and the new file name
+            output_file_name = os.path.join(file_path_cropped_objects, new_file_name)
+
+            # Save the voxel grid to the specified file (same layout as o3d.io.write_voxel_grid)
+            writer.submit(write_voxel_grid_arrays, output_file_name, coords, colors, voxel_size, origin)
+            print(f"Saving {output_file_name}")
+
+# Subsection: Voxelize ground truth cropped objects (random shades of blue)
+save_voxelized_cropped_objects(pcd_ground_truth_cropped_objects, file_path_gt_cropped_objects, "gt", 2)
+
+# Subsection: Voxelize colmap (aligned) cropped objects (random shades of green)
+save_voxelized_cropped_objects(pcd_colmap_a_cropped_objects, file_path_colmap_a_cropped_objects, "colmap", 1)
+
+# Wait for the background writer to write all the files
+print("Waiting for the files to be written...")
+number_of_files = writer.close()
+print(f"{number_of_files} files saved successfully")
 #===================================================================================
 #===================================================================================
 #===================================================================================
@@ -0,0 +1,116 @@
+#
+# The following module creates the distance plots of a comparison from a fixed number of bins
+# (used by compare_voxel_grid_pair.py, compare_voxel_grids.py, compare_voxel_grid_gt.py and compare_voxel_grid_colmap.py
+# instead of a scatterplot with one point per voxel and an image with one pixel column per voxel)
+# 1. Reduce the distances to a histogram with a fixed number of bins (one pass over the distances)
+# 2. Find the cumulative distribution and the percentiles of the distances from the histogram
+# 3. Save the histogram colored by the color map, the cumulative distribution and the percentile band (<name>_histogram.png)
+# 4. Save the color points: the colors of the sorted distances resampled to a fixed width (<name>_color_points.png)
+#
+# Only the histogram depends on the number of voxels, the plots have the same size and render time for any object
+
+import numpy as np
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+# Number of bins of the histogram
+DISTANCE_NUM_BINS = 64
+
+# Width (in columns) of the color points
+COLOR_POINTS_WIDTH = 512
+
+# Percentiles shown on the histogram: band of the inner percentiles, median and the outer percentiles
+DISTANCE_PERCENTILES = (5, 25, 50, 75, 95)
+
+# In: Numpy array of distances (N) and the number of bins
+# Out: The counts of the bins (num_bins) and their edges (num_bins + 1) between the minimum and maximum distance
+def get_distance_histogram(distances, num_bins=DISTANCE_NUM_BINS):
+    distances = np.asarray(distances, dtype=float)
+
+    return np.histogram(distances, bins=num_bins, range=(np.min(distances), np.max(distances)))
+
+# In: The counts and edges of a histogram
+# Out: The cumulative fraction of the distances at each edge (num_bins + 1, from 0 to 1)
+def get_histogram_cdf(counts, edges):
+    cumulative_counts = np.concatenate(([0], np.cumsum(counts)))
+
+    return cumulative_counts / max(cumulative_counts[-1], 1)
+
+# In: The counts and edges of a histogram and the fractions (0 to 1)
+# Out: The distances at the fractions (linear inside a bin, the resolution is the width of a bin)
+def get_histogram_quantiles(counts, edges, fractions):
+    cdf = get_histogram_cdf(counts, edges)
+
+    # Only the edges where the cumulative distribution grows (empty bins would repeat the same fraction)
+    growing_TF = np.concatenate(([True], np.diff(cdf) > 0))
+
+    return np.interp(fractions, cdf[growing_TF], edges[growing_TF])
+
+# In: The edges of a histogram and the name of the matplotlib color map
+# Out: Function distances -> RGB colors (N, 3), normalized between the minimum and maximum distance (the first and last edge)
+#      as get_distance_colors of voxel_grid_utils.py
+def get_edges_color_function(edges, color_map_value):
+    cmap = matplotlib.colormaps[color_map_value]
+    norm = matplotlib.colors.Normalize(edges[0], edges[-1])
+
+    return lambda distances: cmap(norm(distances))[:, :3]
+
+# In: The counts and edges of a histogram, the name of the color map, the label of the distances, the path to the .png
+#     and percentiles_TF (True: the percentile band, the median and the outer percentiles are drawn)
+# Out: - (saves the histogram colored by the color map and the cumulative distribution on a second axis)
+def save_distance_histogram(counts, edges, color_map_value, label, path_to_png, percentiles_TF=True):
+    centers = (edges[:-1] + edges[1:]) / 2
+    get_colors = get_edges_color_function(edges, color_map_value)
+
+    figure = Figure(figsize=(8, 6))
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+
+    axes.bar(edges[:-1], counts, width=np.diff(edges), align="edge", color=get_colors(centers), edgecolor="none")
+    axes.set_xlabel(label)
+    axes.set_ylabel("Number of voxels")
+    axes.set_title(f"{label} ({int(np.sum(counts))} voxels)")
+
+    if percentiles_TF:
+        p_low, p_inner_low, p_median, p_inner_high, p_high = get_histogram_quantiles(counts, edges, np.array(DISTANCE_PERCENTILES) / 100)
+        axes.axvspan(p_inner_low, p_inner_high, color="gray", alpha=0.2, label=f"{DISTANCE_PERCENTILES[1]}-{DISTANCE_PERCENTILES[3]}%")
+        axes.axvline(p_median, color="black", linestyle="--", label="median")
+        axes.axvline(p_low, color="gray", linestyle=":", label=f"{DISTANCE_PERCENTILES[0]}% / {DISTANCE_PERCENTILES[4]}%")
+        axes.axvline(p_high, color="gray", linestyle=":")
+        axes.legend(loc="center right")
+
+    # Cumulative distribution
+    axes_cdf = axes.twinx()
+    axes_cdf.plot(edges, get_histogram_cdf(counts, edges), color="black")
+    axes_cdf.set_ylim(0, 1.02)
+    axes_cdf.set_ylabel("Cumulative fraction of voxels")
+
+    figure.savefig(path_to_png)
+
+# In: The counts and edges of a histogram, the name of the color map, the title, the path to the .png and the width
+# Out: - (saves the colors of the sorted distances as a strip with a fixed number of columns)
+def save_distance_color_points(counts, edges, color_map_value, title, path_to_png, width=COLOR_POINTS_WIDTH):
+    fractions = (np.arange(width) + 0.5) / width
+    colors = get_edges_color_function(edges, color_map_value)(get_histogram_quantiles(counts, edges, fractions))
+
+    figure = Figure(figsize=(8, 2))
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+
+    axes.imshow(colors[np.newaxis], aspect="auto")
+    axes.set_xticks([])
+    axes.set_yticks([])
+    axes.set_title(title)
+
+    figure.savefig(path_to_png)
+
+# In: Numpy array of distances (N), the name of the color map, the label of the distances, the title of the color points,
+#     the paths to the .png of the histogram and of the color points and the number of bins
+# Out: - (reduces the distances to a histogram once and saves both plots)
+def save_distance_plots(distances, color_map_value, label, title_color_points, path_to_histogram, path_to_color_points,
+                        num_bins=DISTANCE_NUM_BINS):
+    counts, edges = get_distance_histogram(distances, num_bins)
+
+    save_distance_histogram(counts, edges, color_map_value, label, path_to_histogram)
+    save_distance_color_points(counts, edges, color_map_value, title_color_points, path_to_color_points)
@@ -0,0 +1,102 @@
+#
+# The following module creates the plots of the metrics for different bound sizes (used by compare_metrics_all.py)
+# 1. Plot one metric vs. the bound sizes in its own figure (<metric>_plot.png)
+# 2. Plot all metrics vs. the bound sizes in one figure with one panel per metric (all_metrics_plot.png)
+# 3. Render a batch of plots, one after the other or in parallel by worker processes
+#
+# The figures are created with the Agg canvas directly (no pyplot windows or global figure state),
+# so they can be rendered by any process. The text is rendered with mathtext by default,
+# LaTeX (usetex) is optional because it starts a LaTeX process for every label and needs a TeX installation
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+# Style of the plots
+FACE_COLOR = "lightblue"
+LABEL_FONTSIZE = 22
+TITLE_FONTSIZE = 24
+TICKS_FONTSIZE = 20
+
+# In: The text of a label and usetex_TF (True: rendered by LaTeX, False: rendered by mathtext)
+# Out: The label in bold (the characters that LaTeX treats specially are escaped)
+def get_bold_label(text, usetex_TF):
+    if usetex_TF:
+        return r"\textbf{" + text.replace("_", r"\_").replace("%", r"\%") + "}"
+
+    return text
+
+# In: Axes, list of bound sizes, list of values, the name of the metric, the title, usetex_TF and the scale of the fonts
+# Out: - (plots the metric vs. the bound sizes on the axes)
+def plot_metric_on_axes(axes, bounds, values, attribute, title, usetex_TF, font_scale=1.0):
+    fontweight = "normal" if usetex_TF else "bold"
+
+    axes.plot(bounds, values, marker="o")
+    axes.set_xlabel(get_bold_label("Bound sizes", usetex_TF), fontsize=LABEL_FONTSIZE * font_scale, fontweight=fontweight)
+    axes.set_ylabel(get_bold_label(attribute, usetex_TF), fontsize=LABEL_FONTSIZE * font_scale, fontweight=fontweight)
+    axes.set_title(get_bold_label(title, usetex_TF), fontsize=TITLE_FONTSIZE * font_scale, fontweight=fontweight)
+    axes.tick_params(labelsize=TICKS_FONTSIZE * font_scale)
+    axes.grid(True)
+
+# In: List of bound sizes, list of values, the name of the metric, the path to the .png and usetex_TF
+# Out: The path to the .png (one figure for the metric, the same layout as before)
+def plot_metric_vs_bound(bounds, values, attribute, path_to_png, usetex_TF=False):
+    with matplotlib.rc_context({"text.usetex": usetex_TF}):
+        figure = Figure(figsize=(8, 6), facecolor=FACE_COLOR)
+        FigureCanvasAgg(figure)
+
+        axes = figure.add_subplot()
+        plot_metric_on_axes(axes, bounds, values, attribute, attribute + " vs. Bound sizes", usetex_TF)
+
+        # Adjust the margins for labels
+        figure.subplots_adjust(left=0.15, right=0.9, top=0.9, bottom=0.15)
+        figure.savefig(path_to_png)
+
+    return path_to_png
+
+# In: List of bound sizes, dictionary name of the metric -> list of values, the path to the .png, usetex_TF
+#     and the number of panels in a row
+# Out: The path to the .png (one figure with one panel for each metric)
+def plot_all_metrics_vs_bound(bounds, metrics, path_to_png, usetex_TF=False, num_columns=4):
+    num_rows = -(-len(metrics) // num_columns)
+    fontweight = "normal" if usetex_TF else "bold"
+
+    with matplotlib.rc_context({"text.usetex": usetex_TF}):
+        figure = Figure(figsize=(5 * num_columns, 3.75 * num_rows + 0.5), facecolor=FACE_COLOR)
+        FigureCanvasAgg(figure)
+
+        axes_all = figure.subplots(num_rows, num_columns, squeeze=False).ravel()
+        for axes, (attribute, values) in zip(axes_all, metrics.items()):
+            plot_metric_on_axes(axes, bounds, values, attribute, attribute, usetex_TF, font_scale=0.6)
+
+        # Hide the panels without a metric
+        for axes in axes_all[len(metrics):]:
+            axes.set_visible(False)
+
+        figure.suptitle(get_bold_label("Metrics vs. Bound sizes", usetex_TF), fontsize=TITLE_FONTSIZE, fontweight=fontweight)
+
+        # Fixed margins (a layout engine measures every label again and is slower than the plots themselves)
+        figure.subplots_adjust(left=0.05, right=0.98, top=0.92, bottom=0.06, hspace=0.45, wspace=0.3)
+        figure.savefig(path_to_png)
+
+    return path_to_png
+
+# In: A plot task (the function and its arguments)
+# Out: The path to the .png
+def render_plot(task):
+    plot_function, arguments = task
+    return plot_function(*arguments)
+
+# In: List of plot tasks (plot_metric_vs_bound or plot_all_metrics_vs_bound and their arguments) and the number of jobs
+# Out: List of the paths to the .png (in the order of the tasks)
+def render_plots(tasks, jobs=1):
+    jobs = min(jobs, len(tasks))
+
+    if jobs <= 1:
+        return [render_plot(task) for task in tasks]
+
+    start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context(start_method)) as executor:
+        return list(executor.map(render_plot, tasks))
@@ -0,0 +1,293 @@
+#
+# The following module keeps the metrics of all objects of a project in one table (<path_to_project>/metrics.sqlite)
+# (written by compare_voxel_grid_pair.py and compare_voxel_grids_all_multiple.py, read by compare_voxel_grids_all.py,
+# compare_voxel_grids_all_multiple.py and compare_metrics_all.py)
+# 1. Create the row of one test of one direction (counts, %matched, recall, minimum, maximum, MAE, RMSE, MSE)
+# 2. Write the rows of an object for a voxel size and a bound (the previous rows of the object are replaced)
+# 3. Aggregate the rows of every voxel size and bound with one query (averages, minimum and maximum of all objects)
+#    and save the aggregates of a voxel size and a bound in avg_metrics.txt of its metrics folder
+# 4. Import the <id>_data.txt of metrics folders that were created before the table existed
+#    (or <id>_data_gt.txt and <id>_data_colmap.txt of compare_voxel_grid_gt.py and compare_voxel_grid_colmap.py)
+#
+# One row for each object, voxel size, bound, direction (gt: ground truth -> colmap, colmap: colmap -> ground truth)
+# and test (bound: based on center w boundaries, index: based on index, unbounded: based on center wo boundaries)
+# The values are saved unrounded, <id>_data.txt and avg_metrics.txt keep the rounded values for reading
+# The averages are calculated from the values rounded as in <id>_data.txt and rounded as in avg_metrics.txt
+# (the same averages as when they were read from the text files)
+
+import os
+import sqlite3
+from contextlib import closing
+import numpy as np
+from voxel_metrics import get_metrics_folder, get_distance_metrics
+
+METRICS_STORE_FILENAME = "metrics.sqlite"
+
+# Seconds to wait for another process that writes to the table (--jobs of compare_voxel_grids_all.py)
+METRICS_STORE_TIMEOUT = 60.0
+
+METRICS_COLUMNS = ["num_voxels_gt", "num_voxels_colmap", "num_matched", "matched_percent", "recall",
+                   "min_distance", "max_distance", "mae", "rmse", "mse"]
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS metrics (
+    id_object INTEGER NOT NULL,
+    model_name TEXT,
+    voxel_size REAL NOT NULL,
+    bound REAL NOT NULL,
+    direction TEXT NOT NULL,
+    test TEXT NOT NULL,
+    num_voxels_gt INTEGER,
+    num_voxels_colmap INTEGER,
+    num_matched INTEGER,
+    matched_percent REAL,
+    recall REAL,
+    min_distance REAL,
+    max_distance REAL,
+    mae REAL,
+    rmse REAL,
+    mse REAL,
+    PRIMARY KEY (voxel_size, bound, id_object, direction, test)
+)
+"""
+
+# Averages of all objects of a voxel size and a bound (the same metrics as avg_metrics.txt)
+# of the values rounded as in <id>_data.txt (ROUND_DATA, see connect_store)
+AVG_METRICS_QUERY = """
+SELECT voxel_size, bound, COUNT(DISTINCT id_object),
+    AVG(CASE WHEN direction = 'gt' THEN ROUND_DATA(matched_percent) END) / 100.0,
+    MIN(CASE WHEN direction = 'gt' THEN ROUND_DATA(min_distance) END),
+    MAX(CASE WHEN direction = 'gt' THEN ROUND_DATA(max_distance) END),
+    AVG(CASE WHEN direction = 'gt' THEN ROUND_DATA(mae) END),
+    AVG(CASE WHEN direction = 'gt' THEN ROUND_DATA(rmse) END),
+    AVG(CASE WHEN direction = 'gt' THEN ROUND_DATA(mse) END),
+    AVG(CASE WHEN direction = 'colmap' THEN ROUND_DATA(matched_percent) END) / 100.0,
+    AVG(CASE WHEN direction = 'colmap' THEN ROUND_DATA(recall) END),
+    MIN(CASE WHEN direction = 'colmap' THEN ROUND_DATA(min_distance) END),
+    MAX(CASE WHEN direction = 'colmap' THEN ROUND_DATA(max_distance) END),
+    AVG(CASE WHEN direction = 'colmap' THEN ROUND_DATA(mae) END),
+    AVG(CASE WHEN direction = 'colmap' THEN ROUND_DATA(rmse) END),
+    AVG(CASE WHEN direction = 'colmap' THEN ROUND_DATA(mse) END)
+FROM metrics
+WHERE test = 'bound'
+GROUP BY voxel_size, bound
+ORDER BY bound, voxel_size
+"""
+
+AVG_METRICS_NAMES = ["voxel_size", "bound", "num_objects",
+                     "avg_gt_voxels_matched", "min_gt_distance", "max_gt_distance", "avg_gt_mae", "avg_gt_rmse", "avg_gt_mse",
+                     "avg_colmap_voxels_matched", "avg_colmap_recall", "min_colmap_distance", "max_colmap_distance",
+                     "avg_colmap_mae", "avg_colmap_rmse", "avg_colmap_mse"]
+
+# Number of decimals of the values in <id>_data.txt and avg_metrics.txt
+METRICS_DECIMALS = 2
+
+AVG_METRICS_CONTENT = """
+## GT
+avg_gt_voxels_matched: {avg_gt_voxels_matched:.2f}
+min_gt_distance: {min_gt_distance:.2f}
+max_gt_distance: {max_gt_distance:.2f}
+avg_gt_mae: {avg_gt_mae:.2f}
+avg_gt_rmse: {avg_gt_rmse:.2f}
+avg_gt_mse: {avg_gt_mse:.2f}
+
+## COLMAP 
+avg_colmap_voxels_matched: {avg_colmap_voxels_matched:.2f}
+avg_colmap_recall: {avg_colmap_recall:.2f}
+min_colmap_distance: {min_colmap_distance:.2f}
+max_colmap_distance: {max_colmap_distance:.2f}
+avg_colmap_mae: {avg_colmap_mae:.2f}
+avg_colmap_rmse: {avg_colmap_rmse:.2f}
+avg_colmap_mse: {avg_colmap_mse:.2f}
+"""
+
+# Labels of <id>_data.txt -> direction and test (the longest labels first)
+DATA_FILE_LABELS = [("GT UNBOUNDED", "gt", "unbounded"), ("COLMAP UNBOUNDED", "colmap", "unbounded"),
+                    ("GT INDEX", "gt", "index"), ("COLMAP INDEX", "colmap", "index"),
+                    ("GT", "gt", "bound"), ("COLMAP", "colmap", "bound")]
+
+# Titles of <id>_data.txt -> columns
+DATA_FILE_TITLES = {
+    "Voxels at ground truth": "num_voxels_gt",
+    "Voxels at estimate": "num_voxels_colmap",
+    "Voxels matched": "num_matched",
+    "Voxels matched at colmap": "num_matched",
+    "%Voxels matched": "matched_percent",
+    "%Voxels matched at colmap": "matched_percent",
+    "Recall = TP/(TP+FN)": "recall",
+    "Minimum Distance": "min_distance",
+    "Maximum Distance": "max_distance",
+    "Distances Mean Absolute Error (MAE)": "mae",
+    "Distances Root Mean Square Error (RMSE)": "rmse",
+    "Distances Mean Squared Error (MSE)": "mse",
+}
+
+# In: The path to the project
+# Out: The path to its metrics table
+def get_store_path(path_to_project):
+    return os.path.join(path_to_project, METRICS_STORE_FILENAME)
+
+# In: A value of the table (or None)
+# Out: The value rounded as it is written in <id>_data.txt and avg_metrics.txt (None stays None)
+def round_metric(value):
+    if value is None:
+        return None
+
+    return float(f"{value:.{METRICS_DECIMALS}f}")
+
+# In: The path to the metrics table
+# Out: Connection to the table (it is created if it does not exist), with the function ROUND_DATA (round_metric) for the queries
+def connect_store(path_to_store):
+    connection = sqlite3.connect(path_to_store, timeout=METRICS_STORE_TIMEOUT)
+    connection.create_function("ROUND_DATA", 1, round_metric, deterministic=True)
+    connection.execute(CREATE_TABLE)
+
+    return connection
+
+# In: The filename of a voxelized cropped object (e.g. 1_gt_Apple_Trunk1_voxelized.ply)
+# Out: The name of its model (e.g. Apple_Trunk1)
+def get_model_name(filename):
+    name = os.path.splitext(os.path.basename(filename))[0]
+    if name.endswith("_voxelized"):
+        name = name[:-len("_voxelized")]
+
+    return "_".join(name.split("_")[2:])
+
+# In: The direction (gt or colmap), the test (bound, index or unbounded), number of voxels at ground truth and at estimate,
+#     optionally the number of matched voxels and numpy array of distances (N)
+# Out: Dictionary column -> value (None for the values that the test does not have)
+def get_metrics_row(direction, test, num_voxels_gt, num_voxels_colmap, num_matched=None, distances=None):
+    row = {"direction": direction, "test": test, "num_voxels_gt": int(num_voxels_gt), "num_voxels_colmap": int(num_voxels_colmap)}
+    row.update({column: None for column in METRICS_COLUMNS[2:]})
+
+    if num_matched is not None:
+        num_matched = int(num_matched)
+        row["num_matched"] = num_matched
+
+        if direction == "gt":
+            row["matched_percent"] = (num_matched/num_voxels_gt)*100
+        else:
+            row["matched_percent"] = (num_matched/num_voxels_colmap)*100
+            row["recall"] = num_matched/(num_matched + (num_voxels_gt - num_matched))
+
+    if distances is not None:
+        distance_metrics = get_distance_metrics(distances)
+        for column, value in zip(("min_distance", "max_distance", "mae", "rmse", "mse"), distance_metrics):
+            row[column] = float(value)
+
+    return row
+
+# In: The path to the metrics table, the id of the object, the name of its model, the voxel size, the bound and list of rows
+# Out: - (replaces the rows of the object for the voxel size and the bound in one transaction)
+def write_object_metrics(path_to_store, id_object, model_name, voxel_size, bound, rows):
+    columns = ["id_object", "model_name", "voxel_size", "bound", "direction", "test"] + METRICS_COLUMNS
+    insert = f"INSERT INTO metrics ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    values = [[int(id_object), model_name, float(voxel_size), float(bound)] + [row[column] for column in columns[4:]] for row in rows]
+
+    with closing(connect_store(path_to_store)) as connection, connection:
+        connection.execute("DELETE FROM metrics WHERE voxel_size = ? AND bound = ? AND id_object = ?", (float(voxel_size), float(bound), int(id_object)))
+        connection.executemany(insert, values)
+
+# In: The path to the metrics table, the voxel size and the bound
+# Out: Set of the ids of the objects that have metrics for the voxel size and the bound
+def read_object_ids(path_to_store, voxel_size, bound):
+    if not os.path.exists(path_to_store):
+        return set()
+
+    with closing(connect_store(path_to_store)) as connection:
+        rows = connection.execute("SELECT DISTINCT id_object FROM metrics WHERE voxel_size = ? AND bound = ?", (float(voxel_size), float(bound))).fetchall()
+
+    return {row[0] for row in rows}
+
+# In: The path to the metrics table and optionally a voxel size and a bound (None: all)
+# Out: Dictionary name -> numpy array with one value for each voxel size and bound (sorted by bound),
+#      the names are voxel_size, bound, num_objects and the metrics of avg_metrics.txt (rounded as in avg_metrics.txt)
+def read_avg_metrics(path_to_store, voxel_size=None, bound=None):
+    rows = []
+    if os.path.exists(path_to_store):
+        with closing(connect_store(path_to_store)) as connection:
+            rows = [row[:3] + tuple(round_metric(value) for value in row[3:]) for row in connection.execute(AVG_METRICS_QUERY).fetchall()]
+
+    if voxel_size is not None and bound is not None:
+        rows = [row for row in rows if row[0] == float(voxel_size) and row[1] == float(bound)]
+
+    columns = np.array(rows, dtype=float).reshape(len(rows), len(AVG_METRICS_NAMES))
+
+    return {name: columns[:, index] for index, name in enumerate(AVG_METRICS_NAMES)}
+
+# In: The path to the project, the voxel size, the bound and debug2 for terminal prints
+# Out: Saves the average metrics of all objects of the voxel size and the bound in avg_metrics.txt of the metrics folder
+#      and returns its path
+def write_avg_metrics(path_to_project, voxel_size, bound, debug2=False):
+    avg_metrics = read_avg_metrics(get_store_path(path_to_project), voxel_size, bound)
+
+    if len(avg_metrics["num_objects"]) == 0:
+        raise ValueError(f"There are no metrics of voxel size {voxel_size} and bound {bound} in {get_store_path(path_to_project)}")
+
+    avg_metrics = {name: values[0] for name, values in avg_metrics.items()}
+
+    if debug2:
+        for name, value in avg_metrics.items():
+            print(f"{name}: {value}")
+
+    path_to_avg_metrics = os.path.join(get_metrics_folder(path_to_project, voxel_size, bound), "avg_metrics.txt")
+
+    with open(path_to_avg_metrics, "w") as file:
+        file.write(AVG_METRICS_CONTENT.format(**avg_metrics))
+
+    return path_to_avg_metrics
+
+# In: The path to a <id>_data.txt
+# Out: List of rows (direction, test and the values found in the file)
+def read_data_file(path_to_data):
+    rows = {}
+
+    with open(path_to_data, "r") as file:
+        for line in file:
+            line = line.strip()
+            if not line.startswith("# ") or ": " not in line:
+                continue
+
+            name, value = line[2:].rsplit(": ", 1)
+            for label, direction, test in DATA_FILE_LABELS:
+                title = name[len(label) + 1:]
+                if name.startswith(label + " ") and title in DATA_FILE_TITLES:
+                    row = rows.setdefault((direction, test), {"direction": direction, "test": test, **{column: None for column in METRICS_COLUMNS}})
+                    row[DATA_FILE_TITLES[title]] = float(value.rstrip("%"))
+                    break
+
+    return list(rows.values())
+
+# In: The folder of an object (<id>_metrics) and its ID
+# Out: List of the paths to its data files: <id>_data.txt (compare_voxel_grid_pair.py) if it exists, otherwise the existing
+#      <id>_data_gt.txt and <id>_data_colmap.txt (compare_voxel_grid_gt.py and compare_voxel_grid_colmap.py)
+def get_data_file_paths(path_to_object_metrics, id_object):
+    path_to_data = os.path.join(path_to_object_metrics, id_object + "_data.txt")
+    if os.path.exists(path_to_data):
+        return [path_to_data]
+
+    paths_to_data = [os.path.join(path_to_object_metrics, id_object + "_data_" + direction + ".txt") for direction in ("gt", "colmap")]
+
+    return [path for path in paths_to_data if os.path.exists(path)]
+
+# In: The path to the metrics table, a metrics folder, its voxel size and bound
+# Out: Number of objects imported (their data files, only the objects that have no rows in the table)
+def import_metrics_folder(path_to_store, path_to_metrics, voxel_size, bound):
+    stored_ids = read_object_ids(path_to_store, voxel_size, bound)
+    num_imported = 0
+
+    for dirname in sorted(os.listdir(path_to_metrics)):
+        id_object = dirname[:-len("_metrics")]
+
+        if not dirname.endswith("_metrics") or not id_object.isdigit() or int(id_object) in stored_ids:
+            continue
+
+        paths_to_data = get_data_file_paths(os.path.join(path_to_metrics, dirname), id_object)
+        if not paths_to_data:
+            continue
+
+        rows = [row for path_to_data in paths_to_data for row in read_data_file(path_to_data)]
+        write_object_metrics(path_to_store, id_object, None, voxel_size, bound, rows)
+        num_imported += 1
+
+    return num_imported
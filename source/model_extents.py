@@ -0,0 +1,100 @@
+#
+# The following module finds the axis aligned bounding boxes (aabb) of the models of the objects (used by crop_objects.py)
+# 1. Find the aabb of every model file once, even if the scene has many objects of the same model
+# 2. Keep the aabb of the models in a small cache file (model_extents.json, in the model directory by default)
+#    keyed by the path, size and modification time of the model file
+# 3. Read the aabb from the cache and read only the model files that are new or changed
+# 4. Write the cache to a temporary file and rename it (never left partially written)
+#
+# A model file that is written again gets a new size or modification time and is read again
+# If the cache can not be written (e.g. the model directory is read-only) the aabb are still found, only not kept
+
+import json
+import os
+import numpy as np
+import open3d as o3d
+
+EXTENT_CACHE_FILENAME = "model_extents.json"
+EXTENT_CACHE_VERSION = 1
+
+# In: The path to a model file
+# Out: Dictionary with the size (bytes) and the modification time (ns) of the file
+def get_file_signature(path_to_file):
+    stat_result = os.stat(path_to_file)
+
+    return {"size": stat_result.st_size, "mtime_ns": stat_result.st_mtime_ns}
+
+# In: The path to the cache file
+# Out: Dictionary path to the model -> entry (signature, minimum and maximum corner), empty if it does not exist or can not be read
+def read_extent_cache(path_to_cache):
+    if not os.path.exists(path_to_cache):
+        return {}
+
+    try:
+        with open(path_to_cache, "r") as file:
+            cache = json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"Extent cache {path_to_cache} can not be read ({e}), the models are read again")
+        return {}
+
+    if cache.get("version") != EXTENT_CACHE_VERSION or not isinstance(cache.get("models"), dict):
+        print(f"Extent cache {path_to_cache} has a different version, the models are read again")
+        return {}
+
+    return cache["models"]
+
+# In: The path to the cache file and the dictionary path to the model -> entry
+# Out: True if the cache was written, False otherwise
+def write_extent_cache(path_to_cache, models):
+    path_to_temp = path_to_cache + f".{os.getpid()}.tmp"
+
+    try:
+        with open(path_to_temp, "w") as file:
+            json.dump({"version": EXTENT_CACHE_VERSION, "models": models}, file, indent=2, sort_keys=True)
+        os.replace(path_to_temp, path_to_cache)
+    except OSError as e:
+        print(f"Extent cache {path_to_cache} can not be written ({e}), the aabb of the models are not kept")
+        if os.path.exists(path_to_temp):
+            os.remove(path_to_temp)
+        return False
+
+    return True
+
+# In: The path to a model file
+# Out: Numpy arrays of the minimum and maximum corners (3) of the aabb of its points
+def read_model_aabb(path_to_ply):
+    aabb = o3d.io.read_point_cloud(path_to_ply).get_axis_aligned_bounding_box()
+
+    return np.asarray(aabb.get_min_bound()), np.asarray(aabb.get_max_bound())
+
+# In: List of paths to model files (with repetitions, e.g. one per object) and the path to the cache file
+#     (None: no cache file, every model file is still read only once)
+# Out: Dictionary path to the model -> (minimum corner, maximum corner) as numpy arrays
+def get_model_aabbs(paths_to_ply, path_to_cache=None):
+    cached_models = read_extent_cache(path_to_cache) if path_to_cache is not None else {}
+
+    model_aabbs = {}
+    num_read = 0
+    for path_to_ply in paths_to_ply:
+        if path_to_ply in model_aabbs:
+            continue
+
+        key = os.path.abspath(path_to_ply)
+        signature = get_file_signature(path_to_ply)
+        entry = cached_models.get(key)
+
+        if entry is not None and entry.get("signature") == signature:
+            model_aabbs[path_to_ply] = (np.array(entry["min"], dtype=float), np.array(entry["max"], dtype=float))
+            continue
+
+        aabb_min, aabb_max = read_model_aabb(path_to_ply)
+        model_aabbs[path_to_ply] = (aabb_min, aabb_max)
+        cached_models[key] = {"signature": signature, "min": aabb_min.tolist(), "max": aabb_max.tolist()}
+        num_read = num_read + 1
+
+    print(f"Models: {len(model_aabbs)}, read: {num_read}, from the extent cache: {len(model_aabbs) - num_read}")
+
+    if path_to_cache is not None and num_read > 0:
+        write_extent_cache(path_to_cache, cached_models)
+
+    return model_aabbs
@@ -0,0 +1,279 @@
+#
+# The following module reads and writes .ply files (voxel grids and point clouds) directly with numpy
+# (used instead of o3d.io.read_voxel_grid / o3d.io.read_point_cloud and voxel_grid.get_voxels())
+# 1. Parse the header of a .ply file (format, elements and their properties)
+# 2. Read the elements: binary bodies are memory-mapped into typed numpy arrays (no Python object per voxel or point),
+#    ascii bodies are parsed with numpy
+# 3. Read a voxel grid: grid indices (int32), colors (uint8), voxel size and origin
+# 4. Read a point cloud: points (float32 or float64 as stored), colors (uint8) and normals,
+#    also chunk by chunk (the points are not all in memory at once)
+# 5. Write voxel grids and point clouds as binary .ply with the same layout as Open3D
+#
+# Voxel grid layout written by Open3D:
+#   element origin (x, y, z double), element rotation (r00 ... r22 double), element voxel_size (val double),
+#   element vertex (x, y, z double grid indices, red, green, blue uchar)
+
+import itertools
+import os
+import numpy as np
+
+# .ply property types -> numpy types
+PLY_TYPES = {
+    "char": "i1", "int8": "i1",
+    "uchar": "u1", "uint8": "u1",
+    "short": "i2", "int16": "i2",
+    "ushort": "u2", "uint16": "u2",
+    "int": "i4", "int32": "i4",
+    "uint": "u4", "uint32": "u4",
+    "float": "f4", "float32": "f4",
+    "double": "f8", "float64": "f8",
+}
+
+# numpy types -> .ply property types (used when writing)
+NUMPY_TO_PLY_TYPES = {"i1": "char", "u1": "uchar", "i2": "short", "u2": "ushort", "i4": "int", "u4": "uint", "f4": "float", "f8": "double"}
+
+PLY_BYTE_ORDERS = {"binary_little_endian": "<", "binary_big_endian": ">", "ascii": "="}
+
+# In: The path to a .ply file
+# Out: The format (ascii, binary_little_endian or binary_big_endian), list of elements (name, count, numpy dtype
+#      of one element) and the length of the header in bytes
+def read_ply_header(path_to_ply):
+    with open(path_to_ply, "rb") as file:
+        if file.readline().strip() != b"ply":
+            raise ValueError(f"{path_to_ply} is not a .ply file")
+
+        ply_format = None
+        elements = []
+
+        while True:
+            line = file.readline()
+            if not line:
+                raise ValueError(f"{path_to_ply} has no end_header")
+
+            words = line.decode("ascii").split()
+            if len(words) == 0 or words[0] in ("comment", "obj_info"):
+                continue
+
+            if words[0] == "end_header":
+                break
+
+            if words[0] == "format":
+                ply_format = words[1]
+                if ply_format not in PLY_BYTE_ORDERS:
+                    raise ValueError(f"{path_to_ply} has unknown format {ply_format}")
+
+            elif words[0] == "element":
+                elements.append((words[1], int(words[2]), []))
+
+            elif words[0] == "property":
+                if words[1] == "list":
+                    raise ValueError(f"{path_to_ply} has list properties (e.g. faces), they are not supported")
+                elements[-1][2].append((words[2], PLY_TYPES[words[1]]))
+
+        header_length = file.tell()
+
+    byte_order = PLY_BYTE_ORDERS[ply_format]
+    elements = [(name, count, np.dtype([(prop, byte_order + ply_type) for prop, ply_type in properties]))
+                for name, count, properties in elements]
+
+    return ply_format, elements, header_length
+
+# In: The path to a .ply file and mmap_TF (True: binary bodies are memory-mapped, False: they are read into memory)
+# Out: Dictionary element name -> structured numpy array (count) with one field for each property
+def read_ply_elements(path_to_ply, mmap_TF=True):
+    ply_format, elements, header_length = read_ply_header(path_to_ply)
+
+    arrays = {}
+
+    if ply_format == "ascii":
+        # All the values of the body, the elements follow each other line by line
+        with open(path_to_ply, "rb") as file:
+            file.seek(header_length)
+            values = np.array(file.read().split(), dtype=float)
+
+        position = 0
+        for name, count, dtype in elements:
+            num_values = count * len(dtype.names)
+            element_values = values[position:position + num_values].reshape(count, len(dtype.names))
+            arrays[name] = np.empty(count, dtype=dtype.newbyteorder("="))
+            for index_property, prop in enumerate(dtype.names):
+                arrays[name][prop] = element_values[:, index_property]
+            position += num_values
+
+        return arrays
+
+    offset = header_length
+    for name, count, dtype in elements:
+        if count == 0:
+            arrays[name] = np.empty(0, dtype=dtype)
+        elif mmap_TF:
+            arrays[name] = np.memmap(path_to_ply, dtype=dtype, mode="r", offset=offset, shape=(count,))
+        else:
+            arrays[name] = np.fromfile(path_to_ply, dtype=dtype, count=count, offset=offset)
+        offset += count * dtype.itemsize
+
+    return arrays
+
+# In: Structured numpy array and the names of its fields
+# Out: The fields stacked as columns (count, len(names)) or None if a field is missing
+def stack_fields(array, names, dtype=None):
+    if array is None or not all(name in array.dtype.names for name in names):
+        return None
+
+    return np.stack([np.asarray(array[name], dtype=dtype) for name in names], axis=1)
+
+# In: The path to a voxel grid .ply (written by Open3D or write_voxel_grid_arrays) and mmap_TF
+# Out: The grid indices (N, 3) int32, the colors (N, 3) uint8 (black if there are no colors, as Open3D),
+#      the voxel size and the origin (3)
+#      The voxels are in the order of the file (o3d.io.read_voxel_grid + get_voxels() returns them in hash order)
+def read_voxel_grid_arrays(path_to_ply, mmap_TF=True):
+    arrays = read_ply_elements(path_to_ply, mmap_TF)
+
+    if "vertex" not in arrays or "voxel_size" not in arrays:
+        raise ValueError(f"{path_to_ply} is not a voxel grid .ply")
+
+    vertex = arrays["vertex"]
+    coords = stack_fields(vertex, ("x", "y", "z"), np.int32)
+    colors = stack_fields(vertex, ("red", "green", "blue"), np.uint8)
+    if colors is None:
+        colors = np.zeros((len(coords), 3), dtype=np.uint8)
+
+    voxel_size = float(arrays["voxel_size"]["val"][0])
+    origin = stack_fields(arrays.get("origin"), ("x", "y", "z"), float)
+    origin = np.zeros(3) if origin is None else origin[0]
+
+    return coords, colors, voxel_size, origin
+
+# In: The path to a point cloud .ply and mmap_TF
+# Out: The points (N, 3) as stored (float32 or float64), the colors (N, 3) uint8 and the normals (N, 3)
+#      (None if the point cloud has no colors / normals)
+def read_point_cloud_arrays(path_to_ply, mmap_TF=True):
+    arrays = read_ply_elements(path_to_ply, mmap_TF)
+
+    if "vertex" not in arrays:
+        raise ValueError(f"{path_to_ply} has no vertex element")
+
+    return get_point_cloud_fields(arrays["vertex"])
+
+# In: Structured numpy array of vertices and optionally the dtype of the points and normals (None: as stored)
+# Out: The points (N, 3), the colors (N, 3) uint8 and the normals (N, 3) (None if there are no colors / normals)
+def get_point_cloud_fields(vertex, points_dtype=None):
+    if points_dtype is None:
+        points_dtype = np.result_type(*[vertex.dtype[name] for name in ("x", "y", "z")]).newbyteorder("=")
+
+    points = stack_fields(vertex, ("x", "y", "z"), points_dtype)
+    colors = stack_fields(vertex, ("red", "green", "blue"), np.uint8)
+    normals = stack_fields(vertex, ("nx", "ny", "nz"), points_dtype)
+
+    return points, colors, normals
+
+# In: The path to a point cloud .ply and the number of points of a chunk
+# Out: Generator of chunks: the points (M, 3) float64, the colors (M, 3) uint8 and the normals (M, 3) float64
+#      (None if the point cloud has no colors / normals, float64 as o3d.io.read_point_cloud)
+#      Binary bodies are memory-mapped and ascii bodies are parsed line by line, only one chunk is in memory
+def read_point_cloud_chunks(path_to_ply, chunk_size):
+    ply_format, elements, header_length = read_ply_header(path_to_ply)
+    names = [name for name, _, _ in elements]
+
+    if "vertex" not in names:
+        raise ValueError(f"{path_to_ply} has no vertex element")
+
+    if ply_format != "ascii":
+        vertex = read_ply_elements(path_to_ply, mmap_TF=True)["vertex"]
+        for start in range(0, len(vertex), chunk_size):
+            yield get_point_cloud_fields(vertex[start:start + chunk_size], np.float64)
+        return
+
+    # Ascii: the vertices are the lines after the header (they have to be the first element)
+    if names[0] != "vertex":
+        raise ValueError(f"{path_to_ply} is ascii and has elements before the vertices, it can not be read in chunks")
+
+    _, count, dtype = elements[0]
+    with open(path_to_ply, "rb") as file:
+        file.seek(header_length)
+        for start in range(0, count, chunk_size):
+            lines = list(itertools.islice(file, min(chunk_size, count - start)))
+            values = np.loadtxt(lines, dtype=float, ndmin=2)
+
+            vertex = np.empty(len(values), dtype=dtype.newbyteorder("="))
+            for index_property, prop in enumerate(dtype.names):
+                vertex[prop] = values[:, index_property]
+
+            yield get_point_cloud_fields(vertex, np.float64)
+
+# In: Numpy array of colors (N, 3) in [0, 1] (float) or [0, 255] (uint8)
+# Out: The colors (N, 3) uint8, rounded like Open3D does when it writes a .ply
+def colors_to_uint8(colors):
+    colors = np.asarray(colors)
+
+    if colors.dtype == np.uint8:
+        return colors
+
+    return np.floor(np.clip(colors, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+
+# In: The path to the .ply, list of elements (name, list of (property name, numpy array (count)))
+# Out: - (writes a binary little endian .ply, the body of every element is written at once)
+def write_ply_elements(path_to_ply, elements):
+    header = ["ply", "format binary_little_endian 1.0", "comment Created by Open3D"]
+    bodies = []
+
+    for name, properties in elements:
+        count = len(properties[0][1]) if len(properties) > 0 else 0
+        dtype = np.dtype([(prop, "<" + np.asarray(values).dtype.str[1:]) for prop, values in properties])
+
+        header.append(f"element {name} {count}")
+        for prop, values in properties:
+            header.append(f"property {NUMPY_TO_PLY_TYPES[np.asarray(values).dtype.str[1:]]} {prop}")
+
+        body = np.empty(count, dtype=dtype)
+        for prop, values in properties:
+            body[prop] = values
+        bodies.append(body)
+
+    header.append("end_header")
+
+    directory = os.path.dirname(path_to_ply)
+    if directory != "" and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    with open(path_to_ply, "wb") as file:
+        file.write(("\n".join(header) + "\n").encode("ascii"))
+        for body in bodies:
+            body.tofile(file)
+
+# In: The path to the .ply, numpy array of grid indices (N, 3), numpy array of colors (N, 3) in [0, 1] or uint8
+#     (None: black), the voxel size and the origin
+# Out: - (writes the voxel grid with the same layout as o3d.io.write_voxel_grid, it can be read by Open3D)
+def write_voxel_grid_arrays(path_to_ply, coords, colors, voxel_size, origin):
+    coords = np.asarray(coords).reshape(-1, 3).astype(np.float64)
+    colors = np.zeros((len(coords), 3), dtype=np.uint8) if colors is None else colors_to_uint8(np.asarray(colors)[:, :3])
+    origin = np.asarray(origin, dtype=np.float64).reshape(3)
+    rotation = np.eye(3).ravel()
+
+    write_ply_elements(path_to_ply, [
+        ("origin", [("x", origin[0:1]), ("y", origin[1:2]), ("z", origin[2:3])]),
+        ("rotation", [(f"r{row}{column}", rotation[3 * row + column:3 * row + column + 1]) for row in range(3) for column in range(3)]),
+        ("voxel_size", [("val", np.array([voxel_size], dtype=np.float64))]),
+        ("vertex", [("x", coords[:, 0]), ("y", coords[:, 1]), ("z", coords[:, 2]),
+                    ("red", colors[:, 0]), ("green", colors[:, 1]), ("blue", colors[:, 2])]),
+    ])
+
+# In: The path to the .ply, numpy array of points (N, 3) (float32 or float64, written as they are),
+#     optionally numpy array of colors (N, 3) in [0, 1] or uint8 and numpy array of normals (N, 3)
+# Out: - (writes the point cloud as binary .ply, with the same layout as o3d.io.write_point_cloud for float64 points)
+def write_point_cloud_arrays(path_to_ply, points, colors=None, normals=None):
+    points = np.asarray(points).reshape(-1, 3)
+    if points.dtype not in (np.float32, np.float64):
+        points = points.astype(np.float64)
+
+    properties = [("x", points[:, 0]), ("y", points[:, 1]), ("z", points[:, 2])]
+
+    if normals is not None:
+        normals = np.asarray(normals, dtype=points.dtype).reshape(-1, 3)
+        properties += [("nx", normals[:, 0]), ("ny", normals[:, 1]), ("nz", normals[:, 2])]
+
+    if colors is not None:
+        colors = colors_to_uint8(np.asarray(colors)[:, :3])
+        properties += [("red", colors[:, 0]), ("green", colors[:, 1]), ("blue", colors[:, 2])]
+
+    write_ply_elements(path_to_ply, [("vertex", properties)])
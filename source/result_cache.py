@@ -0,0 +1,153 @@
+#
+# The following module caches the matching results of a pair of voxel grids (used by compare_voxel_grid_pair.py)
+# 1. Create the key of a pair: hash of the contents of both voxel grids, the voxel size, the bound and the engine version
+# 2. Read the cached results of a key (found T/F, nearest distances and their indices of every voxel)
+# 3. Write the results of a key in a compact binary file (.npz: T/F as bits, indices as int32 when they fit)
+# 4. Evict the least recently used files when the cache is larger than its maximum size
+#
+# The cache is content-addressed: a voxel grid that is written again with the same voxels has the same key,
+# a voxel grid that changed gets a new key (the old files are evicted when the cache is full)
+# Settings that do not change the results (plots, color map, random colors, workers, chunks) are not part of the key
+
+import hashlib
+import os
+import zipfile
+import numpy as np
+
+# Version of the file format, it is part of the key
+CACHE_FORMAT_VERSION = 1
+
+# Suffixes of the arrays that store T/F arrays as bits
+BITS_SUFFIX = "__bits"
+LENGTH_SUFFIX = "__length"
+
+# In: The path to a file and a hashlib hasher
+# Out: - (updates the hasher with the contents of the file, read in blocks)
+def hash_file(path_to_file, hasher, block_size=1 << 20):
+    with open(path_to_file, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            hasher.update(block)
+
+# In: List of paths to the input files, the voxel size, the bound and the version of the matching engine
+# Out: The key of the results (hex string)
+def get_cache_key(paths_to_files, voxel_size, bound, engine_version):
+    hasher = hashlib.sha256()
+    hasher.update(f"format {CACHE_FORMAT_VERSION} engine {engine_version} voxel_size {float(voxel_size)!r} bound {float(bound)!r}".encode())
+
+    for path_to_file in paths_to_files:
+        file_hasher = hashlib.sha256()
+        hash_file(path_to_file, file_hasher)
+        hasher.update(file_hasher.digest())
+
+    return hasher.hexdigest()
+
+# In: The path to the cache directory and the key
+# Out: The path to the file of the key
+def get_cache_file(path_to_cache, cache_key):
+    return os.path.join(path_to_cache, cache_key + ".npz")
+
+# In: The path to the cache directory and the key
+# Out: Dictionary name -> numpy array with the cached results, None if the key is not cached
+#      (a hit marks the file as recently used)
+def read_cached_results(path_to_cache, cache_key):
+    path_to_file = get_cache_file(path_to_cache, cache_key)
+
+    if not os.path.exists(path_to_file):
+        return None
+
+    try:
+        with np.load(path_to_file, allow_pickle=False) as stored:
+            stored = {name: stored[name] for name in stored.files}
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        # A damaged file (e.g. the disk was full) is removed and the results are found again
+        print(f"Cache file {path_to_file} can not be read, it is removed")
+        os.remove(path_to_file)
+        return None
+
+    results = {}
+    for name, array in stored.items():
+        if name.endswith(LENGTH_SUFFIX):
+            continue
+
+        if name.endswith(BITS_SUFFIX):
+            name = name[:-len(BITS_SUFFIX)]
+            length = int(stored[name + LENGTH_SUFFIX])
+            results[name] = np.unpackbits(array, count=length).astype(bool)
+        elif np.issubdtype(array.dtype, np.integer):
+            results[name] = array.astype(np.intp)
+        else:
+            results[name] = array
+
+    # Mark as recently used (the modification time is used, the access time is often not updated)
+    # (the file may have been evicted by another process in the meantime)
+    try:
+        os.utime(path_to_file)
+    except FileNotFoundError:
+        pass
+
+    return results
+
+# In: The path to the cache directory, the key, dictionary name -> numpy array with the results
+#     and the maximum size of the cache in MB (None: no maximum)
+# Out: The path to the file of the key (it is written to a temporary file first and then renamed,
+#      so an interrupted run never leaves a partial file)
+def write_cached_results(path_to_cache, cache_key, results, max_size_mb=None):
+    os.makedirs(path_to_cache, exist_ok=True)
+
+    stored = {}
+    for name, array in results.items():
+        array = np.asarray(array)
+
+        if array.dtype == bool:
+            stored[name + BITS_SUFFIX] = np.packbits(array)
+            stored[name + LENGTH_SUFFIX] = np.array(len(array))
+        elif np.issubdtype(array.dtype, np.integer) and (len(array) == 0 or (array.min() >= 0 and array.max() < 2**31)):
+            stored[name] = array.astype(np.int32)
+        else:
+            stored[name] = array
+
+    path_to_file = get_cache_file(path_to_cache, cache_key)
+    path_to_temp = path_to_file + f".{os.getpid()}.tmp"
+
+    with open(path_to_temp, "wb") as file:
+        np.savez(file, **stored)
+    os.replace(path_to_temp, path_to_file)
+
+    if max_size_mb is not None:
+        evict_cache(path_to_cache, max_size_mb, keep=path_to_file)
+
+    return path_to_file
+
+# In: The path to the cache directory, the maximum size in MB and optionally a file that is never evicted
+# Out: List of the evicted files (least recently used first, until the cache fits in the maximum size)
+def evict_cache(path_to_cache, max_size_mb, keep=None):
+    # Several processes can use the same cache at the same time (--jobs of compare_voxel_grids_all.py),
+    # files removed by another process are skipped
+    cache_files = []
+    for filename in os.listdir(path_to_cache):
+        if filename.endswith(".npz"):
+            path_to_file = os.path.join(path_to_cache, filename)
+            try:
+                status = os.stat(path_to_file)
+            except FileNotFoundError:
+                continue
+            cache_files.append((status.st_mtime, status.st_size, path_to_file))
+
+    total_size = sum(size for _, size, _ in cache_files)
+    max_size = max_size_mb * 1024 * 1024
+
+    evicted = []
+    for _, size, path_to_file in sorted(cache_files):
+        if total_size <= max_size:
+            break
+        if path_to_file == keep:
+            continue
+
+        try:
+            os.remove(path_to_file)
+            evicted.append(path_to_file)
+        except FileNotFoundError:
+            pass
+        total_size -= size
+
+    return evicted
@@ -0,0 +1,111 @@
+#
+# The following module runs the scripts of the pipeline inside the current process (used by compare_voxel_grids_all.py
+# and compare_voxel_grids_all_multiple.py instead of starting python3.10 <script> with subprocess.Popen for every object)
+# 1. Run a script with its arguments as if it was started from the command line and return its exit code
+# 2. Optionally write the output of the script to a log file (used when several scripts run at the same time)
+# 3. Measure the time needed by a script
+# 4. Build the command of a script (the same arguments as the command line)
+# 5. Run a function of a script (e.g. compare_pair() of compare_voxel_grid_pair.py) with the same exit codes, log file and time
+#
+# The modules (Open3D, SciPy, Matplotlib, numpy) are imported once by the first run and reused by all the next runs,
+# the script itself runs with new globals every time, so nothing is shared between two runs
+# (a function is called directly, so the script is not executed again for every run)
+# The output of the script is printed directly (no pipes to poll)
+
+import contextlib
+import os
+import runpy
+import sys
+import time
+import traceback
+import matplotlib.pyplot as plt
+
+# Directory of the scripts (the scripts are found independently of the working directory)
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# In: The SystemExit raised by a script or function
+# Out: Its exit code (None: 0, an integer: the integer, a message: the message is printed and 1)
+def get_exit_code(exit_exception):
+    if exit_exception.code is None:
+        return 0
+    elif isinstance(exit_exception.code, int):
+        return exit_exception.code
+
+    print(exit_exception.code)
+    return 1
+
+# In: The name (or path) of the script, the list of its arguments (strings, without the name of the script)
+#     and optionally the path to a log file for the output of the script (None: the output is printed)
+# Out: The exit code of the script (0: success, the code of sys.exit or 1 if an exception was raised)
+def run_script_in_process(script, arguments, path_to_log=None):
+    path_to_script = script if os.path.isabs(script) else os.path.join(SCRIPTS_DIR, script)
+
+    if path_to_log is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(path_to_log)), exist_ok=True)
+        with open(path_to_log, "w") as log_file, contextlib.redirect_stdout(log_file), contextlib.redirect_stderr(log_file):
+            return run_script_in_process(path_to_script, arguments)
+
+    # The scripts read their arguments from sys.argv
+    argv_saved = sys.argv
+    sys.argv = [path_to_script] + [str(argument) for argument in arguments]
+
+    try:
+        runpy.run_path(path_to_script, run_name="__main__")
+        return_code = 0
+    except SystemExit as exit_exception:
+        return_code = get_exit_code(exit_exception)
+    except Exception:
+        traceback.print_exc()
+        return_code = 1
+    finally:
+        sys.argv = argv_saved
+        # Figures that the script did not close would stay in memory until the end of the batch
+        plt.close("all")
+        sys.stdout.flush()
+
+    return return_code
+
+# In: The name (or path) of the script, the list of its arguments and optionally the path to a log file
+# Out: The exit code of the script and the seconds it needed (used by the worker processes of --jobs)
+def run_script_in_process_timed(script, arguments, path_to_log=None):
+    time_start = time.perf_counter()
+    return_code = run_script_in_process(script, arguments, path_to_log)
+
+    return return_code, time.perf_counter() - time_start
+
+# In: The name of the script and the list of its arguments
+# Out: The command that runs the script in its own process (the same arguments, used when run_in_process is False)
+def get_script_command(script, arguments):
+    return " ".join(["python3.10", os.path.join(SCRIPTS_DIR, script)] + [str(argument) for argument in arguments])
+
+# In: A function (defined at the top level of a module, so that it can be sent to the worker processes of --jobs),
+#     the list of its arguments and optionally the path to a log file for the output of the function (None: the output is printed)
+# Out: The exit code of the function (0: success, the code of sys.exit or 1 if an exception was raised)
+def run_function_in_process(function, arguments, path_to_log=None):
+    if path_to_log is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(path_to_log)), exist_ok=True)
+        with open(path_to_log, "w") as log_file, contextlib.redirect_stdout(log_file), contextlib.redirect_stderr(log_file):
+            return run_function_in_process(function, arguments)
+
+    try:
+        function(*arguments)
+        return_code = 0
+    except SystemExit as exit_exception:
+        return_code = get_exit_code(exit_exception)
+    except Exception:
+        traceback.print_exc()
+        return_code = 1
+    finally:
+        # Figures that the function did not close would stay in memory until the end of the batch
+        plt.close("all")
+        sys.stdout.flush()
+
+    return return_code
+
+# In: A function, the list of its arguments and optionally the path to a log file
+# Out: The exit code of the function and the seconds it needed (used by the worker processes of --jobs)
+def run_function_in_process_timed(function, arguments, path_to_log=None):
+    time_start = time.perf_counter()
+    return_code = run_function_in_process(function, arguments, path_to_log)
+
+    return return_code, time.perf_counter() - time_start
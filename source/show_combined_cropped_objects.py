@@ -0,0 +1,78 @@
+#
+# The following script performs the following tasks
+# 1. Find the cropped objects of a project (stored by crop_objects.py in gt_cropped_objects and colmap_a_cropped_objects)
+# 2. Create on demand the combined ground truth (blue) and colmap (aligned) (green) cropped objects of all or the selected IDs
+#    from the two cropped objects (see combined_crops.py)
+# 3. Visualize them and, with --save, store them in combined_cropped_objects (they are then read from there
+#    as long as they are newer than both cropped objects)
+
+
+# Section: 0
+# Importing modules
+#===================================================================================
+#===================================================================================
+#===================================================================================
+import sys
+from visualization_sink import draw_geometries, read_headless_argument
+from combined_crops import find_cropped_objects, read_combined_arrays, create_combined_point_cloud
+#===================================================================================
+#===================================================================================
+#===================================================================================
+
+# Section: 1
+# Read the arguments
+#===================================================================================
+#===================================================================================
+#===================================================================================
+# Read the optional --headless <skip|save|show> (it can be placed anywhere after the script name)
+read_headless_argument(sys.argv)
+
+# Read the optional --save (the combined cropped objects are stored in combined_cropped_objects)
+save_TF = "--save" in sys.argv
+if save_TF:
+    sys.argv.remove("--save")
+
+# Check if a command-line argument is provided
+if len(sys.argv) < 2:
+    print("Error: Usage python show_combined_cropped_objects.py <file_path_to_project> [<ID> ...] [--save] [--headless <skip|save|show>]")
+    print("file_path_to_project: provide the path to the project that contains gt_cropped_objects and colmap_a_cropped_objects")
+    print("ID: the IDs of the objects to show (default: all the cropped objects)")
+    sys.exit(1)
+
+# Get the file_path_to_project from the first command-line argument
+file_path_to_project = sys.argv[1]
+print(f"\nProvided file_path_to_project: {file_path_to_project}\n")
+
+# Get the selected IDs from the rest of the command-line arguments
+try:
+    selected_ids = [int(argument) for argument in sys.argv[2:]]
+except ValueError:
+    print("Error: the IDs must be integers")
+    sys.exit(1)
+#===================================================================================
+#===================================================================================
+#===================================================================================
+
+# Section: 2
+# Create, visualize and (with --save) store the combined cropped objects
+#===================================================================================
+#===================================================================================
+#===================================================================================
+cropped_objects = find_cropped_objects(file_path_to_project)
+if selected_ids:
+    cropped_objects = [(id_object, object_name) for id_object, object_name in cropped_objects if id_object in selected_ids]
+
+if not cropped_objects:
+    print("Error: no cropped objects found (run crop_objects.py first)")
+    sys.exit(1)
+
+for id_object, object_name in cropped_objects:
+    points, colors = read_combined_arrays(file_path_to_project, id_object, object_name, cache_TF=save_TF)
+    print(f"{id_object}_combined_{object_name}: {len(points)} points")
+
+    draw_geometries([create_combined_point_cloud(points, colors)], f"{id_object}_combined_{object_name}")
+
+print(f"\nCombined cropped objects: {len(cropped_objects)}")
+#===================================================================================
+#===================================================================================
+#===================================================================================
@@ -0,0 +1,108 @@
+#
+# The following module is the single place where the scripts visualize geometries
+# (crop_objects.py, compare_voxel_grid_pair.py, compare_voxel_grid_gt.py, compare_voxel_grid_colmap.py,
+# compare_voxel_grids.py, compare_voxel_grids_temp.py)
+# 1. Read the headless mode from the arguments (--headless <skip|save>) or from the environment variable VOXEL_EVAL_HEADLESS
+# 2. Visualize, skip or save the geometries, depending on the headless mode
+#
+# Headless modes:
+#   show: open the Open3D viewer window (blocks until it is closed)
+#   skip: do not visualize the geometries
+#   save: write the geometries to .ply files (in VOXEL_EVAL_HEADLESS_DIR, default: headless_geometries)
+#         for later inspection
+# If no mode is set, the viewer is opened only if a display is available, otherwise the geometries are skipped
+# The mode is stored in the environment, so the scripts that run as subprocesses use the same mode
+
+import os
+import sys
+import open3d as o3d
+
+# Names of the environment variables
+HEADLESS_MODE_VARIABLE = "VOXEL_EVAL_HEADLESS"
+HEADLESS_DIR_VARIABLE = "VOXEL_EVAL_HEADLESS_DIR"
+
+HEADLESS_MODES = ["show", "skip", "save"]
+
+# Number of geometries saved by the current process (used for unique file names)
+_number_of_saved = 0
+
+# In: The list of arguments (sys.argv)
+# Out: - (removes --headless <skip|save|show> from the arguments so that the rest keep their positions
+#      and stores the mode in the environment variable VOXEL_EVAL_HEADLESS)
+def read_headless_argument(argv):
+    if "--headless" not in argv:
+        return
+
+    position_headless = argv.index("--headless")
+
+    # The mode is optional, --headless alone means skip
+    if position_headless + 1 < len(argv) and argv[position_headless + 1].lower() in HEADLESS_MODES:
+        headless_mode = argv[position_headless + 1].lower()
+        del argv[position_headless:position_headless + 2]
+    else:
+        headless_mode = "skip"
+        del argv[position_headless]
+
+    os.environ[HEADLESS_MODE_VARIABLE] = headless_mode
+
+# In: -
+# Out: The headless mode (show, skip or save)
+def get_headless_mode():
+    headless_mode = os.environ.get(HEADLESS_MODE_VARIABLE, "").strip().lower()
+
+    if headless_mode in HEADLESS_MODES:
+        return headless_mode
+
+    if headless_mode != "":
+        print(f"Unknown {HEADLESS_MODE_VARIABLE}={headless_mode}, the geometries are skipped (use one of {HEADLESS_MODES})")
+        return "skip"
+
+    # No mode is set: show only if there is a display (Windows and macOS always have one)
+    if sys.platform.startswith("linux") and not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")):
+        return "skip"
+
+    return "show"
+
+# In: A geometry (point cloud, voxel grid, triangle mesh, line set or bounding box) and the path without extension
+# Out: - (writes the geometry to a .ply file)
+def write_geometry(geometry, path_without_extension):
+    if isinstance(geometry, o3d.geometry.VoxelGrid):
+        o3d.io.write_voxel_grid(path_without_extension + ".ply", geometry)
+    elif isinstance(geometry, o3d.geometry.PointCloud):
+        o3d.io.write_point_cloud(path_without_extension + ".ply", geometry)
+    elif isinstance(geometry, o3d.geometry.TriangleMesh):
+        o3d.io.write_triangle_mesh(path_without_extension + ".ply", geometry)
+    elif isinstance(geometry, o3d.geometry.LineSet):
+        o3d.io.write_line_set(path_without_extension + ".ply", geometry)
+    elif isinstance(geometry, o3d.geometry.AxisAlignedBoundingBox):
+        o3d.io.write_line_set(path_without_extension + ".ply", o3d.geometry.LineSet.create_from_axis_aligned_bounding_box(geometry))
+    elif isinstance(geometry, o3d.geometry.OrientedBoundingBox):
+        o3d.io.write_line_set(path_without_extension + ".ply", o3d.geometry.LineSet.create_from_oriented_bounding_box(geometry))
+    else:
+        print(f"Geometry of type {type(geometry).__name__} can not be saved, it is skipped")
+
+# In: List of geometries and optionally a name used for the saved files
+# Out: - (visualizes, skips or saves the geometries depending on the headless mode)
+def draw_geometries(geometries, name="geometries"):
+    global _number_of_saved
+
+    headless_mode = get_headless_mode()
+
+    if headless_mode == "show":
+        o3d.visualization.draw_geometries(geometries)
+        return
+
+    if headless_mode == "skip":
+        print(f"Headless: skipping visualization of {name}")
+        return
+
+    # Save every geometry in its own file, the process id and the counter keep the names unique
+    path_to_headless_dir = os.environ.get(HEADLESS_DIR_VARIABLE, "headless_geometries")
+    os.makedirs(path_to_headless_dir, exist_ok=True)
+
+    for index_geometry, geometry in enumerate(geometries):
+        path_without_extension = os.path.join(path_to_headless_dir, f"{os.getpid()}_{_number_of_saved:04d}_{name}_{index_geometry}")
+        write_geometry(geometry, path_without_extension)
+
+    _number_of_saved += 1
+    print(f"Headless: saved visualization of {name} in {path_to_headless_dir}")
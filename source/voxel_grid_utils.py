@@ -0,0 +1,169 @@
+#
+# The following module contains the voxel grid helpers used by the comparison scripts
+# (compare_voxel_grid_gt.py, compare_voxel_grid_colmap.py, compare_voxel_grids.py)
+# 1. Get the centers of voxels from their grid indices (all at once)
+# 2. Create a voxel grid directly from grid indices and colors, with the voxel size and origin
+#    of the voxel grid the indices came from (the voxel centers are voxelized in one call, no loop over the voxels)
+# 3. Color all voxels at once: distances with a color map, found with original and not found with red,
+#    random colors (with an optional seeded random generator)
+# 4. Voxelize a point cloud directly from its points (the same voxels as o3d.geometry.VoxelGrid.create_from_point_cloud)
+# 5. Name and find the voxel grids of the cropped objects stored by crop_objects.py for a voxel size
+#    (<name>_voxelized.ply for the first voxel size, <name>_voxelized_vox_<voxel_size>.ply for the others)
+
+import os
+import open3d as o3d
+import numpy as np
+import matplotlib.pyplot as plt
+
+# In: Numpy array of grid indices (N, 3), the voxel size and the origin of the voxel grid
+# Out: The centers of the voxels (N, 3), calculated as get_voxel_center_coordinate does
+#      ((grid_index + 0.5) * voxel_size) + origin
+def get_voxel_centers(coords, voxel_size, origin):
+    coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+    return ((coords + 0.5) * voxel_size) + np.asarray(origin, dtype=float)
+
+# In: Numpy array of grid indices (N, 3), numpy array of colors (N, 3) or (N, 4) in [0, 1] (or uint8 in [0, 255]),
+#     the voxel size and the origin of the voxel grid the grid indices came from
+# Out: A voxel grid that has exactly one voxel for each grid index with its color (RGB), on the lattice of the original voxel grid
+def create_voxel_grid(coords, colors, voxel_size, origin):
+    coords = np.asarray(coords, dtype=np.int32).reshape(-1, 3)
+    colors = np.asarray(colors)
+
+    # Colors in [0, 255] (uint8) are normalized to the range [0, 1]
+    if colors.dtype == np.uint8:
+        colors = colors / 255.0
+
+    colors = np.asarray(colors, dtype=float).reshape(len(coords), -1)[:, :3]
+
+    voxel_size = float(voxel_size)
+    origin = np.asarray(origin, dtype=float)
+
+    if len(coords) == 0:
+        # Empty voxel grid on the same lattice as the original
+        voxel_grid = o3d.geometry.VoxelGrid()
+        voxel_grid.voxel_size = voxel_size
+        voxel_grid.origin = origin
+        return voxel_grid
+
+    # One point at the center of every voxel with its color, voxelized in one call (no Python loop over the voxels)
+    # The centers are in the middle of their voxels, so every center falls in its own voxel again
+    pcd = o3d.geometry.PointCloud(o3d.utility.Vector3dVector(get_voxel_centers(coords, voxel_size, origin)))
+    pcd.colors = o3d.utility.Vector3dVector(colors)
+
+    # Bounds on the same lattice as the original (the origin moves by whole voxels only if there are negative grid indices)
+    min_bound = origin + np.minimum(coords.min(axis=0), 0) * voxel_size
+    max_bound = origin + (coords.max(axis=0) + 1) * voxel_size
+    voxel_grid = o3d.geometry.VoxelGrid.create_from_point_cloud_within_bounds(pcd, voxel_size, min_bound, max_bound)
+
+    return voxel_grid
+
+# In: Numpy array of points (N, 3) with N > 0 and the voxel size
+# Out: The grid indices of the voxels that contain points (M, 3) int32 (sorted), the origin of the voxel grid (3)
+#      and for every point the index of its voxel (N)
+#      The same voxels and origin as o3d.geometry.VoxelGrid.create_from_point_cloud: the origin is the minimum bound
+#      of the points - voxel_size / 2 and the grid index of a point is floor((point - origin) / voxel_size)
+def get_point_voxels(points, voxel_size):
+    points = np.asarray(points, dtype=float).reshape(-1, 3)
+    origin = points.min(axis=0) - voxel_size * 0.5
+
+    coords = np.floor((points - origin) / voxel_size).astype(np.int32)
+    coords, point_voxels = np.unique(coords, axis=0, return_inverse=True)
+
+    return coords, origin, point_voxels.reshape(-1)
+
+# In: Numpy array of colors (N, 3) in [0, 1] and the dtype of the result (np.float32, np.float64 or np.uint8)
+# Out: The colors as dtype, uint8 colors are scaled to [0, 255]
+def convert_colors(colors, dtype=np.float32):
+    if np.dtype(dtype) == np.uint8:
+        return np.round(np.asarray(colors, dtype=float) * 255.0).astype(np.uint8)
+
+    return np.asarray(colors, dtype=dtype)
+
+# In: Numpy array of distances (N), the name of the matplotlib color map and optionally the dtype of the colors
+# Out: The colors (N, 3) of the distances, the distances are normalized between their minimum and maximum
+#      (the same colors as cmap(norm(distance)) for each distance)
+def get_distance_colors(distances, color_map_value, dtype=np.float32):
+    distances = np.asarray(distances, dtype=float)
+
+    # Define the colormap
+    cmap = plt.get_cmap(color_map_value)
+
+    # Normalize distances to [0, 1] to map them to the colormap
+    norm = plt.Normalize(np.min(distances), np.max(distances))
+
+    # Map all the distances at once and extract RGB from RGBA
+    colors = cmap(norm(distances))[:, :3]
+
+    return convert_colors(colors, dtype)
+
+# In: Numpy array of found voxels T/F (N), numpy array of the original colors (N, 3),
+#     random_red_TF (True: not found voxels get a random variation of red, False: full red),
+#     optionally a numpy random generator (e.g. np.random.default_rng(seed)) and the dtype of the colors
+# Out: The colors (N, 3), found voxels keep their original color and not found voxels are red
+def get_found_colors(found_voxels_TF, values, random_red_TF=False, rng=None, dtype=np.float32):
+    found_voxels_TF = np.asarray(found_voxels_TF, dtype=bool)
+    colors = np.array(values, dtype=float).reshape(len(found_voxels_TF), -1)[:, :3]
+
+    not_found_voxels_TF = ~found_voxels_TF
+    colors[not_found_voxels_TF] = 0.0
+
+    if random_red_TF:
+        if rng is None:
+            rng = np.random.default_rng()
+
+        # Random variation of red
+        colors[not_found_voxels_TF, 0] = rng.uniform(0.0, 1.0, size=np.count_nonzero(not_found_voxels_TF))
+    else:
+        # Full red
+        colors[not_found_voxels_TF, 0] = 1.0
+
+    return convert_colors(colors, dtype)
+
+# In: The number of voxels, optionally a numpy random generator (e.g. np.random.default_rng(seed)) and the dtype of the colors
+# Out: Random colors (N, 3)
+def get_random_colors(num_voxels, rng=None, dtype=np.float32):
+    if rng is None:
+        rng = np.random.default_rng()
+
+    colors = rng.integers(0, 255, size=(num_voxels, 3), dtype=np.uint8)
+
+    if np.dtype(dtype) == np.uint8:
+        return colors
+
+    # Normalize the colors to the range [0, 1]
+    return np.asarray(colors / 255.0, dtype=dtype)
+
+# In: The base name of a cropped object (<ID>_<gt or colmap>_<object name>) and the voxel size
+#     (None: the first voxel size of crop_objects.py, stored without its voxel size)
+# Out: The file name of its voxel grid: <base name>_voxelized.ply or <base name>_voxelized_vox_<voxel_size>.ply
+def get_voxelized_file_name(base_name, voxel_size=None):
+    if voxel_size is None:
+        return base_name + "_voxelized.ply"
+
+    return base_name + f"_voxelized_vox_{float(voxel_size)}.ply"
+
+# In: The path to a voxel grid <name>_voxelized.ply and the voxel size (None: the path itself)
+# Out: The path to <name>_voxelized_vox_<voxel_size>.ply if it exists, otherwise the path to <name>_voxelized.ply
+def get_voxelized_ply_path(path_to_voxelized_ply, voxel_size=None):
+    if voxel_size is None:
+        return path_to_voxelized_ply
+
+    base_name = os.path.basename(path_to_voxelized_ply)[:-len("_voxelized.ply")]
+    path_to_sized_ply = os.path.join(os.path.dirname(path_to_voxelized_ply), get_voxelized_file_name(base_name, voxel_size))
+
+    return path_to_sized_ply if os.path.exists(path_to_sized_ply) else path_to_voxelized_ply
+
+# In: The path to a directory and the voxel size (None: the first voxel size of crop_objects.py)
+# Out: Sorted list of the paths of the voxel grids of the cropped objects in the directory and its subdirectories,
+#      one for each object (see get_voxelized_ply_path)
+def find_voxelized_ply_files(directory_path, voxel_size=None):
+    voxelized_ply_files = []
+
+    # Walk through the directory and its subdirectories
+    for root, _, files in os.walk(directory_path):
+        for file in files:
+            if file.endswith("_voxelized.ply"):
+                # Combine the root and file to get the full path
+                voxelized_ply_files.append(get_voxelized_ply_path(os.path.join(root, file), voxel_size))
+
+    return sorted(voxelized_ply_files)
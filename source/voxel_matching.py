@@ -0,0 +1,565 @@
+#
+# The following module contains the matching engine used by the comparison scripts
+# (compare_voxel_grid_pair.py, compare_voxel_grid_gt.py, compare_voxel_grid_colmap.py, compare_voxel_grids.py)
+# 1. Build a spatial index (KD-tree) over the target centers
+# 2. Find for every query center the target centers inside the box [center - bound, center + bound]
+# 3. Reduce the candidates to the found T/F, the minimum distance and the index of the minimum distance
+# 4. Do 2. and 3. for both directions (ground truth -> colmap, colmap -> ground truth) from one radius query
+# 5. Find the nearest center without bound and match voxels based on grid index
+# 6. Find the distances once and threshold them for many bounds (sweep)
+# 7. Process the query centers in chunks so that the memory of the candidate pairs stays inside a budget
+# 8. Process the chunks in parallel with a pool of worker processes that share the centers and the KD-tree
+# 9. Dense engine: for voxel grids with the same voxel size, rasterize the target voxels into a 3D array and find
+#    the minimum distance inside the box with a distance transform (cost depends on the volume, not on the pairs)
+#    The transform is a minimum over the shifts of the box, one axis at a time, and not scipy.ndimage.distance_transform_edt:
+#    the query centers are between the target cells (any offset) and the nearest target voxel must be inside the box,
+#    while the euclidean distance transform measures from cell to cell and returns the nearest target voxel anywhere
+#
+# The results are the same as the ones of the double loop that was used before:
+#   for each query center, all the target centers inside the box get their euclidean distance
+#   and all the target centers outside of the box get the distance pad_distance,
+#   then the minimum distance and its index (first occurrence, like np.argmin) are kept
+# The box test is performed with the exact same comparisons as the double loop,
+# the KD-tree is only used to find the candidates
+# The distances are rounded like scipy.spatial.distance.euclidean of the double loop (BLAS nrm2, which sums the squares
+# in extended precision on x86-64), see get_center_distances, so equidistant target centers give the same minimum index
+# (on platforms where long double is the same as double the distances can differ in the last bit)
+
+import multiprocessing
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Version of the matching results, it is part of the key of the cached results (result_cache.py)
+# Change it whenever a change of the engine (or of the order in which the voxels are read) changes the results
+MATCHING_ENGINE_VERSION = "1.3.1"
+
+# Approximate memory (bytes) that one candidate pair needs while it is found, filtered and reduced
+# (radius query output, the query and target centers of the pair, long double differences, distances, sorting and grouping arrays)
+BYTES_PER_PAIR = 320
+
+# Approximate memory (bytes) that one cell of the 3D array of the dense engine needs
+# (distances, target indices, their padded copies and the candidate distances)
+BYTES_PER_CELL = 48
+
+# Arrays and KD-tree shared with the worker processes of match_centers_w_bound
+# (set before the pool is created, so with fork the workers read them without copying or pickling)
+_shared_matching = {}
+
+# In: Numpy array of differences between centers (N, 3)
+# Out: The euclidean distances (N), rounded like scipy.spatial.distance.euclidean (the squares are summed in long double
+#      and the square root is rounded once to double, a double sum can differ in the last bit and change the minimum index of ties)
+def get_center_distances(difference):
+    difference = np.asarray(difference, dtype=np.longdouble)
+
+    return np.sqrt(np.einsum("ij,ij->i", difference, difference)).astype(float)
+
+# In: Numpy array of centers (N, 3)
+# Out: KD-tree built over the centers
+def build_center_tree(centers):
+    return cKDTree(np.asarray(centers, dtype=float))
+
+# In: Numpy array of centers A (N, 3), numpy array of centers B (M, 3), the bound
+#     and optionally the already built KD-trees of the centers A and B
+# Out: The A and B candidate pairs whose chebyshev distance is at most the bound (plus a small tolerance),
+#      the same candidates serve both directions A -> B and B -> A
+def find_candidate_pairs(centers_a, centers_b, bound, tree_a=None, tree_b=None):
+    centers_a = np.asarray(centers_a, dtype=float)
+    centers_b = np.asarray(centers_b, dtype=float)
+
+    if len(centers_a) == 0 or len(centers_b) == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    if tree_a is None:
+        tree_a = build_center_tree(centers_a)
+
+    if tree_b is None:
+        tree_b = build_center_tree(centers_b)
+
+    # The KD-tree search uses a slightly bigger radius so that no pair that passes the
+    # exact box test is lost due to floating point rounding
+    # (the bounding boxes of the KD-trees are used, so a chunk does not scan all the centers again)
+    max_abs_coord = max(np.abs(tree_a.mins).max(), np.abs(tree_a.maxes).max(), np.abs(tree_b.mins).max(), np.abs(tree_b.maxes).max())
+    search_radius = bound + 1e-9 * (1.0 + abs(bound) + max_abs_coord)
+
+    # Get candidate pairs with chebyshev distance (box) smaller than the search radius
+    candidates = tree_a.sparse_distance_matrix(tree_b, search_radius, p=np.inf, output_type="ndarray")
+
+    return candidates["i"].astype(np.intp), candidates["j"].astype(np.intp)
+
+# In: Numpy array of query centers (N, 3), numpy array of target centers (M, 3) and the candidate pairs
+#     returned by find_candidate_pairs (index_query in the query centers, index_target in the target centers)
+# Out: The query and target pairs sorted by query and then by target, that are inside the box
+#      [query - bound, query + bound] (checked with the same comparisons as the double loop)
+def filter_pairs_w_bound(centers_query, centers_target, index_query, index_target, bound):
+    centers_query = np.asarray(centers_query, dtype=float)
+    centers_target = np.asarray(centers_target, dtype=float)
+
+    # Exact box test, same comparisons as the double loop
+    query = centers_query[index_query]
+    target = centers_target[index_target]
+    inside = np.all((query - bound <= target) & (target <= query + bound), axis=1)
+    index_query = index_query[inside]
+    index_target = index_target[inside]
+
+    # Sort by query and then by target
+    order = np.lexsort((index_target, index_query))
+
+    return index_query[order], index_target[order]
+
+# In: Numpy array of query centers (N, 3), numpy array of target centers (M, 3), the bound
+#     and optionally the already built KD-trees of the target and query centers
+# Out: The query and target pairs sorted by query and then by target, that are inside the box
+#      [query - bound, query + bound] (checked with the same comparisons as the double loop)
+def find_pairs_w_bound(centers_query, centers_target, bound, tree_target=None, tree_query=None):
+    index_query, index_target = find_candidate_pairs(centers_query, centers_target, bound, tree_query, tree_target)
+
+    return filter_pairs_w_bound(centers_query, centers_target, index_query, index_target, bound)
+
+# In: Numpy array of query centers (N, 3), numpy array of target centers (M, 3), the pairs inside the bound
+#     returned by filter_pairs_w_bound and the distance used for target centers outside of the bound
+# Out: found_voxels_TF (N) T: at least one target center inside the bound, F: none,
+#      distances_w_bound (N) the minimum distance, distance_index_w_bound (N) the index of the target center
+#      with the minimum distance
+def reduce_pairs_w_bound(centers_query, centers_target, index_query, index_target, pad_distance):
+    centers_query = np.asarray(centers_query, dtype=float)
+    centers_target = np.asarray(centers_target, dtype=float)
+
+    num_query = len(centers_query)
+    num_target = len(centers_target)
+
+    # Initialize the results as if no target center was found inside the bound
+    # (all distances are pad_distance, so np.argmin returns the first target)
+    found_voxels_TF = np.zeros(num_query, dtype=bool)
+    distances_w_bound = np.full(num_query, pad_distance, dtype=float)
+    distance_index_w_bound = np.zeros(num_query, dtype=int)
+
+    if len(index_query) == 0:
+        return found_voxels_TF, distances_w_bound, distance_index_w_bound
+
+    # Euclidean distance of every pair inside the bound
+    difference = centers_query[index_query] - centers_target[index_target]
+    pair_distances = get_center_distances(difference)
+
+    # Start of each query group (pairs are sorted by query and then by target)
+    group_start = np.flatnonzero(np.r_[True, index_query[1:] != index_query[:-1]])
+    group_query = index_query[group_start]
+    group_count = np.diff(np.r_[group_start, len(index_query)])
+
+    # Minimum distance inside the bound for each query
+    group_min = np.minimum.reduceat(pair_distances, group_start)
+
+    # First target (smallest index) that has the minimum distance
+    is_min = pair_distances == np.repeat(group_min, group_count)
+    position = np.arange(len(index_query))
+    first_min_position = np.minimum.reduceat(np.where(is_min, position, len(index_query)), group_start)
+    group_argmin = index_target[first_min_position]
+
+    # First target (smallest index) that is outside of the bound for each query
+    # the targets are sorted, so the first gap in 0, 1, 2, ... is the first target outside
+    rank = position - np.repeat(group_start, group_count)
+    is_gap = index_target != rank
+    first_gap = np.minimum.reduceat(np.where(is_gap, rank, group_count.max()), group_start)
+    first_gap = np.minimum(first_gap, group_count)
+    has_outside = group_count < num_target
+
+    # Combine the distances inside the bound with the pad_distance of the targets outside
+    group_distance = group_min.copy()
+    group_index = group_argmin.copy()
+
+    pad_smaller = has_outside & (pad_distance < group_min)
+    group_distance[pad_smaller] = pad_distance
+    group_index[pad_smaller] = first_gap[pad_smaller]
+
+    pad_equal = has_outside & (pad_distance == group_min)
+    group_index[pad_equal] = np.minimum(group_argmin[pad_equal], first_gap[pad_equal])
+
+    found_voxels_TF[group_query] = True
+    distances_w_bound[group_query] = group_distance
+    distance_index_w_bound[group_query] = group_index
+
+    return found_voxels_TF, distances_w_bound, distance_index_w_bound
+
+# In: The arrays and KD-tree of _shared_matching
+# Out: - (sets _shared_matching of a worker process, needed only when the workers are not forked)
+def _init_worker(shared_matching):
+    _shared_matching.update(shared_matching)
+
+# In: The positions of the query centers of one chunk
+# Out: The results of match_centers_w_bound for the chunk (run by a worker process)
+def _match_chunk(chunk):
+    centers_query = _shared_matching["centers_query"]
+    centers_target = _shared_matching["centers_target"]
+    centers_chunk = centers_query[chunk]
+
+    index_query, index_target = find_pairs_w_bound(centers_chunk, centers_target, _shared_matching["bound"], _shared_matching["tree_target"])
+
+    return reduce_pairs_w_bound(centers_chunk, centers_target, index_query, index_target, _shared_matching["pad_distance"])
+
+# In: Numpy array of query centers (N, 3), numpy array of target centers (M, 3), the bound, the distance
+#     used for target centers outside of the bound, optionally an already built KD-tree of the target centers,
+#     optionally the number of query centers processed at once (None: all at once)
+#     and optionally the number of worker processes (1: no parallel processing)
+# Out: found_voxels_TF (N) T: at least one target center inside the bound, F: none,
+#      distances_w_bound (N) the minimum distance, distance_index_w_bound (N) the index of the target center
+#      with the minimum distance
+def match_centers_w_bound(centers_query, centers_target, bound, pad_distance, tree_target=None, chunk_size=None, workers=1):
+    centers_query = np.asarray(centers_query, dtype=float)
+    centers_target = np.asarray(centers_target, dtype=float)
+
+    num_query = len(centers_query)
+
+    # With several workers split the query centers in (at least) 4 chunks per worker, so that they stay busy
+    if workers > 1:
+        chunk_size_workers = max(-(-num_query // (4 * workers)), 1)
+        chunk_size = chunk_size_workers if chunk_size is None else min(chunk_size, chunk_size_workers)
+
+    if chunk_size is None or num_query <= chunk_size:
+        index_query, index_target = find_pairs_w_bound(centers_query, centers_target, bound, tree_target)
+
+        return reduce_pairs_w_bound(centers_query, centers_target, index_query, index_target, pad_distance)
+
+    if tree_target is None:
+        tree_target = build_center_tree(centers_target)
+
+    # Preallocate the results and fill them chunk by chunk
+    # (the result of every query center depends only on the query center itself, so the chunks give the same results)
+    found_voxels_TF = np.zeros(num_query, dtype=bool)
+    distances_w_bound = np.zeros(num_query, dtype=float)
+    distance_index_w_bound = np.zeros(num_query, dtype=int)
+
+    # Sort the query centers by x, y, z so that every chunk is a compact slab of the scene
+    # and its radius query only visits the nearby part of the target KD-tree
+    order = np.lexsort((centers_query[:, 2], centers_query[:, 1], centers_query[:, 0]))
+    chunks = [order[start:start + chunk_size] for start in range(0, num_query, chunk_size)]
+
+    _shared_matching.update(centers_query=centers_query, centers_target=centers_target, tree_target=tree_target,
+                            bound=bound, pad_distance=pad_distance)
+
+    try:
+        if workers > 1:
+            # The workers are forked after _shared_matching is set, so they share the centers and the KD-tree
+            # (where fork is not available they are copied once to every worker)
+            start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+            with multiprocessing.get_context(start_method).Pool(workers, initializer=_init_worker, initargs=(dict(_shared_matching),)) as pool:
+                # imap returns the results in the order of the chunks, every chunk fills its own positions
+                results = pool.imap(_match_chunk, chunks)
+
+                for chunk, result in zip(chunks, results):
+                    found_voxels_TF[chunk], distances_w_bound[chunk], distance_index_w_bound[chunk] = result
+
+        else:
+            for chunk in chunks:
+                found_voxels_TF[chunk], distances_w_bound[chunk], distance_index_w_bound[chunk] = _match_chunk(chunk)
+
+    finally:
+        _shared_matching.clear()
+
+    return found_voxels_TF, distances_w_bound, distance_index_w_bound
+
+# In: Numpy array of ground truth centers (N, 3), numpy array of colmap centers (M, 3), the bound, the distance
+#     used for centers outside of the bound, optionally the already built KD-trees of both,
+#     optionally the number of query centers processed at once (None: all at once)
+#     and optionally the number of worker processes (1: no parallel processing)
+# Out: The results of match_centers_w_bound for ground truth -> colmap and for colmap -> ground truth,
+#      calculated from a single radius query (or one chunked query for each direction if chunk_size or workers is set)
+def match_centers_w_bound_both(centers_gt, centers_colmap, bound, pad_distance, tree_gt=None, tree_colmap=None, chunk_size=None, workers=1):
+    if workers > 1 or (chunk_size is not None and max(len(centers_gt), len(centers_colmap)) > chunk_size):
+        result_gt = match_centers_w_bound(centers_gt, centers_colmap, bound, pad_distance, tree_colmap, chunk_size, workers)
+        result_colmap = match_centers_w_bound(centers_colmap, centers_gt, bound, pad_distance, tree_gt, chunk_size, workers)
+
+        return result_gt, result_colmap
+
+    index_gt, index_colmap = find_candidate_pairs(centers_gt, centers_colmap, bound, tree_gt, tree_colmap)
+
+    # Ground truth -> colmap
+    index_query, index_target = filter_pairs_w_bound(centers_gt, centers_colmap, index_gt, index_colmap, bound)
+    result_gt = reduce_pairs_w_bound(centers_gt, centers_colmap, index_query, index_target, pad_distance)
+
+    # Colmap -> ground truth
+    index_query, index_target = filter_pairs_w_bound(centers_colmap, centers_gt, index_colmap, index_gt, bound)
+    result_colmap = reduce_pairs_w_bound(centers_colmap, centers_gt, index_query, index_target, pad_distance)
+
+    return result_gt, result_colmap
+
+# In: The number of target centers (M), the bound, the voxel size of the voxel grids,
+#     the memory budget (MB) for the candidate pairs (None: no budget) and optionally the number of worker processes
+#     (the budget is shared, every worker processes one chunk at a time)
+# Out: The number of query centers to process at once (None: all at once)
+#      Every query center has at most (2 * bound / voxel_size + 1)^3 target centers inside its box (and at most M)
+def get_chunk_size(num_target, bound, voxel_size, memory_budget_mb, workers=1):
+    if memory_budget_mb is None:
+        return None
+
+    pairs_per_query = min(max(num_target, 1), (int(np.floor(2 * bound / voxel_size)) + 1) ** 3)
+    chunk_size = int(memory_budget_mb * 1024 * 1024 / (pairs_per_query * BYTES_PER_PAIR * max(workers, 1)))
+
+    return max(chunk_size, 1)
+
+# In: Numpy array of query centers (N, 3), the KD-tree of the target centers and optionally the number of threads
+# Out: distances (N) the distance to the nearest target center (without bound), distance_index (N) the index
+#      of the nearest target center (if several are at the same distance any of them can be returned)
+def match_centers_wo_bound(centers_query, tree_target, workers=1):
+    distances, distance_index = tree_target.query(np.asarray(centers_query, dtype=float), k=1, workers=workers)
+
+    return distances, distance_index
+
+# In: Numpy array of query grid indices (N, 3) and numpy array of target grid indices (M, 3)
+# Out: found_voxels_TF (N) T: the same grid index exists in the target, F: it does not
+def match_indices(coords_query, coords_target):
+    # View every grid index (row) as a single value so that rows can be compared all at once
+    coords_query = np.ascontiguousarray(coords_query, dtype=np.int64).reshape(-1, 3)
+    coords_target = np.ascontiguousarray(coords_target, dtype=np.int64).reshape(-1, 3)
+    row_dtype = np.dtype((np.void, coords_query.dtype.itemsize * 3))
+
+    return np.isin(coords_query.view(row_dtype).ravel(), coords_target.view(row_dtype).ravel())
+
+# In: Numpy array of query centers (N, 3), numpy array of target centers (M, 3), the KD-tree of the target centers
+#     and optionally the number of threads
+# Out: The distances from which the results of match_centers_w_bound can be found for any bound (see threshold_distances_w_bound)
+#      distances (N) euclidean distance to the nearest target center, distances_box (N) chebyshev distance
+#      to the nearest target center, distances_box_far (N) chebyshev distance to the farthest target center
+def get_sweep_distances(centers_query, centers_target, tree_target, workers=1):
+    centers_query = np.asarray(centers_query, dtype=float)
+    centers_target = np.asarray(centers_target, dtype=float)
+
+    distances, _ = tree_target.query(centers_query, k=1, workers=workers)
+    distances_box, _ = tree_target.query(centers_query, k=1, p=np.inf, workers=workers)
+
+    # The farthest target center in chebyshev distance is given by the bounding box of the targets
+    minimum_target = centers_target.min(axis=0)
+    maximum_target = centers_target.max(axis=0)
+    distances_box_far = np.max(np.maximum(centers_query - minimum_target, maximum_target - centers_query), axis=1)
+
+    return distances, distances_box, distances_box_far
+
+# In: The distances returned by get_sweep_distances and the bound (also used as the distance of target centers outside the bound)
+# Out: found_voxels_TF (N) and distances_w_bound (N), the same as match_centers_w_bound(..., bound, bound)
+#      (up to floating point rounding of centers that are exactly at the bound)
+def threshold_distances_w_bound(distances, distances_box, distances_box_far, bound):
+    # Found if the nearest target center in chebyshev distance is inside the box
+    found_voxels_TF = distances_box <= bound
+
+    # If the nearest target center is not farther than the bound it is inside the box and it is the minimum,
+    # otherwise all the target centers inside the box are farther than the bound and the targets outside
+    # of the box give the distance bound (if all the targets are inside the box the nearest distance is kept)
+    distances_w_bound = np.where(distances_box_far <= bound, distances, np.minimum(distances, bound))
+
+    return found_voxels_TF, distances_w_bound
+
+# In: Numpy array of query centers (N, 3), numpy array of target centers (M, 3), numpy array of target grid indices (M, 3)
+#     and the voxel size of the target voxel grid
+# Out: The positions of the query centers in the target grid (N, 3) as grid indices (integers) and the offset (3)
+#      that is the same for all query centers (query center = target grid index + offset, in voxels),
+#      (None, None) if the query centers are not on a shifted copy of the target grid (e.g. different voxel size)
+def get_lattice_offset(centers_query, centers_target, coords_target, voxel_size):
+    centers_query = np.asarray(centers_query, dtype=float)
+    centers_target = np.asarray(centers_target, dtype=float)
+    coords_target = np.asarray(coords_target, dtype=np.int64).reshape(-1, 3)
+
+    if len(centers_query) == 0 or len(centers_target) == 0:
+        return None, None
+
+    # Position of the query centers in voxels of the target grid
+    origin_target = centers_target[0] - (coords_target[0] + 0.5) * voxel_size
+    positions = (centers_query - origin_target) / voxel_size - 0.5
+
+    offset = positions[0] - np.round(positions[0])
+    positions_query = np.round(positions - offset).astype(np.int64)
+
+    if np.max(np.abs(positions - positions_query - offset)) > 1e-6:
+        return None, None
+
+    return positions_query, offset
+
+# In: Numpy array of target grid indices (M, 3)
+# Out: The ratio of occupied voxels inside the bounding box of the target grid indices
+def get_dense_fill_ratio(coords_target):
+    coords_target = np.asarray(coords_target).reshape(-1, 3)
+
+    if len(coords_target) == 0:
+        return 0.0
+
+    volume = np.prod(coords_target.max(axis=0) - coords_target.min(axis=0) + 1, dtype=float)
+
+    return len(coords_target) / volume
+
+# In: The offset returned by get_lattice_offset, the bound and the voxel size
+# Out: The first and last offset (3) in grid indices of the target voxels that can be inside the box of a query center
+def get_dense_window(offset, bound, voxel_size):
+    bound_voxels = bound / voxel_size
+
+    return np.ceil(offset - bound_voxels).astype(np.int64), np.floor(offset + bound_voxels).astype(np.int64)
+
+# In: The offset returned by get_lattice_offset, the bound and the voxel size
+# Out: True if no target voxel is (almost) exactly at the border of the box of a query center,
+#      otherwise the double loop comparisons decide for each pair separately and only the KD-tree engine gives the same results
+def is_dense_window_exact(offset, bound, voxel_size):
+    bound_voxels = bound / voxel_size
+    borders = np.concatenate((offset - bound_voxels, offset + bound_voxels))
+
+    return bool(np.all(np.abs(borders - np.round(borders)) > 1e-6))
+
+# In: The offset returned by get_lattice_offset, the bound and the voxel size
+# Out: True if all the target cells that can be inside the box of a query center have (clearly) different distances to it,
+#      so the nearest target voxel is unique and it is the one of the double loop, otherwise (e.g. offset 0 or 0.5,
+#      the same offset on two axes) the double loop picks between equidistant voxels and only the KD-tree engine gives the same index
+def is_dense_window_unique(offset, bound, voxel_size):
+    window_start, window_end = get_dense_window(offset, bound, voxel_size)
+
+    # Squared distance (in voxels) from the query center to every target cell of the window
+    squared_axes = [(offset[axis] - np.arange(window_start[axis], window_end[axis] + 1)) ** 2 for axis in range(3)]
+    squared_distances = np.sort((squared_axes[0][:, None, None] + squared_axes[1][None, :, None] + squared_axes[2][None, None, :]).ravel())
+
+    return bool(np.all(np.diff(squared_distances) > 1e-6))
+
+# In: Numpy array of target grid indices (M, 3), the offset returned by get_lattice_offset, the bound and the voxel size
+# Out: The number of cells of the 3D array used by match_centers_w_bound_dense
+def get_dense_volume(coords_target, offset, bound, voxel_size):
+    coords_target = np.asarray(coords_target).reshape(-1, 3)
+    window_start, window_end = get_dense_window(offset, bound, voxel_size)
+
+    return np.prod(coords_target.max(axis=0) - coords_target.min(axis=0) + 1 + window_end - window_start, dtype=float)
+
+# In: Numpy array of query centers (N, 3), numpy array of target centers (M, 3), numpy array of target grid indices (M, 3),
+#     the voxel size of the target voxel grid, the bound, the memory budget (MB) of the 3D array (None: no budget)
+#     and the minimum fill ratio of the target voxel grid
+# Out: "dense" if the dense engine can be used (same lattice, no target voxel at the border of the box,
+#      no equidistant target voxels, enough occupied voxels, 3D array inside the budget), otherwise "kdtree"
+def select_matching_engine(centers_query, centers_target, coords_target, voxel_size, bound, memory_budget_mb, dense_fill_ratio):
+    positions_query, offset = get_lattice_offset(centers_query, centers_target, coords_target, voxel_size)
+
+    if positions_query is None or not is_dense_window_exact(offset, bound, voxel_size):
+        return "kdtree"
+
+    if not is_dense_window_unique(offset, bound, voxel_size):
+        return "kdtree"
+
+    if get_dense_fill_ratio(coords_target) < dense_fill_ratio:
+        return "kdtree"
+
+    if memory_budget_mb is not None and get_dense_volume(coords_target, offset, bound, voxel_size) * BYTES_PER_CELL > memory_budget_mb * 1024 * 1024:
+        return "kdtree"
+
+    return "dense"
+
+# In: Numpy array of query centers (N, 3), numpy array of target centers (M, 3), numpy array of target grid indices (M, 3),
+#     the voxel size of the target voxel grid, the bound and the distance used for target centers outside of the bound
+# Out: found_voxels_TF (N), distances_w_bound (N) and distance_index_w_bound (N), the same as match_centers_w_bound
+#      The query centers must be on a shifted copy of the target grid (see get_lattice_offset), use select_matching_engine
+#      to check that the results are the same as the ones of the KD-tree engine (no target voxel at the border of the box
+#      and no equidistant target voxels, otherwise the index of any of the nearest target voxels can be returned)
+def match_centers_w_bound_dense(centers_query, centers_target, coords_target, voxel_size, bound, pad_distance):
+    centers_query = np.asarray(centers_query, dtype=float)
+    centers_target = np.asarray(centers_target, dtype=float)
+    coords_target = np.asarray(coords_target, dtype=np.int64).reshape(-1, 3)
+
+    num_query = len(centers_query)
+
+    # Initialize the results as if no target center was found inside the bound
+    found_voxels_TF = np.zeros(num_query, dtype=bool)
+    distances_w_bound = np.full(num_query, pad_distance, dtype=float)
+    distance_index_w_bound = np.zeros(num_query, dtype=int)
+
+    if num_query == 0 or len(centers_target) == 0:
+        return found_voxels_TF, distances_w_bound, distance_index_w_bound
+
+    positions_query, offset = get_lattice_offset(centers_query, centers_target, coords_target, voxel_size)
+
+    if positions_query is None:
+        raise ValueError("The dense engine needs query and target voxel grids with the same voxel size")
+
+    # The target voxels inside the box of a query are at grid index + window_start ... grid index + window_end
+    window_start, window_end = get_dense_window(offset, bound, voxel_size)
+    window_length = window_end - window_start
+
+    ## Rasterize the target voxels: squared distance 0 and their index at occupied cells, infinity elsewhere
+    coords_min = coords_target.min(axis=0)
+    shape = coords_target.max(axis=0) - coords_min + 1
+
+    # Index of the target voxel of each cell (reversed, so that the smallest index is kept for repeated grid indices)
+    index_grid = np.full(shape, -1, dtype=np.int64)
+    cells = coords_target - coords_min
+    index_grid[cells[::-1, 0], cells[::-1, 1], cells[::-1, 2]] = np.arange(len(coords_target))[::-1]
+    distance_grid = np.where(index_grid >= 0, 0.0, np.inf)
+
+    ## Distance transform inside the box, one axis at a time (the squared distance and the box are separable):
+    ## for every cell keep the minimum of (offset - shift)^2 + distance of the cell at + shift, for all shifts of the window
+    # After the pass of an axis the cell i corresponds to the query grid index (coords_min - window_end) + i on this axis
+    for axis in range(3):
+        if window_length[axis] < 0:
+            # No target voxel can be inside the box
+            distance_grid = np.full(1, np.inf).reshape(1, 1, 1)
+            index_grid = np.full(1, -1).reshape(1, 1, 1)
+            break
+
+        pad_width = [(0, 0)] * 3
+        pad_width[axis] = (window_length[axis], window_length[axis])
+        distance_padded = np.pad(distance_grid, pad_width, constant_values=np.inf)
+        index_padded = np.pad(index_grid, pad_width, constant_values=-1)
+
+        output_length = distance_grid.shape[axis] + window_length[axis]
+        best_distance = np.full(distance_grid.shape[:axis] + (output_length,) + distance_grid.shape[axis + 1:], np.inf)
+        best_index = np.full(best_distance.shape, -1, dtype=np.int64)
+
+        for shift in range(window_start[axis], window_end[axis] + 1):
+            # Cells of the previous pass at query grid index + shift
+            start = shift - window_start[axis]
+            cell_slice = [slice(None)] * 3
+            cell_slice[axis] = slice(start, start + output_length)
+            cell_slice = tuple(cell_slice)
+
+            candidate = distance_padded[cell_slice] + (offset[axis] - shift) ** 2
+            better = candidate < best_distance
+            best_distance[better] = candidate[better]
+            best_index[better] = index_padded[cell_slice][better]
+
+        distance_grid = best_distance
+        index_grid = best_index
+
+    ## Sample the distance transform at the query grid indices
+    grid_start = coords_min - window_end
+    cells_query = positions_query - grid_start
+    inside_grid = np.all((cells_query >= 0) & (cells_query < np.asarray(index_grid.shape)), axis=1)
+
+    nearest_index = np.full(num_query, -1, dtype=np.int64)
+    nearest_index[inside_grid] = index_grid[cells_query[inside_grid, 0], cells_query[inside_grid, 1], cells_query[inside_grid, 2]]
+
+    found_voxels_TF = nearest_index >= 0
+    found_index = nearest_index[found_voxels_TF]
+
+    # Euclidean distance from the centers (the same computation as the KD-tree engine)
+    difference = centers_query[found_voxels_TF] - centers_target[found_index]
+    found_distances = get_center_distances(difference)
+
+    distances_w_bound[found_voxels_TF] = found_distances
+    distance_index_w_bound[found_voxels_TF] = found_index
+
+    ## Combine with the pad_distance of the target centers outside of the box (if there is any)
+    # The farthest target center in chebyshev distance is given by the bounding box of the targets
+    minimum_target = centers_target.min(axis=0)
+    maximum_target = centers_target.max(axis=0)
+    distances_box_far = np.max(np.maximum(centers_query - minimum_target, maximum_target - centers_query), axis=1)
+    has_outside = distances_box_far > bound
+
+    pad_smaller = found_voxels_TF & has_outside & (pad_distance < distances_w_bound)
+    pad_equal = found_voxels_TF & has_outside & (pad_distance == distances_w_bound)
+    distances_w_bound[pad_smaller] = pad_distance
+
+    # First target (smallest index) outside of the box, checked with the same comparisons as the double loop
+    pad_index = np.flatnonzero(pad_smaller | pad_equal)
+    first_outside = np.zeros(len(pad_index), dtype=int)
+    remaining = np.arange(len(pad_index))
+
+    for index_target in range(len(centers_target)):
+        if len(remaining) == 0:
+            break
+
+        query = centers_query[pad_index[remaining]]
+        inside = np.all((query - bound <= centers_target[index_target]) & (centers_target[index_target] <= query + bound), axis=1)
+        first_outside[remaining[~inside]] = index_target
+        remaining = remaining[inside]
+
+    distance_index_w_bound[pad_index] = np.where(pad_smaller[pad_index], first_outside,
+                                                 np.minimum(distance_index_w_bound[pad_index], first_outside))
+
+    return found_voxels_TF, distances_w_bound, distance_index_w_bound
@@ -0,0 +1,62 @@
+#
+# The following module contains the metrics helpers used by the comparison scripts
+# (compare_voxel_grid_pair.py, compare_voxel_grids_all.py, compare_voxel_grids_all_multiple.py)
+# 1. Get the metrics folder of a voxel size and a bound
+# 2. Create the content of the matching and distance metrics that is saved in <id>_data.txt
+#    (the same metrics are saved unrounded in the metrics table of the project and averaged there, see metrics_store.py)
+
+import os
+import numpy as np
+
+# In: The path to the project, the voxel size and the bound
+# Out: The path to the metrics folder (metrics_vox_<voxel_size>_bound_<bound>)
+def get_metrics_folder(path_to_project, voxel_size, bound):
+    return os.path.join(path_to_project, "metrics_vox_" + str(voxel_size).replace(".", "_") + "_bound_" + str(bound).replace(".", "_"))
+
+# In: Number of voxels at ground truth and at estimate, number of ground truth voxels matched and the label
+# Out: The content of the ground truth matching metrics
+def get_gt_match_content(num_voxels_gt, num_voxels_colmap, num_matched_gt, label="GT"):
+    return """# START {0} MATCH
+# {0} Voxels at ground truth: {1}
+# {0} Voxels at estimate: {2}
+# {0} Voxels matched: {3}
+# {0} %Voxels matched: {4:.2f}%
+# END {0} MATCH
+""".format(label, num_voxels_gt, num_voxels_colmap, num_matched_gt, (num_matched_gt/num_voxels_gt)*100)
+
+# In: Number of voxels at ground truth and at estimate, number of colmap voxels matched and the label
+# Out: The content of the colmap matching metrics
+def get_colmap_match_content(num_voxels_gt, num_voxels_colmap, num_matched_colmap, label="COLMAP"):
+    return """
+# START {0} MATCH
+# {0} Voxels at ground truth: {1}
+# {0} Voxels at estimate: {2}
+# {0} Voxels matched at colmap: {3}
+# {0} %Voxels matched at colmap: {4:.2f}%
+# {0} Recall = TP/(TP+FN): {5:.2f}
+# END {0} MATCH
+""".format(label, num_voxels_gt, num_voxels_colmap, num_matched_colmap, (num_matched_colmap/num_voxels_colmap)*100, num_matched_colmap/(num_matched_colmap + (num_voxels_gt - num_matched_colmap)))
+
+# In: Numpy array of distances (N)
+# Out: The minimum, maximum, mean absolute error, root mean square error and mean squared error of the distances
+def get_distance_metrics(distances):
+    minimum_distance = np.min(distances)
+    maximum_distance = np.max(distances)
+    mae = np.mean(np.abs(distances))
+    rmse = np.sqrt(np.mean(distances**2))
+    mse = np.mean(distances**2)
+
+    return minimum_distance, maximum_distance, mae, rmse, mse
+
+# In: Numpy array of distances (N) and the label (e.g. GT, COLMAP)
+# Out: The content of the distance metrics
+def get_distances_content(distances, label):
+    return """
+# START {0} DISTANCES
+# {0} Minimum Distance: {1:.2f}
+# {0} Maximum Distance: {2:.2f}
+# {0} Distances Mean Absolute Error (MAE): {3:.2f}
+# {0} Distances Root Mean Square Error (RMSE): {4:.2f}
+# {0} Distances Mean Squared Error (MSE): {5:.2f}
+# END {0} DISTANCES
+""".format(label, *get_distance_metrics(distances))